@@ -0,0 +1,130 @@
+"""Alertes crépuscule à l'instant exact (plus de sondage à la minute).
+
+À chaque nouveau jeu d'horaires, `plan()` calcule les instants de
+déclenchement (événement - décalage) en epoch UTC — insensible aux
+changements d'heure — et un unique thread dort jusqu'au prochain. Rien ne
+se réveille entre deux alertes.
+
+Chaque alerte (événement, date, décalage) ne part qu'une fois. Après une
+mise en veille, les alertes dépassées d'un même événement sont fusionnées
+en une seule (minutes restantes réelles) tant que l'événement est à venir ;
+celles déjà passées au moment du `plan()` ne partent pas.
+"""
+import time
+import threading
+import traceback
+
+import config
+
+EVENT_LABELS = {
+    "civil_start": "l'aube civile",
+    "civil_end": "la fin du crépuscule civil",
+    "nautical_start": "l'aube nautique",
+    "nautical_end": "le crépuscule nautique",
+}
+
+
+class AlertScheduler:
+    """`on_alert(message, event, minutes)` est appelé depuis le thread de l'alerte.
+
+    `clock` (epoch en secondes) est injectable pour piloter le temps ;
+    `run_pending(now)` fait tout le travail et renvoie la prochaine échéance.
+    """
+    def __init__(self, on_alert, events=None, offsets_min=None, clock=time.time):
+        self.on_alert = on_alert
+        self.events = tuple(events or getattr(config, "ALERT_EVENTS", ("nautical_end",)))
+        self.offsets_min = tuple(sorted(
+            offsets_min or getattr(config, "ALERT_OFFSETS_MIN", (30, 20, 10)), reverse=True
+        ))
+        self.clock = clock
+        self.fired = 0
+        self.wakeups = 0
+        self._plan = []        # [(fire_ts, event, event_ts, offset, key)] trié
+        self._done = set()     # clés (événement, date, décalage) déjà traitées
+        self._generation = 0   # incrémenté à chaque plan()
+        self._cond = threading.Condition()
+        self._running = False
+        self._clock_offset = time.time() - time.monotonic()
+
+    def plan(self, current):
+        """Recalcule les échéances depuis `current` (dict de datetimes locales aware)."""
+        now = self.clock()
+        # tout sous verrou : une alerte que run_pending() vient de sortir du plan
+        # est déjà dans _done, elle ne peut pas y être remise (double déclenchement)
+        with self._cond:
+            pending = {a[4] for a in self._plan}  # déjà dues mais pas encore traitées
+            plan = []
+            for event in self.events:
+                dt = (current or {}).get(event)
+                if dt is None:
+                    continue  # pas d'événement ce jour-là (latitudes polaires)
+                event_ts = dt.timestamp()
+                for offset in self.offsets_min:
+                    key = (event, dt.date().isoformat(), offset)
+                    fire_ts = event_ts - offset * 60
+                    if fire_ts <= now and key not in pending:
+                        self._done.add(key)  # déjà passée au moment du calcul : pas de rattrapage
+                    elif key not in self._done:
+                        plan.append((fire_ts, event, event_ts, offset, key))
+            plan.sort()
+            self._plan = plan
+            self._generation += 1
+            self._cond.notify()
+        if plan:
+            print(f"[DEBUG] Alertes : {len(plan)} programmées, prochaine à "
+                  f"{time.strftime('%H:%M:%S', time.localtime(plan[0][0]))}")
+
+    def run_pending(self, now=None):
+        """Déclenche ce qui est dû à `now` ; renvoie l'échéance suivante (ou None)."""
+        now = self.clock() if now is None else now
+        with self._cond:
+            due = [a for a in self._plan if a[0] <= now]
+            self._plan = [a for a in self._plan if a[0] > now]
+            next_ts = self._plan[0][0] if self._plan else None
+            for alert in due:
+                self._done.add(alert[4])
+        latest = {}
+        for alert in due:
+            latest[alert[1]] = alert  # trié par fire_ts : la plus récente gagne
+        for _, event, event_ts, offset, _ in sorted(latest.values()):
+            if event_ts <= now:
+                continue  # l'événement lui-même est passé (longue veille)
+            minutes = max(1, round((event_ts - now) / 60))
+            message = f"⚠ Attention : {minutes} minutes avant {EVENT_LABELS.get(event, event)} !"
+            self.fired += 1
+            try:
+                self.on_alert(message, event, minutes)
+            except Exception:
+                print("[ERROR] Erreur alerte :", traceback.format_exc())
+        return next_ts
+
+    def check_clock(self):
+        """À appeler sur un tick existant : réveille le thread si l'horloge a sauté (veille)."""
+        offset = time.time() - time.monotonic()
+        if abs(offset - self._clock_offset) > 2.0:
+            self._clock_offset = offset
+            with self._cond:
+                self._cond.notify()
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            threading.Thread(target=self._loop, daemon=True, name="alerts").start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+    def _loop(self):
+        while True:
+            generation = self._generation
+            next_ts = self.run_pending()
+            with self._cond:
+                if not self._running:
+                    return
+                if generation != self._generation:
+                    continue  # replanifié entre-temps
+                timeout = None if next_ts is None else max(0.0, next_ts - self.clock())
+                self._cond.wait(timeout)
+                self.wakeups += 1
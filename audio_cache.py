@@ -0,0 +1,98 @@
+"""Cache audio hors ligne des morceaux YouTube (optionnel, config.AUDIO_CACHE_ENABLED).
+
+yt-dlp télécharge la piste audio en fond (pool borné, débit limité) dans
+un magasin `DiskLRU` adressé par videoId ; la lecture suivante part du
+fichier local, sans `extract_info` ni buffering distant.
+"""
+import os
+import time
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import lazy_import
+import metrics
+from disk_cache import DiskLRU
+
+ENABLED = bool(getattr(config, "AUDIO_CACHE_ENABLED", False))
+
+YDL_OPTS_DOWNLOAD = {
+    "quiet": True,
+    "noplaylist": True,
+    # m4a d'abord : le fichier garde l'extension .m4a dans le magasin
+    "format": "bestaudio[ext=m4a]/bestaudio",
+    "extractor_args": {"youtube": {"player_client": ["web"]}},
+    "nocheckcertificate": True,
+    "continuedl": False,
+    "noprogress": True,
+}
+
+
+class AudioCache:
+    def __init__(self, directory, max_bytes, workers=1, ratelimit_kbps=None):
+        self.store = DiskLRU(directory, max_bytes, suffix=".m4a")
+        self.ratelimit = int(ratelimit_kbps * 1024) if ratelimit_kbps else None
+        self.downloads = 0
+        self.failures = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="audio-dl")
+
+    def local_path(self, video_id):
+        """Fichier local si le morceau est en cache (et le marque récent), sinon None."""
+        return self.store.get(video_id) if video_id in self.store else None
+
+    def request(self, video_id):
+        """Télécharge `video_id` en fond s'il n'est ni en cache ni déjà en cours."""
+        if video_id in self.store:
+            return None
+        with self._lock:
+            fut = self._inflight.get(video_id)
+            if fut is None:
+                fut = self._inflight[video_id] = self._pool.submit(self._download, video_id)
+            return fut
+
+    def _download(self, video_id):
+        t0 = time.perf_counter()
+        try:
+            def write(tmp):
+                opts = dict(YDL_OPTS_DOWNLOAD, outtmpl=tmp)
+                if self.ratelimit:
+                    opts["ratelimit"] = self.ratelimit
+                ydl = lazy_import.load("yt_dlp").YoutubeDL(opts)
+                ydl.download([f"https://www.youtube.com/watch?v={video_id}"])
+                if not os.path.exists(tmp):
+                    raise RuntimeError("yt-dlp n'a rien écrit")
+
+            with metrics.span("audio_cache.download"):
+                path = self.store.put(video_id, write)
+            self.downloads += 1
+            size = os.path.getsize(path) // 1024
+            print(f"[DEBUG] Audio mis en cache : {video_id} ({size} Ko, "
+                  f"{(time.perf_counter() - t0):.1f} s)")
+            return path
+        except Exception:
+            self.failures += 1
+            print(f"[WARN] Téléchargement audio {video_id} échoué :", traceback.format_exc())
+            return None
+        finally:
+            with self._lock:
+                self._inflight.pop(video_id, None)
+
+    def stats(self):
+        with self._lock:
+            inflight = len(self._inflight)
+        return dict(self.store.stats(), downloads=self.downloads, failures=self.failures,
+                    inflight=inflight)
+
+
+cache = None
+if ENABLED:
+    cache = AudioCache(
+        getattr(config, "AUDIO_CACHE_DIR",
+                os.path.join(os.path.expanduser("~"), ".cache", "twilight_hud", "audio")),
+        max_bytes=int(getattr(config, "AUDIO_CACHE_MAX_BYTES", 1024 * 1024 * 1024)),
+        workers=int(getattr(config, "AUDIO_CACHE_WORKERS", 1)),
+        ratelimit_kbps=getattr(config, "AUDIO_CACHE_RATELIMIT_KBPS", 512),
+    )
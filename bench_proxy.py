@@ -0,0 +1,171 @@
+"""Démarrage et blocages de lecture : URL directe vs proxy local (media_proxy).
+
+Un lecteur simulé lit le flux servi par `fake_apis.FakeMedia` (premier
+octet lent, micro-coupures, URL qui expire) par requêtes Range, au débit
+de lecture `--bitrate-kbps` après un pré-buffer, comme QMediaPlayer : un
+bloc arrivé après son heure de lecture compte comme un blocage.
+
+Scénarios, pour chaque mode : départ (préchargé pour le proxy, comme le
+lecteur en attente de la file), seeks aléatoires, retour au début ; l'URL
+expire entre-temps (`--expire-s`).
+
+    python bench_proxy.py [--seeks 3] [--out proxy.json]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def out(msg):
+    print(msg, flush=True)
+
+
+class SimPlayer:
+    """Consommateur temps réel d'un flux HTTP (Range)."""
+    def __init__(self, get, bitrate_kbps, prebuffer_s=1.0):
+        self.get = get
+        self.byterate = bitrate_kbps * 1024 / 8
+        self.prebuffer = int(prebuffer_s * self.byterate)
+        self.stalls = 0
+        self.stalled_ms = 0.0
+        self.failures = 0
+
+    def play(self, url, start, seconds):
+        """Lit `seconds` de média depuis `start` ; renvoie le temps jusqu'au son (ms) ou None."""
+        want = int(seconds * self.byterate)
+        t0 = time.perf_counter()
+        try:
+            r = self.get(url, headers={"Range": f"bytes={start}-"}, stream=True, timeout=(5, 30))
+        except Exception:
+            self.failures += 1
+            return None
+        try:
+            if r.status_code >= 400:
+                self.failures += 1
+                return None
+            received, play_at, lost = 0, None, 0.0
+            for data in r.iter_content(16 * 1024):
+                now = time.perf_counter()
+                if play_at is None:
+                    if received + len(data) >= self.prebuffer:
+                        play_at = now  # pré-buffer plein : le son part
+                        ttp = (now - t0) * 1000.0
+                else:
+                    due = play_at + lost + received / self.byterate
+                    if now > due:
+                        self.stalls += 1
+                        lost += now - due
+                received += len(data)
+                if received >= want:
+                    break
+                if play_at is not None:
+                    # le lecteur ne consomme pas plus vite que le temps réel
+                    ahead = play_at + lost + received / self.byterate - time.perf_counter()
+                    if ahead > 2.0:
+                        time.sleep(ahead - 2.0)
+            self.stalled_ms += lost * 1000.0
+            return ttp if play_at is not None else None
+        finally:
+            r.close()
+
+
+def run_mode(mode, media, proxy, get, args, rng):
+    player = SimPlayer(get, args.bitrate_kbps)
+    video_id = f"bench-{mode}"
+    if mode == "proxy":
+        url = proxy.url_for(video_id, media.url(video_id))
+        time.sleep(args.preload_s)  # préchargé par le lecteur en attente
+    else:
+        url = media.url(video_id)
+    size = len(media.data)
+    startup = player.play(url, 0, args.play_s)
+    seeks = []
+    for _ in range(args.seeks):
+        pos = rng.randrange(0, size - int(2 * player.byterate))
+        seeks.append(player.play(url, pos, 2.0))
+    back = player.play(url, 0, 1.0)
+    ok_seeks = [s for s in seeks if s is not None]
+    return {
+        "startup_ms": None if startup is None else round(startup, 1),
+        "seek_median_ms": round(statistics.median(ok_seeks), 1) if ok_seeks else None,
+        "seek_max_ms": round(max(ok_seeks), 1) if ok_seeks else None,
+        "back_to_start_ms": None if back is None else round(back, 1),
+        "stalls": player.stalls,
+        "stalled_ms": round(player.stalled_ms, 1),
+        "failures": player.failures,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=4.0)
+    parser.add_argument("--first-byte-ms", type=float, default=300.0)
+    parser.add_argument("--upstream-kbps", type=float, default=2400.0)
+    parser.add_argument("--bitrate-kbps", type=float, default=1000.0)
+    parser.add_argument("--hiccup-rate", type=float, default=0.03, help="par bloc de 16 Ko")
+    parser.add_argument("--hiccup-ms", type=float, default=800.0)
+    parser.add_argument("--expire-s", type=float, default=10.0)
+    parser.add_argument("--play-s", type=float, default=6.0)
+    parser.add_argument("--preload-s", type=float, default=2.0)
+    parser.add_argument("--seeks", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="fichier JSON de résultats")
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp(prefix="bench-proxy-")
+    sys.path.insert(0, HERE)
+    from bench_suite import write_config
+    write_config(tmp, {"MEDIA_PROXY_ENABLED": False})  # proxy du banc créé à la main
+    os.environ["HOME"] = tmp
+    sys.path.insert(0, tmp)
+
+    import http_client
+    from fake_apis import FakeMedia
+    from media_proxy import MediaProxy
+
+    media = FakeMedia(size=int(args.size_mb * 1024 * 1024), first_byte_ms=args.first_byte_ms,
+                      kbps=args.upstream_kbps, hiccup_rate=args.hiccup_rate,
+                      hiccup_ms=args.hiccup_ms, expire_after_s=args.expire_s, seed=args.seed).start()
+    proxy = MediaProxy(resolve=media.url, directory=os.path.join(tmp, "proxy")).start()
+    # le lecteur simulé a sa propre session : pas de connexions partagées avec le proxy
+    import requests
+    player_session = requests.Session()
+
+    results = {"args": vars(args)}
+    for mode in ("direct", "proxy"):
+        expired0 = media.expired
+        results[mode] = run_mode(mode, media, proxy, player_session.get, args,
+                                 random.Random(args.seed))
+        results[mode]["upstream_403"] = media.expired - expired0
+    results["proxy_stats"] = proxy.stats()
+    results["upstream"] = media.service.stats()
+    proxy.stop()
+    media.stop()
+
+    fmt = lambda v: "-" if v is None else f"{v:.0f} ms"  # noqa: E731
+    out(f"{'mode':7s} {'départ':>9s} {'seek méd.':>10s} {'seek max':>9s} {'retour':>9s} "
+        f"{'blocages':>9s} {'bloqué':>9s} {'échecs':>7s}")
+    for mode in ("direct", "proxy"):
+        r = results[mode]
+        out(f"{mode:7s} {fmt(r['startup_ms']):>9s} {fmt(r['seek_median_ms']):>10s} "
+            f"{fmt(r['seek_max_ms']):>9s} {fmt(r['back_to_start_ms']):>9s} {r['stalls']:9d} "
+            f"{fmt(r['stalled_ms']):>9s} {r['failures']:7d}")
+    out(f"proxy : {results['proxy_stats']['refreshes']} re-résolution(s), "
+        f"{results['proxy_stats']['upstream_requests']} requêtes amont")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        out(f"[bench] résultats : {args.out}")
+    http_client.session().close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""Compare le démarrage headless (`engine.py`) et GUI (`assistantGUI.py`).
+
+Chaque mode est lancé N fois dans un process neuf avec `--bench-startup` ;
+on mesure le temps jusqu'à la ligne JSON de fin d'init et on relève le pic
+RSS rapporté. Pour le GUI (`QT_QPA_PLATFORM=offscreen`) c'est le premier
+rendu utile : horaires réellement affichés, pas les « --:-- » d'attente.
+Le GUI est mesuré à froid (`--no-snapshot`) puis à chaud (instantané du
+lancement précédent, `snapshot.py`, écrit par un lancement d'amorce).
+`python -X importtime` détaille ensuite l'import de `assistantGUI`.
+
+Budget : `--save-baseline` enregistre les médianes ; les lancements
+suivants échouent (code 1) si un temps dépasse la référence de plus de
+`--budget-ms`, ou si une dépendance lourde est de nouveau importée d'office.
+
+    python bench_startup.py [-n 5] [--save-baseline] [--budget-ms 150]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(HERE, ".bench_startup_baseline.json")
+HEAVY_MODULES = ("yt_dlp", "openai", "twilio", "gtts", "google.cloud.texttospeech")
+
+
+def run_once(script, *flags):
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, script), "--bench-startup", *flags],
+        cwd=HERE, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+    )
+    report = None
+    for line in proc.stdout:
+        if line.startswith("{"):
+            report = json.loads(line)
+            report["startup_ms"] = (time.perf_counter() - t0) * 1000.0
+            break
+    proc.stdout.close()
+    proc.wait(timeout=30)
+    return report
+
+
+def import_times(module="assistantGUI"):
+    """`python -X importtime -c "import module"` -> {module importé: cumul ms}."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=HERE, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        print(f"[WARN] import {module} impossible : {proc.stderr.strip().splitlines()[-1]}")
+        return {}
+    out = {}
+    for line in proc.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        out[name.strip()] = int(cumulative) / 1000.0
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=5, help="lancements par mode")
+    parser.add_argument("--budget-ms", type=float, default=150.0,
+                        help="régression tolérée par rapport à la référence")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    rows = {}
+    modes = (("headless", "engine.py", ()), ("gui_cold", "assistantGUI.py", ("--no-snapshot",)),
+             ("gui", "assistantGUI.py", ()))
+    for mode, script, flags in modes:
+        if mode == "gui":
+            run_once(script)  # amorce : écrit l'instantané lu par les lancements suivants
+        runs = [r for r in (run_once(script, *flags) for _ in range(args.n)) if r]
+        if not runs:
+            print(f"[WARN] {mode} : aucun rapport (dépendances manquantes ?)")
+            continue
+        rows[mode] = {
+            "startup_ms": statistics.median(r["startup_ms"] for r in runs),
+            "rss_kb": statistics.median(r["rss_kb"] or 0 for r in runs),
+            "runs": len(runs),
+        }
+        extra = ""
+        if "meaningful" in runs[0]:
+            rows[mode]["warm"] = sum(bool(r["warm"]) for r in runs)
+            rows[mode]["meaningful"] = sum(bool(r["meaningful"]) for r in runs)
+            extra = f", horaires affichés {rows[mode]['meaningful']}/{len(runs)}"
+            if mode == "gui":
+                extra += f", instantané repris {rows[mode]['warm']}/{len(runs)}"
+        print(f"{mode:9s} démarrage {rows[mode]['startup_ms']:8.1f} ms   "
+              f"RSS {rows[mode]['rss_kb'] / 1024:6.1f} Mo   ({len(runs)} runs{extra})")
+    if "headless" in rows and "gui" in rows:
+        h, g = rows["headless"], rows["gui"]
+        print(f"headless/GUI : temps x{h['startup_ms'] / g['startup_ms']:.2f}, "
+              f"RSS x{h['rss_kb'] / max(1, g['rss_kb']):.2f}")
+    if "gui_cold" in rows and "gui" in rows:
+        cold, warm = rows["gui_cold"]["startup_ms"], rows["gui"]["startup_ms"]
+        print(f"premier rendu utile : froid {cold:.0f} ms -> chaud {warm:.0f} ms "
+              f"({cold - warm:+.0f} ms gagnés)")
+
+    times = import_times()
+    if "assistantGUI" in times:
+        rows["import_ms"] = {"startup_ms": times["assistantGUI"]}
+        top = sorted(((ms, name) for name, ms in times.items() if "." not in name
+                      and name != "assistantGUI"), reverse=True)[:8]
+        print(f"import assistantGUI : {times['assistantGUI']:.1f} ms ; plus lourds : "
+              + ", ".join(f"{name} {ms:.0f} ms" for ms, name in top))
+    eager = [m for m in HEAVY_MODULES if m in times]
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        print(f"Référence enregistrée : {args.baseline}")
+        return 0
+
+    failed = False
+    if eager:
+        print(f"[ERROR] Import lourd au démarrage : {', '.join(eager)}")
+        failed = True
+    try:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {}
+        print("[WARN] Pas de référence (lance d'abord avec --save-baseline)")
+    for mode, row in rows.items():
+        ref = baseline.get(mode)
+        if ref is None:
+            continue
+        extra = row["startup_ms"] - ref["startup_ms"]
+        if extra > args.budget_ms:
+            print(f"[ERROR] {mode} : +{extra:.0f} ms au-delà de la référence "
+                  f"(budget {args.budget_ms:.0f} ms)")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""Banc de charge du HUD complet contre de faux serveurs locaux (fake_apis.py).
+
+Lance `TwilightHUD` en Qt offscreen avec une config temporaire qui pointe
+toutes les API vers les faux services, puis simule `--hours` heures
+d'utilisation (chaque heure simulée dure `--sim-hour-sec` secondes) :
+recherches YouTube, histoires, SMS, passage de minuit. Mesure la latence
+de bout en bout par fonction, les blocages du thread GUI et la mémoire,
+et écrit un JSON comparable d'un run à l'autre.
+
+    python bench_suite.py --out bench.json
+    python bench_suite.py --compare bench.json   # code 1 si régression
+
+Code 1 aussi si un faux service n'a reçu aucune requête : la fonction
+correspondante n'a pas été mesurée (dépendance absente, repli réseau...).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import platform
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# métriques comparées d'un run à l'autre : (section, clé, champ)
+_COMPARED = (
+    ("features", "e2e.twilight", "p95_ms"),
+    ("features", "e2e.search", "p95_ms"),
+    ("features", "e2e.story_first_audio", "p95_ms"),
+    ("features", "e2e.sms", "p95_ms"),
+    ("gui", "stall", "p99_ms"),
+    ("gui", "stall", "max_ms"),
+    ("memory", "growth", "kb"),
+)
+
+
+def write_config(directory, overrides):
+    lines = [
+        "LATITUDE = 48.8566",
+        "LONGITUDE = 2.3522",
+        "METRICS_ENABLED = True",
+        "RESOLVER_PREFETCH_TOP = 0  # pas de yt-dlp vers le vrai YouTube",
+        f"LOG_FILE = {os.path.join(directory, 'hud.log')!r}",
+    ]
+    lines += [f"{key} = {value!r}" for key, value in overrides.items()]
+    with open(os.path.join(directory, "config.py"), "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def rss_now_kb():
+    """RSS courant (Linux), sinon pic RSS."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        from engine import rss_kb
+        return rss_kb()
+
+
+def out(msg):
+    # le HUD redirige stdout vers sa console : on écrit sur le vrai terminal
+    print(msg, file=sys.__stdout__, flush=True)
+
+
+def run(args):
+    from fake_apis import FakeAPIs
+
+    apis = FakeAPIs(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                    fail_rate=args.fail_rate, seed=args.seed,
+                    token_delay_ms=args.token_delay_ms).start()
+    tmp = tempfile.mkdtemp(prefix="hud-bench-")
+    write_config(tmp, apis.config_overrides())
+    os.environ["HOME"] = tmp  # tous les caches ~/.cache/... dans le dossier temporaire
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    sys.path.insert(0, tmp)
+
+    from PyQt5.QtCore import QEventLoop, QTimer
+    from PyQt5.QtWidgets import QApplication
+    import metrics
+    import tasks
+    import assistantGUI
+
+    _app = QApplication(sys.argv[:1])  # gardée en vie jusqu'à la fin du banc
+    t0 = time.perf_counter()
+    hud = assistantGUI.TwilightHUD()
+    hud.show()
+    startup_ms = (time.perf_counter() - t0) * 1000.0
+
+    def pump(ms):
+        loop = QEventLoop()
+        QTimer.singleShot(int(ms), loop.quit)
+        loop.exec_()
+
+    def wait_until(pred, timeout_s=30.0):
+        deadline = time.monotonic() + timeout_s
+        while not pred():
+            if time.monotonic() > deadline:
+                return False
+            pump(10)
+        return True
+
+    # --- crochets de mesure ---
+    story_t0 = []
+
+    def _on_story_audio(path, engine):
+        if story_t0:
+            metrics.observe("e2e.story_first_audio", (time.perf_counter() - story_t0.pop()) * 1000.0)
+    hud._story_signals.audio_ready.connect(_on_story_audio)
+
+    sms_t0 = {}
+    sms_result = hud.sms.on_result
+
+    def _on_sms(job_id, recipient, ok, detail):
+        t = sms_t0.pop(job_id, None)
+        if t is not None:
+            metrics.observe("e2e.sms", (time.perf_counter() - t) * 1000.0)
+            if not ok:
+                metrics.error("e2e.sms")
+        sms_result(job_id, recipient, ok, detail)
+    hud.sms.on_result = _on_sms
+
+    def twilight_at(now):
+        t = time.perf_counter()
+        hud.engine.twilight.tick(now)
+        ok = wait_until(lambda: hud.engine.twilight.current is not None
+                        and hud.engine.twilight._pending_key is None, 15)
+        metrics.observe("e2e.twilight", (time.perf_counter() - t) * 1000.0)
+        if not ok:
+            metrics.error("e2e.twilight")
+
+    def search(query):
+        hud.youtube_search.setText(query)
+        t = time.perf_counter()
+        hud.search_youtube()
+        ok = wait_until(lambda: hud.youtube_model.rowCount() > 0 and not hud._yt_loading, 15)
+        metrics.observe("e2e.search", (time.perf_counter() - t) * 1000.0)
+        if not ok:
+            metrics.error("e2e.search")
+        # défilement jusqu'en bas : page suivante
+        bar = hud.youtube_results.verticalScrollBar()
+        bar.setValue(bar.maximum())
+
+    memory = []
+    start = datetime.datetime.now().astimezone().replace(minute=0, second=0, microsecond=0)
+    out(f"[bench] {args.hours} h simulées x {args.sim_hour_sec} s, "
+        f"latence {args.latency_ms}±{args.jitter_ms} ms, échecs {args.fail_rate:.0%}")
+    for hour in range(args.hours):
+        now = start + datetime.timedelta(hours=hour)
+        twilight_at(now)
+        for q in range(args.searches_per_hour):
+            search(f"lofi {hour}-{q}")
+        if hud.engine.story_client is not None and not hud.engine.story_running:
+            story_t0[:] = [time.perf_counter()]
+            hud.tell_story()
+        for job_id in hud.sms.schedule(f"bench {hour}", time.time()):
+            sms_t0[job_id] = time.perf_counter()
+        pump(args.sim_hour_sec * 1000.0)
+        hud._stop_tts()
+        memory.append(rss_now_kb())
+        out(f"[bench] heure {hour + 1:2d}/{args.hours} : RSS {memory[-1] / 1024:.1f} Mo")
+    wait_until(lambda: not sms_t0, 30)
+
+    snap = metrics.snapshot()
+    results = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "startup_ms": round(startup_ms, 1),
+        "features": {k: v for k, v in snap.items() if k.startswith("e2e.")},
+        "gui": {"stall": snap.get("gui.stall", {}), "tick": snap.get("gui.tick", {}),
+                "stall_count": hud.stall_monitor.stalls, **hud.stall_stats()},
+        "memory": {"samples_kb": memory, "growth": {"kb": memory[-1] - memory[0] if memory else 0}},
+        "operations": {k: v for k, v in snap.items() if not k.startswith(("e2e.", "gui."))},
+        "servers": apis.stats(),
+        "console": hud.ts_console.stats(),
+        "tasks": tasks.executor.stats(),
+    }
+    hud.sms.stop()
+    apis.stop()
+    return results
+
+
+def compare(results, baseline, tolerance, floor_ms=5.0):
+    """Liste des régressions (> tolerance relative ET > floor absolu)."""
+    regressions = []
+    for section, key, field in _COMPARED:
+        old = baseline.get(section, {}).get(key, {}).get(field)
+        new = results.get(section, {}).get(key, {}).get(field)
+        if old is None or new is None:
+            continue
+        flag = new > old * (1 + tolerance) and new - old > floor_ms
+        out(f"  {section}.{key}.{field:8s} {old:10.1f} -> {new:10.1f}  {'RÉGRESSION' if flag else 'ok'}")
+        if flag:
+            regressions.append(f"{section}.{key}.{field}")
+    return regressions
+
+
+def silent_services(results):
+    """Faux services sans aucune requête pendant le banc."""
+    return sorted(name for name, st in results.get("servers", {}).items() if not st["requests"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--sim-hour-sec", type=float, default=2.0)
+    parser.add_argument("--searches-per-hour", type=int, default=2)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--jitter-ms", type=float, default=40.0)
+    parser.add_argument("--fail-rate", type=float, default=0.02)
+    parser.add_argument("--token-delay-ms", type=float, default=15.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quick", action="store_true", help="4 h simulées, 1 s par heure")
+    parser.add_argument("--out", default=None, help="fichier JSON de résultats")
+    parser.add_argument("--compare", default=None, help="JSON de référence")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.hours, args.sim_hour_sec = 4, 1.0
+
+    sys.path.insert(0, HERE)
+    results = run(args)
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+        out(f"[bench] résultats : {args.out}")
+    else:
+        out(text)
+
+    code = 0
+    silent = silent_services(results)
+    if silent:
+        out(f"[bench] faux services jamais appelés : {', '.join(silent)} (fonctions non mesurées)")
+        code = 1
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        out(f"[bench] comparaison avec {args.compare} (tolérance {args.tolerance:.0%})")
+        if compare(results, baseline, args.tolerance):
+            code = 1
+    return code
+
+
+if __name__ == "__main__":
+    # os._exit : des threads de fond (pools, SSE) ne doivent pas bloquer la sortie
+    code = main()
+    sys.__stdout__.flush()
+    os._exit(code)
@@ -0,0 +1,169 @@
+"""Latence de synthèse par moteur TTS, sur les mêmes textes.
+
+Chaque moteur disponible (`tts._ENGINES`) synthétise les mêmes textes —
+alerte courte, phrase d'histoire, paragraphe — directement dans un
+fichier temporaire (le cache disque est contourné). On relève médiane,
+min et max par moteur et par texte, ainsi que la taille produite.
+
+`--fake` mesure la couverture (`TTS_HEDGE`) sans réseau : deux faux
+moteurs à lenteurs injectées (le préféré bloque parfois jusqu'à son
+timeout puis échoue) ; on compare la latence de bout en bout de
+`tts.synthesize()` en chaîne séquentielle et en couverture.
+
+    python bench_tts.py [-n 3] [--engines local,gtts] [--out tts.json]
+    python bench_tts.py --fake [-n 200]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+TEXTS = {
+    "alerte": "Attention : 10 minutes avant le crépuscule nautique !",
+    "phrase": ("Au bord du lac, la lanterne du vieux gardien s'alluma d'un coup, "
+               "comme si la nuit elle-même avait soufflé dessus."),
+    "paragraphe": ("Le crépuscule tombait doucement sur la vallée. Les oiseaux se taisaient "
+                   "un à un, et seule la rivière continuait de murmurer entre les pierres. "
+                   "Lina serra son manteau contre elle : quelque part, derrière la colline, "
+                   "une lumière bleue clignotait, trois fois, puis plus rien. Elle sut alors "
+                   "que le voyageur était revenu, et qu'il faudrait descendre avant la nuit."),
+}
+
+
+def bench_engine(name, fn, runs):
+    out = {}
+    with tempfile.TemporaryDirectory(prefix="bench-tts-") as tmp:
+        for label, text in TEXTS.items():
+            samples, size, error = [], 0, None
+            for i in range(runs):
+                path = os.path.join(tmp, f"{name}-{label}-{i}.audio")
+                t0 = time.perf_counter()
+                try:
+                    fn(text, path)
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                    break
+                samples.append((time.perf_counter() - t0) * 1000.0)
+                size = os.path.getsize(path)
+            out[label] = {
+                "chars": len(text),
+                "runs": len(samples),
+                "median_ms": round(statistics.median(samples), 1) if samples else None,
+                "min_ms": round(min(samples), 1) if samples else None,
+                "max_ms": round(max(samples), 1) if samples else None,
+                "bytes": size,
+                "error": error,
+            }
+    return out
+
+
+def fake_engine(seed, base_ms, stall_ms, stall_rate):
+    """Moteur simulé : `base_ms` ±20 %, ou bloqué `stall_ms` puis échec (timeout)."""
+    rng = random.Random(seed)
+
+    def synth(text, path, cancel=None):
+        stalled = rng.random() < stall_rate
+        end = time.monotonic() + (stall_ms if stalled else base_ms * rng.uniform(0.8, 1.2)) / 1000.0
+        while time.monotonic() < end:
+            if cancel is not None and cancel.is_set():
+                raise RuntimeError("annulé")
+            time.sleep(0.005)
+        if stalled:
+            raise TimeoutError("timeout simulé")
+        with open(path, "wb") as f:
+            f.write(b"ID3" + text.encode("utf-8"))
+    return synth
+
+
+def percentiles(samples):
+    s = sorted(samples)
+    pick = lambda q: round(s[min(len(s) - 1, int(q * len(s)))], 1)  # noqa: E731
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": round(s[-1], 1)}
+
+
+def bench_hedge(runs, primary, secondary):
+    os.environ["HOME"] = tempfile.mkdtemp(prefix="bench-tts-")  # cache TTS jetable
+    import tts
+
+    tts._ENGINES = {"primaire": (True, fake_engine(1, *primary)),
+                    "secours": (True, fake_engine(2, *secondary))}
+    tts.TTS_POLICY = {"story": ("primaire", "secours")}
+    tts.RETRY_AFTER_SEC = 0  # chaque appel retente le préféré : on mesure la chaîne seule
+    results = {}
+    for hedge in (False, True):
+        tts._latencies.clear()
+        hedges0, wins0 = tts.hedges, tts.hedge_wins
+        samples, failures = [], 0
+        for i in range(runs):
+            t0 = time.perf_counter()
+            try:
+                tts.synthesize(f"texte {i} {hedge}", hedge=hedge)
+            except tts.TTSUnavailable:
+                failures += 1
+            samples.append((time.perf_counter() - t0) * 1000.0)
+        mode = "couverture" if hedge else "séquentiel"
+        results[mode] = dict(percentiles(samples), failures=failures,
+                             hedges=tts.hedges - hedges0, hedge_wins=tts.hedge_wins - wins0)
+        print(f"{mode:11s} p50 {results[mode]['p50_ms']:7.0f} ms  p95 {results[mode]['p95_ms']:7.0f} ms  "
+              f"p99 {results[mode]['p99_ms']:7.0f} ms  max {results[mode]['max_ms']:7.0f} ms  "
+              f"échecs {failures}  couvertures {results[mode]['hedges']} "
+              f"(gagnées {results[mode]['hedge_wins']})")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--runs", type=int, default=3)
+    parser.add_argument("--engines", default=None, help="liste séparée par des virgules")
+    parser.add_argument("--out", default=None, help="fichier JSON de résultats")
+    parser.add_argument("--fake", action="store_true", help="couverture vs séquentiel, faux moteurs")
+    parser.add_argument("--primary", default="300,4000,0.08",
+                        help="faux moteur préféré : base_ms,blocage_ms,taux")
+    parser.add_argument("--secondary", default="600,4000,0.02", help="faux moteur de secours")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, HERE)
+    if args.fake:
+        primary = [float(x) for x in args.primary.split(",")]
+        secondary = [float(x) for x in args.secondary.split(",")]
+        results = bench_hedge(max(args.runs, 20), primary, secondary)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump({"primary": primary, "secondary": secondary, "modes": results},
+                          f, indent=2, ensure_ascii=False)
+        return 0
+    import tts
+
+    wanted = args.engines.split(",") if args.engines else list(tts._ENGINES)
+    results = {}
+    for name in wanted:
+        ok, fn = tts._ENGINES.get(name, (False, None))
+        if not ok:
+            print(f"[bench] {name:7s} indisponible, ignoré")
+            continue
+        results[name] = bench_engine(name, fn, args.runs)
+
+    print(f"{'moteur':8s} {'texte':11s} {'car.':>5s} {'médiane':>9s} {'min':>9s} {'max':>9s} {'Ko':>6s}")
+    for name, per_text in results.items():
+        for label, r in per_text.items():
+            if r["error"]:
+                print(f"{name:8s} {label:11s} {r['chars']:5d}  échec : {r['error']}")
+                continue
+            print(f"{name:8s} {label:11s} {r['chars']:5d} {r['median_ms']:7.0f} ms "
+                  f"{r['min_ms']:6.0f} ms {r['max_ms']:6.0f} ms {r['bytes'] // 1024:6d}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"runs": args.runs, "policy": tts.TTS_POLICY, "engines": results},
+                      f, indent=2, ensure_ascii=False)
+        print(f"[bench] résultats : {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Magasin de fichiers adressé par clé, plafonné en octets (éviction LRU).
+
+L'ordre LRU est reconstruit au démarrage à partir des mtime ; chaque accès
+touche le fichier (`os.utime`) pour qu'il survive aux redémarrages.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+
+class DiskLRU:
+    def __init__(self, directory, max_bytes, suffix=""):
+        self.directory = directory
+        self.max_bytes = int(max_bytes)
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._index = OrderedDict()  # clé -> taille, du plus ancien au plus récent
+        self._total = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix) or ".part" in name:
+                continue
+            st = os.stat(os.path.join(self.directory, name))
+            key = name[:len(name) - len(self.suffix)] if self.suffix else name
+            entries.append((st.st_mtime, key, st.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total += size
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._index
+
+    def get(self, key):
+        """Chemin du fichier si présent (et le marque récent), sinon None."""
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._drop(key)
+            return None
+        return path
+
+    def put(self, key, write_fn):
+        """`write_fn(tmp_path)` écrit le contenu ; publié atomiquement."""
+        tmp = f"{self.path(key)}.part{threading.get_ident()}"
+        try:
+            write_fn(tmp)
+            return self.add(key, tmp)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def add(self, key, src_path):
+        """Déplace un fichier existant dans le magasin sous `key`."""
+        path = self.path(key)
+        os.replace(src_path, path)
+        size = os.path.getsize(path)
+        with self._lock:
+            self._drop(key, unlink=False)
+            self._index[key] = size
+            self._total += size
+            self._evict()
+        return path
+
+    def _drop(self, key, unlink=True):
+        size = self._index.pop(key, None)
+        if size is None:
+            return
+        self._total -= size
+        if unlink:
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
+
+    def _evict(self):
+        # on garde toujours l'entrée la plus récente, même si elle dépasse le plafond
+        while self._total > self.max_bytes and len(self._index) > 1:
+            key = next(iter(self._index))
+            self._drop(key)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self._index), "bytes": self._total, "max_bytes": self.max_bytes,
+            }
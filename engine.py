@@ -0,0 +1,538 @@
+"""Moteur headless : crépuscule, alertes, SMS programmés, histoires IA.
+
+Aucune dépendance Qt : le HUD n'en est qu'un client d'affichage, et
+`python engine.py` le fait tourner seul sur un serveur sans écran.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import threading
+import traceback
+import subprocess
+from datetime import timezone
+from urllib.parse import urlsplit
+
+import config
+import alerts
+import http_client
+import lazy_import
+import metrics
+import twilight
+import story
+import tasks
+import tts
+import snapshot
+import sms_scheduler
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "twilight_hud")
+OPENAI_API_KEY = getattr(config, "OPENAI_API_KEY", None)
+TWILIGHT_API_URL = getattr(config, "TWILIGHT_API_URL", "https://api.sunrise-sunset.org/json")
+
+_TW_FIELDS = (
+    ("civil_start", "civil_twilight_begin"),
+    ("civil_end", "civil_twilight_end"),
+    ("nautical_start", "nautical_twilight_begin"),
+    ("nautical_end", "nautical_twilight_end"),
+)
+
+
+def twilight_from_results(results):
+    """`results` (API ou moteur local) -> dict de datetimes locales (None si polaire)."""
+    out = {}
+    for key, field in _TW_FIELDS:
+        value = results.get(field)
+        if isinstance(value, str):
+            value = datetime.datetime.fromisoformat(value)
+        out[key] = value.astimezone() if value else None
+    return out
+
+
+def log_http_stats(host):
+    st = http_client.stats().get(host)
+    if st:
+        print(f"[DEBUG] HTTP {host} : {st['requests']} req, {st['connections']} connexions "
+              f"({st['reused']} réutilisées, {st.get('not_modified', 0)} x 304)")
+
+
+# ---------- Crépuscule ----------
+class TwilightService:
+    """Horaires du jour : cache (date, lat, lng), calcul local ou API en fond.
+
+    `tick(now)` est bon marché : il ne fait quelque chose qu'au changement
+    de date/lieu ou pour retenter un miss API après backoff. Le réseau
+    tourne dans un thread dédié ; `on_update()` est appelé (depuis ce
+    thread) quand `current` change.
+    """
+    def __init__(self, on_update=None):
+        self.on_update = on_update
+        self.current = None          # dict de datetimes locales
+        # "local" : moteur solaire en process ; "api" : sunrise-sunset.org
+        self.source = getattr(config, "TWILIGHT_SOURCE", "local")
+        self.crosscheck = bool(getattr(config, "TWILIGHT_API_CROSSCHECK", False))
+        # Cache (date, lat, lng) persistant, pré-rempli sur N jours
+        self.store = twilight.TwilightStore(getattr(
+            config, "TWILIGHT_CACHE_PATH", os.path.join(CACHE_DIR, "twilight.json")
+        ))
+        self.prefill_days = int(getattr(config, "TWILIGHT_PREFILL_DAYS", 7))
+        self._key = None             # (date, lat, lng) affiché
+        self._results = None         # `results` correspondants
+        self._pending_key = None     # clé attendue de l'API (miss)
+        self._fetch_interval_sec = 60  # délai avant de retenter après un échec
+        self._fail_count = 0
+        self._last_fetch = None
+        self._in_flight = False
+        self._settled = threading.Event()  # horaires posés, ou plus de fetch en vol
+        self._settled.set()
+        self._lock = threading.RLock()
+
+    # -------- retries + fetch --------
+    @staticmethod
+    def fetch_with_retries(url, attempts=3, timeout=8, quiet=False, token=None):
+        """`token` (tasks.CancelToken) : chaque essai est borné par l'échéance de la tâche."""
+        last_exc = None
+        for i in range(1, attempts + 1):
+            try:
+                if not quiet:
+                    print(f"[DEBUG] Twilight fetch try {i}/{attempts} …")
+                with metrics.span("twilight.fetch"):
+                    return http_client.get_json(
+                        url, timeout=token.timeout(timeout) if token else timeout
+                    )
+            except tasks.Cancelled:
+                raise
+            except Exception as e:
+                last_exc = e
+                if not quiet:
+                    print(f"[WARN] Twilight fetch failed (try {i}) : {e}")
+        if last_exc:
+            raise last_exc
+
+    @staticmethod
+    def url(key):
+        day, lat, lng = key
+        return f"{TWILIGHT_API_URL}?lat={lat}&lng={lng}&formatted=0&date={day.isoformat()}"
+
+    @property
+    def pending(self):
+        """Horaires du jour attendus de l'API (retry après backoff sur `tick`)."""
+        return self._pending_key is not None
+
+    def _start_fetch(self, keys):
+        """Un seul fetch en vol (exécuteur partagé) ; on s'arrête au premier échec."""
+        self._in_flight = True
+        self._settled.clear()
+        self._last_fetch = time.monotonic()
+        quiet = self._fail_count > 0
+
+        def _run(token):
+            try:
+                for key in keys:
+                    try:
+                        data = self.fetch_with_retries(self.url(key), attempts=3, timeout=8,
+                                                       quiet=quiet, token=token)
+                        self._on_fetched(key, data["results"])
+                    except tasks.Cancelled:
+                        raise  # échéance dépassée : le tick retentera après backoff
+                    except Exception:
+                        self._on_failed(key, traceback.format_exc())
+                        break
+            finally:
+                self._fetch_done()
+
+        tasks.executor.submit("twilight", _run, key="twilight",
+                              on_drop=lambda reason: self._fetch_done())
+
+    def _fetch_done(self):
+        with self._lock:
+            self._in_flight = False
+            self.store.save()
+        self._settled.set()
+        log_http_stats(urlsplit(TWILIGHT_API_URL).hostname)
+
+    def tick(self, now=None):
+        now = now or datetime.datetime.now(timezone.utc).astimezone()
+        key = (now.date(), config.LATITUDE, config.LONGITUDE)
+        with self._lock:
+            if key != self._key:
+                self._refresh(key)
+            elif self._pending_key and not self._in_flight:
+                # miss API en échec : on retente après backoff
+                if time.monotonic() - self._last_fetch >= self._fetch_interval_sec:
+                    self._start_fetch([self._pending_key])
+        return self.current
+
+    def _refresh(self, key):
+        """Changement de date ou de lieu : cache, sinon calcul local / fetch."""
+        day, lat, lng = key
+        self._key = key
+        results = self.store.get(day, lat, lng)
+        if results is None and self.source == "local":
+            results = twilight.to_results(twilight.twilight_times(day, lat, lng))
+            self.store.put(day, lat, lng, results)
+        if results is not None:
+            self._apply(results)
+
+        # Pré-remplissage des N jours suivants
+        upcoming = self.store.missing(day, self.prefill_days + 1, lat, lng)
+        to_fetch = []
+        if self.source == "local":
+            for d in upcoming:
+                self.store.put(d, lat, lng, twilight.to_results(twilight.twilight_times(d, lat, lng)))
+            if self.crosscheck:
+                to_fetch.append(key)
+        else:
+            self._pending_key = key if results is None else None
+            to_fetch = [(d, lat, lng) for d in upcoming]
+        self.store.save(today=day)
+
+        st = self.store.stats()
+        print(f"[DEBUG] Cache crépuscule : hits={st['hits']} misses={st['misses']} "
+              f"entrées={st['entries']}")
+        if to_fetch and not self._in_flight:
+            self._start_fetch(to_fetch)
+
+    def export_state(self):
+        """Jeu d'horaires affiché, pour l'instantané de démarrage (None si aucun)."""
+        with self._lock:
+            if self._key is None or self._results is None:
+                return None
+            day, lat, lng = self._key
+            return {"date": day.isoformat(), "lat": lat, "lng": lng, "results": self._results}
+
+    def restore(self, state, now=None):
+        """Affiche tout de suite le jeu de l'instantané s'il vaut pour aujourd'hui et ce lieu.
+
+        Le premier `tick` refait ensuite le chemin normal (cache, pré-remplissage).
+        """
+        if not state:
+            return False
+        now = now or datetime.datetime.now(timezone.utc).astimezone()
+        day = now.date()
+        if (state.get("date"), state.get("lat"), state.get("lng")) != (
+                day.isoformat(), config.LATITUDE, config.LONGITUDE):
+            return False
+        with self._lock:
+            if self.current is not None:
+                return False
+            if self.store.get(day, config.LATITUDE, config.LONGITUDE) is None:
+                self.store.put(day, config.LATITUDE, config.LONGITUDE, state["results"])
+            self._apply(state["results"])
+        return True
+
+    def wait(self, timeout):
+        """Sans horaires affichés, attend le fetch en vol (au plus `timeout` s) ; renvoie `current`."""
+        if self.current is None:
+            self._settled.wait(timeout)
+        return self.current
+
+    def _apply(self, results):
+        self._results = results
+        self.current = twilight_from_results(results)
+        self._settled.set()
+        if self.on_update:
+            self.on_update()
+
+    def _on_fetched(self, key, results):
+        with self._lock:
+            self._fail_count = 0  # reset ok
+            self._fetch_interval_sec = 60
+            if self.source == "api":
+                self.store.put(*key, results)
+                if key == self._pending_key:
+                    self._pending_key = None
+                if key == self._key:
+                    self._apply(results)
+            elif key == self._key and self._results is not None:
+                # simple contrôle croisé : l'affichage reste sur le calcul local
+                delta = twilight.cross_check(results, self._results)
+                print(f"[DEBUG] Crépuscule local vs API : écart max {delta:.0f} s")
+
+    def _on_failed(self, key, tb):
+        with self._lock:
+            if key != self._pending_key:
+                print(f"[WARN] Pré-remplissage crépuscule interrompu ({key[0]})")
+                return
+            self._fail_count += 1
+            # backoff léger si ça échoue souvent
+            self._fetch_interval_sec = min(300, 60 + self._fail_count * 30)
+            if self.current:
+                # On garde le dernier affichage
+                print(f"[WARN] API crépuscule KO, usage du cache (échec #{self._fail_count})")
+            else:
+                print("[ERROR] Erreur récupération horaires :", tb)
+
+
+# ---------- Moteur ----------
+class AssistantEngine:
+    """Toute la logique non-UI ; les callbacks sont appelés depuis des threads de fond."""
+    def __init__(self, on_twilight=None, on_sms_result=None, on_story_change=None, on_speak=None):
+        self.on_twilight = on_twilight
+        self.on_speak = on_speak  # on_speak(texte) : action "tts" des alertes
+        self.twilight = TwilightService(on_update=self._on_twilight_update)
+
+        # Alertes : instants exacts recalculés à chaque nouveau jeu d'horaires
+        self.alerts = alerts.AlertScheduler(self._on_alert)
+        self.alert_actions = tuple(getattr(config, "ALERT_ACTIONS", ("log",)))
+
+        # SMS : file persistante (SQLite), un seul réveil pour la prochaine échéance
+        self.sms = sms_scheduler.SmsScheduler(
+            getattr(config, "SMS_DB_PATH", os.path.join(CACHE_DIR, "sms.sqlite3")),
+            workers=int(getattr(config, "SMS_WORKERS", 2)),
+            rate_per_sec=float(getattr(config, "SMS_RATE_PER_SEC", 1.0)),
+            on_result=on_sms_result or self._log_sms_result,
+        )
+
+        # OpenAI client v1 (créé au premier appel : `openai` est lourd à importer)
+        self.story_client = None
+        if story.OPENAI_V1 and OPENAI_API_KEY:
+            self.story_client = story.LazyClient(OPENAI_API_KEY)
+
+        # Réserve d'histoires prêtes à jouer (remplie en fond, persistée)
+        self.story_buffer = None
+        if self.story_client is not None:
+            self.story_buffer = story.StoryBuffer(
+                self.story_client,
+                getattr(config, "STORY_BUFFER_PATH", os.path.join(CACHE_DIR, "stories.json")),
+                capacity=int(getattr(config, "STORY_BUFFER_SIZE", 2)),
+                on_change=on_story_change,
+            )
+        self.story_running = False
+
+        if snapshot.state is not None:
+            snapshot.state.register("twilight", self.twilight.export_state)
+
+    def warm_start(self):
+        """Horaires du dernier lancement (instantané) : affichés et alertes planifiées d'emblée."""
+        if snapshot.state is None or not snapshot.state.load():
+            return False
+        return self.twilight.restore(snapshot.state.section("twilight"))
+
+    def start(self):
+        self.alerts.start()
+        self.sms.start()
+        if self.story_buffer is not None:
+            self.story_buffer.start()
+
+    # -------- alertes --------
+    def _on_twilight_update(self):
+        self.alerts.plan(self.twilight.current)
+        if snapshot.state is not None:
+            snapshot.state.mark_dirty()
+        if self.on_twilight:
+            self.on_twilight()
+
+    def _on_alert(self, message, event, minutes):
+        """Actions selon config.ALERT_ACTIONS : "log", "tts", "sms"."""
+        print(message)
+        if "tts" in self.alert_actions and self.on_speak:
+            self.on_speak(message.lstrip("⚠ "))
+        if "sms" in self.alert_actions and sms_scheduler.twilio_configured():
+            self.sms.schedule(message, time.time())
+
+    # -------- SMS --------
+    @staticmethod
+    def _log_sms_result(job_id, recipient, ok, detail):
+        if ok:
+            print(f"[DEBUG] SMS envoyé : {detail} (#{job_id} -> {recipient})")
+        else:
+            print(f"[ERROR] SMS #{job_id} -> {recipient} non envoyé : {detail}")
+
+    # -------- histoires --------
+    def start_story(self, on_audio, on_done, priority=tasks.BACKGROUND):
+        """Lance une histoire en fond (réserve, sinon génération streaming).
+
+        `on_audio(path, engine)` pour chaque passage dans l'ordre, puis
+        `on_done(stats)` (`stats` vaut None pour une histoire de la réserve,
+        en cas d'échec ou si la tâche expire en file). Renvoie False si rien
+        n'a pu être lancé.
+        """
+        if self.story_client is None:
+            print("[ERROR] OpenAI v1 indisponible ou clé absente (config.OPENAI_API_KEY)")
+            return False
+        if self.story_running:
+            print("[WARN] Histoire déjà en cours de génération")
+            return False
+
+        item = self.story_buffer.pop() if self.story_buffer is not None else None
+        if item is not None:
+            if self.story_buffer is not None:
+                self.story_buffer.set_idle(False)
+            print("\n📖 Histoire (réserve) :\n", item["story"])
+
+            def _emit_chunks(token):
+                try:
+                    for chunk in item["chunks"]:
+                        on_audio(*story.chunk_audio(chunk))
+                except tts.TTSUnavailable as e:
+                    print(f"[WARN] {e}")
+                except Exception:
+                    print("[ERROR] Lecture histoire (réserve) :", traceback.format_exc())
+                finally:
+                    on_done(None)  # HUD au repos et réserve relancée quoi qu'il arrive
+            tasks.executor.submit("story", _emit_chunks, priority=priority,
+                                  on_drop=lambda reason: on_done(None))
+            return True
+
+        self.story_running = True
+        if self.story_buffer is not None:
+            self.story_buffer.set_idle(False)
+        pipeline = story.StoryPipeline(
+            self.story_client,
+            on_audio=lambda i, path, engine, text: on_audio(path, engine),
+        )
+
+        def _run(token):
+            stats = None
+            try:
+                stats = pipeline.run(story.story_prompt())
+                print("\n📖 Nouvelle histoire générée :\n", stats["story"])
+                print(format_story_stats(stats))
+            except Exception:
+                print("[ERROR] Erreur génération histoire :", traceback.format_exc())
+            self._story_done(on_done, stats)
+
+        tasks.executor.submit("story", _run, priority=priority,
+                              on_drop=lambda reason: self._story_done(on_done, None))
+        return True
+
+    def _story_done(self, on_done, stats):
+        self.story_running = False
+        on_done(stats)
+
+
+def format_story_stats(stats):
+    fmt = lambda v: "-" if v is None else f"{v:.0f} ms"  # noqa: E731
+    return (f"[DEBUG] Histoire : 1er token {fmt(stats['first_token_ms'])}, "
+            f"1re phrase {fmt(stats['first_sentence_ms'])}, "
+            f"1er audio prêt {fmt(stats['first_audio_ms'])}, "
+            f"{stats['chunks']} passages, total {fmt(stats['total_ms'])}")
+
+
+# ---------- Démon ----------
+class HeadlessAudio:
+    """Joue les fichiers audio (MP3, WAV du moteur local) dans l'ordre via une commande
+    externe (config.HEADLESS_PLAYER_CMD)."""
+    def __init__(self, cmd=None):
+        self.cmd = cmd if cmd is not None else getattr(config, "HEADLESS_PLAYER_CMD", None)
+        self._files = []
+        self._cond = threading.Condition()
+        if self.cmd:
+            threading.Thread(target=self._run, daemon=True, name="headless-audio").start()
+
+    def play(self, path, engine):
+        if not self.cmd:
+            print(f"[DEBUG] Audio prêt ({engine}) : {path}")
+            return
+        with self._cond:
+            self._files.append(path)
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._files:
+                    self._cond.wait()
+                path = self._files.pop(0)
+            try:
+                subprocess.run(list(self.cmd) + [path], check=False)
+            except Exception:
+                print("[ERROR] Lecture audio headless :", traceback.format_exc())
+
+
+def rss_kb():
+    """Pic de mémoire résidente du process (Ko), None si indisponible."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if sys.platform == "darwin" else peak
+    except ImportError:
+        return None
+
+
+def next_local_midnight_ts():
+    tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+    # mktime(isdst=-1) : minuit local réel, même un jour de changement d'heure
+    return time.mktime((tomorrow.year, tomorrow.month, tomorrow.day, 0, 0, 1, 0, 0, -1))
+
+
+def run_daemon(stories=True):
+    audio = HeadlessAudio()
+
+    def speak(text):
+        try:
+            audio.play(*tts.synthesize(text, purpose="alert"))
+        except tts.TTSUnavailable as e:
+            print(f"[WARN] {e}")
+
+    engine = AssistantEngine(on_speak=lambda text: threading.Thread(
+        target=speak, args=(text,), daemon=True).start())
+    engine.warm_start()  # alertes planifiées sans attendre le premier tick
+    engine.start()
+    metrics.serve()
+    lazy_import.warm_up()
+    story_every = float(getattr(config, "STORY_INTERVAL_SEC", 600))
+    next_story = time.monotonic() + story_every
+    print("[DEBUG] Moteur headless démarré")
+    stop = threading.Event()
+    while not stop.is_set():
+        engine.twilight.tick()
+        engine.alerts.check_clock()
+        if stories and time.monotonic() >= next_story:
+            next_story = time.monotonic() + story_every
+            engine.start_story(audio.play, lambda stats: None)
+        # les alertes ont leur propre thread : on ne se réveille que pour
+        # minuit (nouveaux horaires), l'histoire suivante ou un retry API
+        wait = next_local_midnight_ts() - time.time()
+        if stories:
+            wait = min(wait, next_story - time.monotonic())
+        if engine.twilight.pending:
+            wait = min(wait, 60)
+        stop.wait(max(1.0, wait))
+
+
+def print_today(timeout=30.0):
+    """`--once` : horaires du jour (API attendue si besoin, sinon moteur local) ; code de sortie."""
+    service = TwilightService()
+    current = service.tick() or service.wait(timeout)
+    if current is None:
+        print("[WARN] Horaires API indisponibles, calcul local")
+        day = datetime.datetime.now(timezone.utc).astimezone().date()
+        try:
+            current = twilight_from_results(twilight.to_results(
+                twilight.twilight_times(day, config.LATITUDE, config.LONGITUDE)))
+        except Exception:
+            print("[ERROR] Calcul crépuscule local :", traceback.format_exc())
+    if current is None:
+        print("[ERROR] Aucun horaire crépuscule disponible")
+        return 1
+    for key, value in current.items():
+        print(f"{key} : {value.strftime('%H:%M') if value else '--:--'}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Twilight HUD — moteur headless (sans Qt)")
+    parser.add_argument("--once", action="store_true", help="affiche les horaires du jour puis quitte")
+    parser.add_argument("--no-stories", action="store_true", help="pas d'histoire automatique")
+    parser.add_argument("--bench-startup", action="store_true",
+                        help="initialise le moteur, affiche RSS en JSON puis quitte")
+    args = parser.parse_args(argv)
+
+    if args.bench_startup:
+        AssistantEngine()
+        print(json.dumps({"mode": "headless", "rss_kb": rss_kb()}), flush=True)
+        return 0
+    if args.once:
+        return print_today()
+    try:
+        run_daemon(stories=not args.no_stories)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
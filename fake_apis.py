@@ -0,0 +1,289 @@
+"""Faux serveurs locaux pour chaque API externe (bancs de mesure hors réseau).
+
+sunrise-sunset, YouTube Data API (search), OpenAI chat completions (SSE),
+Google Cloud TTS (REST `text:synthesize`) et Twilio (Messages). Chaque
+service a sa latence, sa gigue et son taux d'échec (HTTP 503) réglables,
+et compte ses requêtes.
+
+    apis = FakeAPIs(latency_ms=80, jitter_ms=40, fail_rate=0.02).start()
+    apis.config_overrides()   # -> clés config.* pointant vers les faux
+
+`FakeMedia` imite googlevideo : requêtes Range, débit limité, micro-coupures
+et URL signées qui expirent (HTTP 403), pour bench_proxy.py.
+"""
+import json
+import time
+import base64
+import random
+import datetime
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+# quelques octets "MP3" (en-tête ID3 vide) : assez pour le cache TTS
+FAKE_MP3 = b"ID3\x03\x00\x00\x00\x00\x00\x00" + b"\x00" * 2048
+STORY_TEXT = (
+    "Il était une fois une lanterne qui refusait de s'éteindre. "
+    "Chaque soir, elle guettait le crépuscule nautique au bout du port. "
+    "Les marins la saluaient en rentrant, sans savoir qu'elle comptait les minutes. "
+    "Une nuit, la mer se tut, et la lanterne comprit qu'elle veillait pour elle-même. "
+    "Au matin, elle brillait encore, un peu plus fière qu'hier."
+)
+
+
+class FakeService:
+    """Un serveur HTTP ; `routes` : {(méthode, préfixe de chemin): handler(req, query, body)}."""
+    def __init__(self, name, routes, latency_ms=50, jitter_ms=0, fail_rate=0.0, seed=0):
+        self.name = name
+        self.routes = routes
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.fail_rate = fail_rate
+        self.requests = 0
+        self.failures = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.server = None
+
+    def delay(self):
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+            fail = self._rng.random() < self.fail_rate
+            self.requests += 1
+            self.failures += fail
+        time.sleep(max(0.0, self.latency_ms + jitter) / 1000.0)
+        return fail
+
+    def start(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, comme les vraies API
+
+            def handle(self):
+                try:
+                    super().handle()
+                except ConnectionError:
+                    pass  # client parti au milieu d'une réponse
+
+            def _dispatch(self, method):
+                parts = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                for (m, prefix), fn in service.routes.items():
+                    if m == method and parts.path.startswith(prefix):
+                        break
+                else:
+                    self._send(404, "application/json", b'{"error": "not found"}')
+                    return
+                if service.delay():
+                    self._send(503, "application/json", b'{"error": "injected failure"}')
+                    return
+                fn(self, parse_qs(parts.query), body)
+
+            def _send(self, status, ctype, data):
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def send_json(self, obj, status=200):
+                self._send(status, "application/json", json.dumps(obj).encode("utf-8"))
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def log_message(self, fmt, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True,
+                         name=f"fake-{self.name}").start()
+        return self
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def stats(self):
+        return {"requests": self.requests, "failures": self.failures}
+
+
+# ---------- Réponses de chaque API ----------
+def _sunrise(req, query, body):
+    import twilight  # importe config : écrit par le banc une fois les ports connus
+    day = datetime.date.fromisoformat(query["date"][0])
+    lat, lng = float(query["lat"][0]), float(query["lng"][0])
+    results = twilight.to_results(twilight.twilight_times(day, lat, lng))
+    req.send_json({"results": results, "status": "OK"})
+
+
+def _youtube_search(req, query, body):
+    q = query.get("q", [""])[0]
+    page = int(query.get("pageToken", ["0"])[0] or 0)
+    size = int(query.get("maxResults", ["25"])[0])
+    items = [{
+        "id": {"kind": "youtube#video", "videoId": f"v{abs(hash(q)) % 10**6:06d}{page * size + i:05d}"},
+        "snippet": {"title": f"{q} — résultat {page * size + i + 1}"},
+    } for i in range(size)]
+    req.send_json({"items": items, "nextPageToken": str(page + 1) if page < 3 else None})
+
+
+def _openai_chat(req, query, body, token_delay_ms=15):
+    payload = json.loads(body or b"{}")
+    words = STORY_TEXT.split(" ")
+    if not payload.get("stream"):
+        req.send_json({"choices": [{"index": 0, "message": {"role": "assistant", "content": STORY_TEXT}}]})
+        return
+    req.send_response(200)
+    req.send_header("Content-Type", "text/event-stream")
+    req.send_header("Connection", "close")
+    req.end_headers()
+    for i, word in enumerate(words):
+        chunk = {
+            "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+            "model": payload.get("model", "fake"),
+            "choices": [{"index": 0, "delta": {"content": word + (" " if i < len(words) - 1 else "")},
+                         "finish_reason": None}],
+        }
+        req.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        req.wfile.flush()
+        time.sleep(token_delay_ms / 1000.0)
+    req.wfile.write(b"data: [DONE]\n\n")
+    req.wfile.flush()
+    req.close_connection = True
+
+
+def _gcloud_tts(req, query, body):
+    req.send_json({"audioContent": base64.b64encode(FAKE_MP3).decode("ascii")})
+
+
+def _twilio_message(req, query, body):
+    form = parse_qs(body.decode("utf-8"))
+    req.send_json({
+        "sid": f"SM{random.getrandbits(64):016x}", "status": "queued",
+        "to": form.get("To", [""])[0], "from": form.get("From", [""])[0],
+        "body": form.get("Body", [""])[0],
+    }, status=201)
+
+
+class FakeMedia:
+    """Fichier média servi par plages, à débit et coupures réglables.
+
+    `url(video_id)` renvoie une URL valable `expire_after_s` secondes
+    (paramètre `expire`, comme googlevideo) ; au-delà : 403.
+    """
+    def __init__(self, size=4 * 1024 * 1024, first_byte_ms=300, kbps=4000,
+                 hiccup_rate=0.0, hiccup_ms=800, expire_after_s=None, seed=0):
+        self.data = random.Random(seed).randbytes(size)
+        self.kbps = kbps
+        self.hiccup_rate = hiccup_rate
+        self.hiccup_ms = hiccup_ms
+        self.expire_after_s = expire_after_s
+        self.expired = 0
+        self._rng = random.Random(seed + 1)
+        self.service = FakeService("media", {("GET", "/videoplayback"): self._serve},
+                                   latency_ms=first_byte_ms, seed=seed)
+
+    def start(self):
+        self.service.start()
+        return self
+
+    def stop(self):
+        self.service.stop()
+
+    def url(self, video_id):
+        expire = time.time() + self.expire_after_s if self.expire_after_s else 0
+        return f"{self.service.base_url}/videoplayback?id={video_id}&expire={expire:.3f}"
+
+    def _serve(self, req, query, body):
+        expire = float(query.get("expire", ["0"])[0])
+        if expire and time.time() > expire:
+            self.expired += 1
+            req._send(403, "text/plain", b"expired")
+            return
+        size = len(self.data)
+        start, end = 0, size - 1
+        spec = req.headers.get("Range", "")
+        if spec.startswith("bytes="):
+            first, _, last = spec[6:].partition("-")
+            start = int(first or 0)
+            end = min(size - 1, int(last)) if last else size - 1
+        req.send_response(206 if spec else 200)
+        req.send_header("Content-Type", "audio/mp4")
+        req.send_header("Accept-Ranges", "bytes")
+        req.send_header("Content-Length", str(end - start + 1))
+        if spec:
+            req.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        req.end_headers()
+        block = 16 * 1024
+        pause = block / (self.kbps * 1024 / 8)
+        try:
+            for pos in range(start, end + 1, block):
+                req.wfile.write(self.data[pos:min(end + 1, pos + block)])
+                with self.service._lock:
+                    hiccup = self._rng.random() < self.hiccup_rate
+                time.sleep(pause + (self.hiccup_ms / 1000.0 if hiccup else 0.0))
+        except (BrokenPipeError, ConnectionResetError):
+            req.close_connection = True  # client parti (seek, arrêt)
+
+
+class FakeAPIs:
+    """Les cinq faux services, mêmes réglages de latence/gigue/échecs pour tous."""
+    def __init__(self, latency_ms=50, jitter_ms=20, fail_rate=0.0, seed=0, token_delay_ms=15):
+        common = dict(latency_ms=latency_ms, jitter_ms=jitter_ms, fail_rate=fail_rate)
+        self.services = {
+            "sunrise": FakeService("sunrise", {("GET", "/json"): _sunrise}, seed=seed, **common),
+            "youtube": FakeService("youtube", {("GET", "/youtube/v3/search"): _youtube_search},
+                                   seed=seed + 1, **common),
+            "openai": FakeService("openai", {("POST", "/v1/chat/completions"): (
+                lambda req, q, b: _openai_chat(req, q, b, token_delay_ms))}, seed=seed + 2, **common),
+            "gcloud_tts": FakeService("gcloud_tts", {("POST", "/v1/text:synthesize"): _gcloud_tts},
+                                      seed=seed + 3, **common),
+            "twilio": FakeService("twilio", {("POST", "/2010-04-01/Accounts/"): _twilio_message},
+                                  seed=seed + 4, **common),
+        }
+
+    def start(self):
+        for service in self.services.values():
+            service.start()
+        return self
+
+    def stop(self):
+        for service in self.services.values():
+            service.stop()
+
+    def url(self, name):
+        return self.services[name].base_url
+
+    def config_overrides(self):
+        """Valeurs `config.*` à injecter pour que l'appli ne parle qu'aux faux."""
+        return {
+            "TWILIGHT_SOURCE": "api",
+            "TWILIGHT_API_URL": self.url("sunrise") + "/json",
+            "YOUTUBE_API_KEY": "fake-youtube-key",
+            "YOUTUBE_SEARCH_URL": self.url("youtube") + "/youtube/v3/search",
+            "OPENAI_API_KEY": "sk-fake",
+            "OPENAI_BASE_URL": self.url("openai") + "/v1",
+            "GCP_TTS_ENDPOINT": self.url("gcloud_tts"),
+            "TWILIO_ACCOUNT_SID": "ACfake",
+            "TWILIO_AUTH_TOKEN": "fake-token",
+            "TWILIO_PHONE_NUMBER": "+15005550006",
+            "DEST_PHONE_NUMBER": "+15005550001",
+            "TWILIO_API_BASE_URL": self.url("twilio"),
+            # ni gTTS (vrai réseau, sans faux) ni espeak : toute synthèse passe par le faux
+            "TTS_POLICY": {"story": ("gcloud",), "alert": ("gcloud",)},
+        }
+
+    def stats(self):
+        return {name: s.stats() for name, s in self.services.items()}
@@ -0,0 +1,125 @@
+"""Client HTTP partagé : keep-alive, pool par hôte, gzip, requêtes conditionnelles.
+
+Un seul `requests.Session` pour tout le process : les appels répétés vers
+un même hôte (sunrise-sunset, googleapis, ...) réutilisent la connexion
+TCP/TLS déjà ouverte au lieu de refaire DNS + handshakes.
+"""
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+
+POOL_CONNECTIONS = int(getattr(config, "HTTP_POOL_HOSTS", 8))       # hôtes gardés en pool
+POOL_MAXSIZE = int(getattr(config, "HTTP_POOL_PER_HOST", 4))        # connexions / hôte
+USER_AGENT = "TwilightHUD/1.0"
+VALIDATORS_MAX = int(getattr(config, "HTTP_VALIDATORS_MAX", 64))   # réponses gardées pour les 304
+
+_session = None
+_session_lock = threading.Lock()
+
+# Validateurs HTTP par URL complète : url -> (etag, last_modified, json), LRU borné
+_validators = OrderedDict()
+_validators_lock = threading.Lock()
+_not_modified = {}  # hôte -> nb de réponses 304
+
+
+def session():
+    """Session partagée (créée au premier appel)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            s.headers.update({
+                "User-Agent": USER_AGENT,
+                "Accept-Encoding": "gzip, deflate",
+                "Connection": "keep-alive",
+            })
+            _session = s
+        return _session
+
+
+def get(url, params=None, timeout=8, headers=None, **kwargs):
+    """GET via la session partagée (retourne la `requests.Response`)."""
+    return session().get(url, params=params, timeout=timeout, headers=headers, **kwargs)
+
+
+def get_json(url, params=None, timeout=8, conditional=True):
+    """GET JSON ; si `conditional`, envoie ETag / If-Modified-Since.
+
+    Sur un 304, renvoie le JSON mis en cache lors de la réponse précédente
+    (au plus `HTTP_VALIDATORS_MAX` URLs gardées, les moins récentes sortent).
+    À réserver aux URLs stables : une URL à clé API ou à jeton de page
+    remplirait le cache pour rien.
+    """
+    full_url = requests.Request("GET", url, params=params).prepare().url
+    headers = {}
+    cached = None
+    if conditional:
+        with _validators_lock:
+            cached = _validators.get(full_url)
+            if cached:
+                _validators.move_to_end(full_url)
+        if cached:
+            etag, last_modified, _ = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+    resp = get(full_url, timeout=timeout, headers=headers)
+    if resp.status_code == 304 and cached:
+        host = urlsplit(full_url).hostname
+        with _validators_lock:
+            _not_modified[host] = _not_modified.get(host, 0) + 1
+        return cached[2]
+    resp.raise_for_status()
+    data = resp.json()
+
+    if conditional:
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
+        if etag or last_modified:
+            with _validators_lock:
+                _validators[full_url] = (etag, last_modified, data)
+                _validators.move_to_end(full_url)
+                while len(_validators) > VALIDATORS_MAX:
+                    _validators.popitem(last=False)
+    return data
+
+
+def stats():
+    """Réutilisation des connexions par hôte.
+
+    `requests` = requêtes servies par le pool, `connections` = connexions
+    réellement ouvertes ; `reused` = requests - connections.
+    """
+    out = {}
+    s = _session
+    if s is None:
+        return out
+    seen = set()
+    for adapter in s.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            entry = out.setdefault(pool.host, {"requests": 0, "connections": 0, "reused": 0})
+            entry["requests"] += pool.num_requests
+            entry["connections"] += pool.num_connections
+    with _validators_lock:
+        for host, n in _not_modified.items():
+            out.setdefault(host, {"requests": 0, "connections": 0, "reused": 0})["not_modified"] = n
+    for entry in out.values():
+        entry["reused"] = max(0, entry["requests"] - entry["connections"])
+    return out
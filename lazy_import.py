@@ -0,0 +1,63 @@
+"""Imports paresseux des dépendances lourdes (yt-dlp, OpenAI, Twilio, TTS).
+
+`available()` répond sans importer (simple recherche du module), `load()`
+importe au premier usage, une seule fois ; `warm_up()` précharge en fond
+une fois la fenêtre affichée, pour que le premier clic ne paie pas l'import.
+"""
+import time
+import importlib
+import importlib.util
+import threading
+import traceback
+
+import config
+
+HEAVY_MODULES = ("yt_dlp", "openai", "twilio.rest", "gtts", "google.cloud.texttospeech")
+
+_modules = {}
+_lock = threading.Lock()
+import_ms = {}  # module -> durée de l'import effectif
+
+
+def available(name):
+    """Module installé ? (sans l'importer ; seuls les paquets parents le sont)."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def load(name):
+    """Importe `name` au premier appel puis le renvoie depuis le cache."""
+    module = _modules.get(name)
+    if module is not None:
+        return module
+    with _lock:
+        module = _modules.get(name)
+        if module is None:
+            t0 = time.perf_counter()
+            module = importlib.import_module(name)
+            import_ms[name] = (time.perf_counter() - t0) * 1000.0
+            _modules[name] = module
+    return module
+
+
+def warm_up(names=None):
+    """Précharge `names` (défaut : config.WARMUP_MODULES) dans un thread de fond."""
+    if names is None:
+        names = getattr(config, "WARMUP_MODULES", HEAVY_MODULES)
+    names = [n for n in names if n not in _modules and available(n)]
+    if not names:
+        return None
+
+    def _run():
+        for name in names:
+            try:
+                load(name)
+            except Exception:
+                print(f"[WARN] Préchargement {name} échoué :", traceback.format_exc())
+        print("[DEBUG] Préchargement : " + ", ".join(
+            f"{n} {import_ms[n]:.0f} ms" for n in names if n in import_ms))
+    thread = threading.Thread(target=_run, daemon=True, name="warm-up")
+    thread.start()
+    return thread
@@ -0,0 +1,136 @@
+"""Pipeline de logs : ring buffer borné + sink fichier rotatif asynchrone.
+
+`LogStream` remplace sys.stdout/sys.stderr : les écritures sont découpées
+en lignes (tampon par thread), horodatées (chaîne mise en cache à la
+seconde) puis poussées dans un `deque(maxlen=...)` (append/popleft
+atomiques, sans verrou). La console Qt vide ce ring par lots ; un thread
+dédié écrit le fichier.
+"""
+import os
+import time
+import queue
+import threading
+import logging.handlers
+from collections import deque
+
+import config
+
+
+class LogPipeline:
+    def __init__(self, ring_size=10000, on_pending=None):
+        self.ring_size = ring_size
+        self.on_pending = on_pending  # appelé (une fois par lot) quand le ring se remplit
+        self._ring = deque(maxlen=ring_size)
+        self._armed = False
+        self._sinks = []
+        self._stamp_sec = None
+        self._stamp = ""
+        self.lines = 0
+        self.dropped = 0
+        self._t0 = time.monotonic()
+
+    def add_sink(self, sink):
+        self._sinks.append(sink)
+
+    def _timestamp(self):
+        sec = int(time.time())
+        if sec != self._stamp_sec:
+            self._stamp = time.strftime("[%H:%M:%S] ", time.localtime(sec))
+            self._stamp_sec = sec
+        return self._stamp
+
+    def push(self, text):
+        """Ajoute une entrée (éventuellement multi-lignes) horodatée."""
+        line = self._timestamp() + text
+        if len(self._ring) == self.ring_size:
+            self.dropped += 1
+        self._ring.append(line)
+        self.lines += 1
+        for sink in self._sinks:
+            sink.put(line)
+        if not self._armed:
+            self._armed = True
+            if self.on_pending:
+                self.on_pending()
+
+    def drain(self, max_lines=None):
+        """Retire jusqu'à `max_lines` entrées (thread consommateur unique)."""
+        self._armed = False
+        out = []
+        ring = self._ring
+        while ring and (max_lines is None or len(out) < max_lines):
+            out.append(ring.popleft())
+        if ring:
+            self._armed = True  # reste du travail : le consommateur doit revenir
+        return out
+
+    def stats(self):
+        elapsed = max(1e-9, time.monotonic() - self._t0)
+        return {
+            "lines": self.lines,
+            "dropped": self.dropped,
+            "pending": len(self._ring),
+            "lines_per_sec": self.lines / elapsed,
+        }
+
+
+class LogStream:
+    """Objet fichier (write/flush) ; une entrée par ligne complète."""
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self._local = threading.local()
+
+    def write(self, text):
+        if not text:
+            return
+        buf = getattr(self._local, "buf", "") + text
+        if "\n" not in buf:
+            self._local.buf = buf
+            return
+        complete, _, rest = buf.rpartition("\n")
+        self._local.buf = rest
+        complete = complete.strip()
+        if complete:
+            self.pipeline.push(complete)
+
+    def flush(self):
+        buf = getattr(self._local, "buf", "")
+        self._local.buf = ""
+        if buf.strip():
+            self.pipeline.push(buf.strip())
+
+
+class RotatingFileSink:
+    """Écrit les lignes dans un fichier rotatif depuis son propre thread."""
+    def __init__(self, path, max_bytes=5 * 1024 * 1024, backups=3):
+        self._queue = queue.SimpleQueue()
+        self._handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True
+        )
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+        threading.Thread(target=self._run, daemon=True, name="log-file").start()
+
+    def put(self, line):
+        self._queue.put(line)
+
+    def _run(self):
+        while True:
+            line = self._queue.get()
+            try:
+                self._handler.emit(logging.makeLogRecord({"msg": line}))
+            except Exception:
+                pass  # un log ne doit jamais faire tomber l'appli
+
+
+def file_sink_from_config():
+    """Sink fichier selon config.LOG_FILE (None/"" pour désactiver)."""
+    path = getattr(config, "LOG_FILE", os.path.join(
+        os.path.expanduser("~"), ".cache", "twilight_hud", "hud.log"))
+    if not path:
+        return None
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return RotatingFileSink(
+        path,
+        max_bytes=int(getattr(config, "LOG_FILE_MAX_BYTES", 5 * 1024 * 1024)),
+        backups=int(getattr(config, "LOG_FILE_BACKUPS", 3)),
+    )
@@ -0,0 +1,536 @@
+"""Proxy HTTP local (127.0.0.1) entre `QMediaPlayer` et les URL googlevideo.
+
+Le lecteur lit `http://127.0.0.1:<port>/stream/<videoId>` au lieu de l'URL
+distante. Pour chaque flux, un thread télécharge en avance (fenêtre
+`MEDIA_PROXY_READAHEAD_BYTES` devant la position lue) dans un fichier
+creux sur disque découpé en blocs ; les requêtes Range du lecteur sont
+servies depuis ce fichier dès que les blocs sont là. Un retour arrière
+ou un nouveau départ du même morceau ne touche plus le réseau.
+
+Si l'URL amont expire (403/404/410), elle est re-résolue via `resolve`
+et le téléchargement reprend au même octet : la lecture ne s'arrête pas.
+Le fichier d'un flux est découpé en segments (`SEGMENT`) pour pouvoir
+rendre de la place en cours de lecture. Le disque est plafonné
+(`MEDIA_PROXY_MAX_BYTES`) pendant le téléchargement : au-delà, les flux
+inactifs sont évincés (LRU), puis les segments loin derrière les lecteurs
+(plus de `MEDIA_PROXY_KEEP_BEHIND_BYTES`) sont supprimés ; si ça ne suffit
+pas, l'avance est réduite à un segment. En mémoire, seul un bloc par
+téléchargement.
+"""
+import os
+import re
+import time
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote
+
+import config
+import http_client
+import metrics
+
+ENABLED = bool(getattr(config, "MEDIA_PROXY_ENABLED", True))
+BLOCK = 16 * 1024
+SEGMENT = 64 * BLOCK  # un fichier par segment : l'unité de place rendue au disque
+STALL_MS = 50.0  # attente d'un bloc au-delà de laquelle on compte un blocage
+
+
+class UpstreamExpired(Exception):
+    """URL amont refusée : signature expirée, à re-résoudre."""
+
+
+class StreamBuffer:
+    """Un flux : segments creux sur disque + blocs présents + téléchargement anticipé.
+
+    `over_budget()` (appelée hors verrou) dit si le plafond disque est dépassé.
+    """
+    def __init__(self, video_id, url, resolve, path, readahead_bytes, max_failures=6,
+                 over_budget=None, keep_behind_bytes=SEGMENT):
+        self.video_id = video_id
+        self.url = url
+        self._resolve = resolve
+        self.path = path        # préfixe des segments : <path>-<n>.part
+        self.readahead = readahead_bytes
+        self.keep_behind = keep_behind_bytes
+        self._over_budget = over_budget or (lambda: False)
+        self._tight = False     # plafond atteint : avance réduite, pas de préchargement
+        self.trimmed = 0        # octets rendus au disque en cours de lecture
+        self.max_failures = max_failures
+        self.size = None
+        self.content_type = "application/octet-stream"
+        self.error = None
+        self.closed = False
+        self.readers = 0
+        self.last_used = time.monotonic()
+        self.upstream_requests = 0
+        self.refreshes = 0
+        self._have = set()      # blocs complets
+        self._filling = None    # (bloc, octets reçus) du bloc en cours de téléchargement
+        self._cursors = {}      # connexion du lecteur -> position lue (la plus récente d'abord servie)
+        self._next_cursor = 0
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._files = {}        # segment -> fichier ouvert
+        self._file_closed = False
+        threading.Thread(target=self._fetch_loop, daemon=True, name=f"proxy-{video_id}").start()
+
+    @property
+    def bytes_cached(self):
+        return len(self._have) * BLOCK
+
+    def _first_missing(self, pos):
+        i = pos // BLOCK
+        while i in self._have:
+            i += 1
+        if self.size is not None and i * BLOCK >= self.size:
+            return None
+        return i
+
+    def _fetch_target(self):
+        """Bloc à télécharger (sous verrou), ou None si toutes les fenêtres sont pleines.
+
+        La connexion la plus récente du lecteur passe d'abord (seek), puis
+        les plus anciennes ; sans connexion, préchargement depuis le début
+        (sauf plafond disque atteint).
+        """
+        positions = [pos for _, pos in sorted(self._cursors.items(), reverse=True)]
+        if not positions and not self._tight:
+            positions = [0]
+        window = min(SEGMENT, self.readahead) if self._tight else self.readahead
+        for pos in positions:
+            i = self._first_missing(pos)
+            if i is not None and i * BLOCK < pos + window:
+                return i
+        return None
+
+    # ---- plafond disque ----
+    def _enforce_budget(self):
+        """Hors verrou : au-delà du plafond, rend les segments hors des fenêtres de lecture ;
+        si ça ne suffit pas, passe en mode serré (avance d'un segment)."""
+        tight = self._over_budget()
+        if tight:
+            with self._cond:
+                freed = self._trim()
+            if freed:
+                tight = self._over_budget()
+        with self._cond:
+            self._tight = tight
+
+    def _trim(self):
+        """Sous verrou : supprime les segments hors de [lecteur - keep_behind, lecteur + avance]."""
+        keep = set()
+        for pos in list(self._cursors.values()) or [0]:
+            first = max(0, pos - self.keep_behind) // SEGMENT
+            keep.update(range(first, (pos + self.readahead) // SEGMENT + 1))
+        if self._filling is not None:
+            keep.add(self._filling[0] * BLOCK // SEGMENT)
+        per = SEGMENT // BLOCK
+        drop = {i // per for i in self._have} - keep
+        if not drop:
+            return 0
+        self._have = {i for i in self._have if i // per not in drop}
+        with self._io_lock:
+            for n in drop:
+                self._drop_segment(n)
+        freed = len(drop) * SEGMENT
+        self.trimmed += freed
+        return freed
+
+    # ---- segments (sous _io_lock) ----
+    def _segment_path(self, n):
+        return f"{self.path}-{n}.part"
+
+    def _segment(self, n, create=False):
+        f = self._files.get(n)
+        if f is None and create:
+            f = self._files[n] = open(self._segment_path(n), "w+b")
+        return f
+
+    def _drop_segment(self, n):
+        f = self._files.pop(n, None)
+        if f is not None:
+            f.close()
+        try:
+            os.remove(self._segment_path(n))
+        except OSError:
+            pass
+
+    def _write(self, offset, data):
+        while data:
+            n, off = divmod(offset, SEGMENT)
+            part = data[:SEGMENT - off]
+            f = self._segment(n, create=True)
+            f.seek(off)
+            f.write(part)
+            offset += len(part)
+            data = data[len(part):]
+
+    # ---- téléchargement ----
+    def _fetch_loop(self):
+        failures = 0
+        while True:
+            self._enforce_budget()
+            with self._cond:
+                if self.closed:
+                    return
+                index = self._fetch_target()
+                if index is None:
+                    # réveil à chaque lecture : le plafond est revérifié en haut de boucle
+                    self._cond.wait(1.0 if self._tight else None)
+                    continue
+            try:
+                self._fetch_from(index)
+                failures = 0
+            except UpstreamExpired:
+                failures += 1
+                self._refresh_url()
+            except Exception:
+                failures += 1
+                print(f"[WARN] Proxy {self.video_id} : amont en échec ({failures}) :",
+                      traceback.format_exc(limit=1))
+                time.sleep(min(4.0, 0.25 * 2 ** failures))
+            if failures >= self.max_failures:
+                with self._cond:
+                    self.error = "amont injoignable"
+                    self._cond.notify_all()
+                print(f"[ERROR] Proxy {self.video_id} : abandon après {failures} échecs")
+                return
+
+    def _refresh_url(self):
+        print(f"[DEBUG] Proxy {self.video_id} : URL expirée, nouvelle résolution")
+        try:
+            with metrics.span("proxy.refresh"):
+                url = self._resolve(self.video_id)
+        except Exception:
+            print(f"[WARN] Proxy {self.video_id} : résolution échouée :", traceback.format_exc(limit=1))
+            time.sleep(1.0)
+            return
+        if url:
+            self.url = url
+            self.refreshes += 1
+
+    def _fetch_from(self, index):
+        """Une requête Range ouverte depuis `index` ; s'arrête au premier bloc déjà présent,
+        en bout de fenêtre, ou si le lecteur a sauté ailleurs."""
+        start = index * BLOCK
+        self.upstream_requests += 1
+        r = http_client.get(self.url, headers={"Range": f"bytes={start}-", "Accept-Encoding": "identity"},
+                            stream=True, timeout=(5, 15))
+        try:
+            if r.status_code in (403, 404, 410):
+                raise UpstreamExpired(r.status_code)
+            r.raise_for_status()
+            total = _total_size(r, start)
+            with self._cond:
+                if total is not None:
+                    self.size = total
+                self.content_type = r.headers.get("Content-Type", self.content_type)
+                self._cond.notify_all()
+            if r.status_code == 200 and start:
+                raise RuntimeError("l'amont ignore les requêtes Range")
+            offset = start
+            for data in r.iter_content(16 * 1024):
+                with self._io_lock:
+                    if self._file_closed:
+                        return  # flux évincé
+                    self._write(offset, data)
+                offset += len(data)
+                with self._cond:
+                    while (index + 1) * BLOCK <= offset or (self.size and offset >= self.size):
+                        self._have.add(index)
+                        index += 1
+                        if self.size and index * BLOCK >= self.size:
+                            break
+                    self._filling = (index, offset - index * BLOCK)
+                    self._cond.notify_all()
+                if not self._keep_going(index):
+                    return  # bloc partiel abandonné : retéléchargé si besoin
+        finally:
+            with self._cond:
+                self._filling = None
+            r.close()
+
+    def _keep_going(self, index):
+        """Continuer sur `index` ? Non s'il n'est plus le bloc prioritaire (seek, fenêtre pleine)."""
+        self._enforce_budget()
+        with self._cond:
+            return not self.closed and self._fetch_target() == index
+
+    # ---- lecture ----
+    def wait_size(self, timeout):
+        with self._cond:
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: self.size is not None or self.error or self.closed, timeout)
+            return self.size
+
+    def open_cursor(self, pos):
+        with self._cond:
+            cursor = self._next_cursor
+            self._next_cursor += 1
+            self._cursors[cursor] = pos
+            self._cond.notify_all()
+            return cursor
+
+    def close_cursor(self, cursor):
+        with self._cond:
+            self._cursors.pop(cursor, None)
+            self._cond.notify_all()
+
+    def _available(self, pos):
+        """Octets lisibles d'un trait à partir de `pos` (sous verrou)."""
+        index = pos // BLOCK
+        if index in self._have:
+            end = (index + 1) * BLOCK
+            return (min(end, self.size) if self.size is not None else end) - pos
+        if self._filling is not None and self._filling[0] == index:
+            return max(0, index * BLOCK + self._filling[1] - pos)
+        return 0
+
+    def read(self, cursor, pos, timeout):
+        """Octets disponibles à partir de `pos` (au plus un bloc) ; renvoie (données, attente ms)."""
+        t0 = time.perf_counter()
+        with self._cond:
+            self._cursors[cursor] = pos
+            self.last_used = time.monotonic()
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: self._available(pos) or self.error or self.closed, timeout)
+            n = self._available(pos)
+            if not n:
+                raise IOError(self.error or "bloc indisponible")
+        with self._io_lock:
+            f = None if self._file_closed else self._segment(pos // SEGMENT)
+            if f is None:
+                raise IOError("flux évincé")
+            f.seek(pos % SEGMENT)
+            data = f.read(n)
+        return data, (time.perf_counter() - t0) * 1000.0
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+        with self._io_lock:
+            self._file_closed = True
+            for n in list(self._files):
+                self._drop_segment(n)
+
+
+def _total_size(r, start):
+    m = re.match(r"bytes \d+-\d+/(\d+)", r.headers.get("Content-Range", ""))
+    if m:
+        return int(m.group(1))
+    length = r.headers.get("Content-Length")
+    if r.status_code == 200 and length is not None:
+        return int(length)
+    return None
+
+
+def _resolve_fresh(video_id):
+    """Nouvelle URL de flux (l'ancienne a expiré)."""
+    from stream_resolver import resolver
+    resolver.invalidate(video_id)
+    url, _ = resolver.resolve(video_id, timeout=30)
+    return url
+
+
+class MediaProxy:
+    def __init__(self, resolve=None, directory=None, max_bytes=None, readahead_bytes=None,
+                 max_streams=None, keep_behind_bytes=None):
+        self.resolve = resolve or _resolve_fresh
+        self.directory = directory or getattr(
+            config, "MEDIA_PROXY_DIR",
+            os.path.join(os.path.expanduser("~"), ".cache", "twilight_hud", "proxy"),
+        )
+        self.max_bytes = int(max_bytes or getattr(config, "MEDIA_PROXY_MAX_BYTES", 256 * 1024 * 1024))
+        self.readahead = int(readahead_bytes or getattr(config, "MEDIA_PROXY_READAHEAD_BYTES",
+                                                        8 * 1024 * 1024))
+        self.max_streams = int(max_streams or getattr(config, "MEDIA_PROXY_MAX_STREAMS", 8))
+        self.keep_behind = int(keep_behind_bytes or getattr(config, "MEDIA_PROXY_KEEP_BEHIND_BYTES",
+                                                            2 * 1024 * 1024))
+        self.stalls = 0
+        self.served = 0
+        self._streams = {}  # video_id -> StreamBuffer
+        self._lock = threading.Lock()
+        self._server = None
+        os.makedirs(self.directory, exist_ok=True)
+        for name in os.listdir(self.directory):  # restes d'un arrêt brutal
+            if name.endswith(".part"):
+                os.remove(os.path.join(self.directory, name))
+
+    # ---- serveur ----
+    def start(self):
+        with self._lock:
+            if self._server is not None:
+                return self
+            proxy = self
+
+            class Handler(BaseHTTPRequestHandler):
+                protocol_version = "HTTP/1.1"
+
+                def handle(self):
+                    try:
+                        super().handle()
+                    except ConnectionError:
+                        pass  # le lecteur a fermé une connexion keep-alive
+
+                def do_GET(self):
+                    proxy._serve(self, body=True)
+
+                def do_HEAD(self):
+                    proxy._serve(self, body=False)
+
+                def log_message(self, fmt, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, daemon=True, name="media-proxy").start()
+            print(f"[DEBUG] Proxy média sur 127.0.0.1:{self._server.server_address[1]}")
+            return self
+
+    def url_for(self, video_id, upstream_url):
+        """URL locale à donner au lecteur ; le téléchargement démarre tout de suite."""
+        self.start()
+        with self._lock:
+            buf = self._streams.get(video_id)
+            if buf is None or buf.error:
+                if buf is not None:
+                    self._streams.pop(video_id).close()
+                path = os.path.join(self.directory, quote(video_id, safe=''))
+                buf = self._streams[video_id] = StreamBuffer(
+                    video_id, upstream_url, self.resolve, path, self.readahead,
+                    over_budget=self._over_budget, keep_behind_bytes=self.keep_behind)
+            else:
+                buf.url = upstream_url  # URL fraîche du resolver
+            buf.last_used = time.monotonic()
+            self._evict()
+        port = self._server.server_address[1]
+        return f"http://127.0.0.1:{port}/stream/{quote(video_id, safe='')}"
+
+    def _over_budget(self):
+        """Appelée par les téléchargements (hors verrou du flux) : évince les flux inactifs,
+        puis dit si le plafond disque reste dépassé par les flux en lecture."""
+        with self._lock:
+            self._evict()
+            return sum(b.bytes_cached for b in self._streams.values()) > self.max_bytes
+
+    def _evict(self):
+        """Sous verrou : flux inactifs les plus anciens d'abord."""
+        idle = sorted((b for b in self._streams.values() if b.readers == 0), key=lambda b: b.last_used)
+        total = sum(b.bytes_cached for b in self._streams.values())
+        while idle and (total > self.max_bytes or len(self._streams) > self.max_streams):
+            buf = idle.pop(0)
+            total -= buf.bytes_cached
+            self._streams.pop(buf.video_id, None)
+            buf.close()
+
+    def _serve(self, req, body):
+        m = re.match(r"^/stream/([^/?]+)", req.path)
+        with self._lock:
+            buf = self._streams.get(unquote(m.group(1))) if m else None
+            if buf is not None:
+                buf.readers += 1
+        if buf is None:
+            req.send_error(404)
+            return
+        t0 = time.perf_counter()
+        cursor = None
+        try:
+            size = buf.wait_size(timeout=20)
+            if size is None:
+                req.send_error(502, buf.error or "amont muet")
+                return
+            start, end = 0, size - 1
+            spec = req.headers.get("Range", "")
+            m = re.match(r"bytes=(\d*)-(\d*)", spec)
+            if m:
+                if m.group(1):
+                    start = int(m.group(1))
+                    end = min(size - 1, int(m.group(2))) if m.group(2) else size - 1
+                elif m.group(2):  # suffixe : les N derniers octets
+                    start = max(0, size - int(m.group(2)))
+                if start >= size:
+                    req.send_response(416)
+                    req.send_header("Content-Range", f"bytes */{size}")
+                    req.send_header("Content-Length", "0")
+                    req.end_headers()
+                    return
+            req.send_response(206 if m else 200)
+            req.send_header("Content-Type", buf.content_type)
+            req.send_header("Accept-Ranges", "bytes")
+            req.send_header("Content-Length", str(end - start + 1))
+            if m:
+                req.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            req.end_headers()
+            if not body:
+                return
+            pos, first = start, True
+            cursor = buf.open_cursor(start)
+            while pos <= end:
+                data, waited_ms = buf.read(cursor, pos, timeout=30)
+                data = data[:end - pos + 1]
+                req.wfile.write(data)
+                if first:
+                    metrics.observe("proxy.first_byte", (time.perf_counter() - t0) * 1000.0)
+                    first = False
+                elif waited_ms > STALL_MS:
+                    with self._lock:  # un thread par connexion du lecteur
+                        self.stalls += 1
+                    metrics.observe("proxy.stall", waited_ms)
+                pos += len(data)
+            with self._lock:
+                self.served += 1
+        except (BrokenPipeError, ConnectionResetError):
+            req.close_connection = True  # le lecteur a coupé (seek, stop)
+        except IOError as e:
+            print(f"[WARN] Proxy {buf.video_id} : {e}")
+            req.close_connection = True
+        finally:
+            if cursor is not None:
+                buf.close_cursor(cursor)
+            with self._lock:
+                buf.readers -= 1
+                buf.last_used = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            streams = list(self._streams.values())
+            stalls, served = self.stalls, self.served
+        return {
+            "streams": len(streams),
+            "bytes": sum(b.bytes_cached for b in streams),
+            "max_bytes": self.max_bytes,
+            "upstream_requests": sum(b.upstream_requests for b in streams),
+            "refreshes": sum(b.refreshes for b in streams),
+            "trimmed": sum(b.trimmed for b in streams),
+            "stalls": stalls,
+            "served": served,
+        }
+
+    def stop(self):
+        with self._lock:
+            if self._server is not None:
+                self._server.shutdown()
+                self._server.server_close()
+                self._server = None
+            for buf in self._streams.values():
+                buf.close()
+            self._streams.clear()
+
+
+_proxy = None
+_proxy_lock = threading.Lock()
+
+
+def get_proxy():
+    """Proxy partagé, créé au premier flux distant (None si désactivé).
+
+    Rien à l'import : ni dossier créé, ni `.part` d'un lancement précédent effacé.
+    """
+    global _proxy
+    if not ENABLED:
+        return None
+    with _proxy_lock:
+        if _proxy is None:
+            _proxy = MediaProxy()
+        return _proxy
@@ -0,0 +1,270 @@
+"""Instrumentation légère : spans chronométrés, histogrammes, erreurs, blocages.
+
+    with metrics.span("tts.gcloud"):
+        ...
+
+    @metrics.timed("twilio.send")
+    def send(...): ...
+
+Chaque nom a un histogramme à seaux logarithmiques fixes (p50/p95/p99
+approchés à ~10 %) et un compteur d'erreurs (exception sortie du span).
+Désactivé (`config.METRICS_ENABLED = False`), `span()` renvoie un objet
+vide partagé et `timed()` rend la fonction telle quelle : coût < 1 µs.
+`serve()` expose `/metrics` (texte Prometheus) et `/metrics.json` en local.
+"""
+import sys
+import json
+import time
+import bisect
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+
+ENABLED = bool(getattr(config, "METRICS_ENABLED", True))
+
+# bornes des seaux (ms) : 0.05 ms -> ~10 min, facteur 1.2
+_BOUNDS = []
+_b = 0.05
+while _b < 600000:
+    _BOUNDS.append(_b)
+    _b *= 1.2
+del _b
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max", "errors", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, ms):
+        i = bisect.bisect_left(_BOUNDS, ms)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.total += ms
+            if ms > self.max:
+                self.max = ms
+
+    def percentile(self, q):
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = q * self.count
+            seen = 0
+            for i, n in enumerate(self.counts):
+                seen += n
+                if seen >= rank and n:
+                    return min(_BOUNDS[i] if i < len(_BOUNDS) else self.max, self.max)
+            return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "sum_ms": round(self.total, 3),
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.50), 3),
+            "p95_ms": round(self.percentile(0.95), 3),
+            "p99_ms": round(self.percentile(0.99), 3),
+            "max_ms": round(self.max, 3),
+        }
+
+
+_histograms = {}
+_registry_lock = threading.Lock()
+
+
+def histogram(name):
+    h = _histograms.get(name)
+    if h is None:
+        with _registry_lock:
+            h = _histograms.setdefault(name, Histogram())
+    return h
+
+
+def observe(name, ms):
+    if ENABLED:
+        histogram(name).observe(ms)
+
+
+def error(name):
+    if ENABLED:
+        h = histogram(name)
+        with h._lock:
+            h.errors += 1
+
+
+class _Span:
+    __slots__ = ("hist", "t0")
+
+    def __init__(self, name):
+        self.hist = histogram(name)
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.hist.observe((time.perf_counter() - self.t0) * 1000.0)
+        if exc_type is not None:
+            with self.hist._lock:
+                self.hist.errors += 1
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name):
+    """Context manager chronométrant le bloc sous `name`."""
+    return _Span(name) if ENABLED else _NO_SPAN
+
+
+def timed(name):
+    """Décorateur : chaque appel est un span `name`."""
+    def wrap(fn):
+        if not ENABLED:
+            return fn
+
+        def timed_fn(*args, **kwargs):
+            with _Span(name):
+                return fn(*args, **kwargs)
+        timed_fn.__name__ = fn.__name__
+        timed_fn.__doc__ = fn.__doc__
+        return timed_fn
+    return wrap
+
+
+def snapshot():
+    with _registry_lock:
+        items = sorted(_histograms.items())
+    return {name: h.summary() for name, h in items}
+
+
+def prometheus_text():
+    lines = [
+        "# TYPE hud_latency_ms summary",
+        "# TYPE hud_errors_total counter",
+    ]
+    for name, s in snapshot().items():
+        label = f'op="{name}"'
+        for q, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+            lines.append(f'hud_latency_ms{{{label},quantile="{q}"}} {s[key]}')
+        lines.append(f"hud_latency_ms_count{{{label}}} {s['count']}")
+        lines.append(f"hud_latency_ms_sum{{{label}}} {s['sum_ms']}")
+        lines.append(f"hud_errors_total{{{label}}} {s['errors']}")
+    return "\n".join(lines) + "\n"
+
+
+def format_table(snap=None):
+    """Tableau texte compact pour le panneau du HUD."""
+    snap = snapshot() if snap is None else snap
+    rows = [f"{'opération':22s} {'n':>6s} {'err':>4s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'max':>8s}"]
+    for name, s in snap.items():
+        rows.append(f"{name[:22]:22s} {s['count']:6d} {s['errors']:4d} {s['p50_ms']:8.1f} "
+                    f"{s['p95_ms']:8.1f} {s['p99_ms']:8.1f} {s['max_ms']:8.1f}")
+    return "\n".join(rows)
+
+
+# ---------- Blocages du thread principal ----------
+class StallMonitor:
+    """Battement du thread principal (`beat()` toutes les `interval_ms`).
+
+    Le retard d'un battement est enregistré sous `name` ; un thread de
+    garde journalise la pile du thread principal dès qu'un blocage en cours
+    dépasse `threshold_ms` (une fois par blocage). `pause()` arrête la garde
+    (fenêtre cachée : plus de battement, plus de réveil).
+    """
+    def __init__(self, interval_ms=100, threshold_ms=200, name="main.stall"):
+        self.interval = interval_ms / 1000.0
+        self.threshold = threshold_ms / 1000.0
+        self.name = name
+        self.stalls = 0
+        self._thread_id = threading.main_thread().ident
+        self._last = time.monotonic()
+        self._reported = False
+        self._active = threading.Event()
+        self._active.set()
+        if ENABLED:
+            threading.Thread(target=self._watch, daemon=True, name="stall-watch").start()
+
+    def pause(self):
+        self._active.clear()
+
+    def resume(self):
+        self._last = time.monotonic()
+        self._active.set()
+
+    def beat(self):
+        now = time.monotonic()
+        late = now - self._last - self.interval
+        self._last = now
+        self._reported = False
+        if late > 0:
+            observe(self.name, late * 1000.0)
+            if late > self.threshold:
+                self.stalls += 1
+
+    def _watch(self):
+        while True:
+            self._active.wait()
+            time.sleep(self.threshold / 2)
+            if not self._active.is_set():
+                continue
+            blocked = time.monotonic() - self._last - self.interval
+            if blocked > self.threshold and not self._reported:
+                self._reported = True
+                frame = sys._current_frames().get(self._thread_id)
+                stack = "".join(traceback.format_stack(frame)) if frame else "?"
+                print(f"[WARN] Thread principal bloqué depuis {blocked * 1000:.0f} ms :\n{stack}")
+
+
+# ---------- Endpoint local ----------
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, ctype = json.dumps(snapshot()), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, ctype = prometheus_text(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        pass  # pas de bruit dans la console
+
+
+def serve(port=None, host="127.0.0.1"):
+    """Démarre l'endpoint si `port` (défaut config.METRICS_PORT) ; renvoie le serveur."""
+    port = getattr(config, "METRICS_PORT", None) if port is None else port
+    if not port or not ENABLED:
+        return None
+    server = ThreadingHTTPServer((host, int(port)), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    print(f"[DEBUG] Métriques : http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,299 @@
+"""File de lecture YouTube : avance auto + pré-buffer du morceau suivant.
+
+Deux `QMediaPlayer` : l'actif joue le morceau N pendant que l'autre charge
+déjà le morceau N+1 (URL résolue en fond). À la fin du morceau on bascule
+simplement de lecteur, sans attendre ni extraction ni premier octet.
+Avec le cache audio hors ligne, un morceau déjà téléchargé part du fichier
+local ; sinon il est streamé et téléchargé en fond pour la prochaine fois.
+Les résolutions passent par `tasks.executor` : une lecture demandée passe
+devant le préchargement et annule la lecture précédente encore en file.
+Les flux distants sont lus via le proxy local (`media_proxy`) : lecture
+anticipée, seeks servis localement, URL expirée re-résolue sans coupure.
+La file (morceaux, index, position) est reprise de l'instantané de
+démarrage (`restore`) sans lecture automatique : « reprendre » repart à la
+position enregistrée.
+"""
+import time
+import traceback
+
+from PyQt5.QtCore import QObject, QUrl, pyqtSignal, pyqtSlot
+from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
+
+import metrics
+import tasks
+import audio_cache
+import media_proxy
+from stream_resolver import resolver
+
+
+class StreamResolveSignals(QObject):
+    resolved = pyqtSignal(object, str, object, object, float)  # tag, id, url, source, ms
+
+
+class StreamResolveWorker:
+    """videoId -> fichier du cache audio, sinon URL de flux via le resolver partagé."""
+    def __init__(self, tag, video_id):
+        self.tag = tag
+        self.video_id = video_id
+        self.signals = StreamResolveSignals()
+
+    def __call__(self, token):
+        t0 = time.perf_counter()
+        try:
+            local = audio_cache.cache.local_path(self.video_id) if audio_cache.cache else None
+            if local:
+                url, source = QUrl.fromLocalFile(local).toString(), "local"
+            else:
+                url, source = resolver.resolve(self.video_id, timeout=token.timeout(30))
+                if audio_cache.cache and url:
+                    audio_cache.cache.request(self.video_id)
+                proxy = media_proxy.get_proxy() if url else None
+                if proxy is not None:
+                    url = proxy.url_for(self.video_id, url)
+        except Exception:  # y compris échéance dépassée
+            if token.cancelled:
+                raise tasks.Cancelled()
+            print("[WARN] Résolution du flux échouée :", traceback.format_exc())
+            url, source = None, None
+        if token.cancelled:
+            raise tasks.Cancelled()  # remplacée entre-temps : rien à émettre
+        self.signals.resolved.emit(
+            self.tag, self.video_id, url, source, (time.perf_counter() - t0) * 1000.0
+        )
+
+    def dropped(self, reason):
+        if reason == "expired":  # jamais partie : le morceau est sauté
+            self.signals.resolved.emit(self.tag, self.video_id, None, None, 0.0)
+
+
+class PlaybackQueue(QObject):
+    """File de morceaux (dicts vidéo) jouée par deux lecteurs en alternance."""
+    changed = pyqtSignal()
+    stateChanged = pyqtSignal(int)  # relai de l'état du lecteur actif
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.tracks = []        # {"video", "resolve_ms", "buffer_ms", "gap_ms", "ttp_ms", "source"}
+        self.index = -1
+        self._generation = 0    # invalide les résolutions d'un ancien morceau
+        self._players = [QMediaPlayer(), QMediaPlayer()]
+        self._active = 0
+        self._preloaded = None  # index du morceau chargé dans le lecteur en attente
+        self._buffer_t0 = {}    # id(player) -> (index, t0) pour mesurer le buffering
+        self._ended_at = None
+        self._play_t0 = None
+        self._resume_at = None  # (index, ms) : position à rétablir au chargement
+        for player in self._players:
+            player.mediaStatusChanged.connect(
+                lambda status, p=player: self._on_media_status(p, status)
+            )
+            player.stateChanged.connect(lambda state, p=player: self._on_state(p, state))
+
+    # ---- accès ----
+    @property
+    def active_player(self):
+        return self._players[self._active]
+
+    @property
+    def _standby_player(self):
+        return self._players[1 - self._active]
+
+    def current(self):
+        return self.tracks[self.index] if 0 <= self.index < len(self.tracks) else None
+
+    # ---- édition de la file ----
+    def enqueue(self, videos):
+        start_idle = self.current() is None or self.active_player.state() == QMediaPlayer.StoppedState
+        self.tracks.extend(self._track(v) for v in videos)
+        self.changed.emit()
+        if start_idle and self.index < len(self.tracks) - 1:
+            self.play_index(self.index + 1)
+        else:
+            self._prepare_next()
+
+    def play_now(self, video):
+        """Insère `video` juste après le morceau courant et le joue."""
+        pos = self.index + 1
+        self.tracks.insert(pos, self._track(video))
+        if self._preloaded is not None and self._preloaded >= pos:
+            self._discard_preload()
+        self.changed.emit()
+        self.play_index(pos)
+
+    def clear(self):
+        self.stop()
+        self.tracks = []
+        self.index = -1
+        self.changed.emit()
+
+    def export_state(self):
+        """Morceaux, index et position du lecteur actif (thread GUI), pour l'instantané."""
+        position = self.active_player.position() if self.current() is not None else 0
+        if self._resume_at is not None and self._resume_at[0] == self.index and not position:
+            position = self._resume_at[1]  # pas encore relancé depuis la reprise
+        return {
+            "videos": [{k: t["video"].get(k) for k in ("video_id", "title", "thumbnails")}
+                       for t in self.tracks],
+            "index": self.index,
+            "position_ms": position // 1000 * 1000,
+        }
+
+    def restore(self, state):
+        """File d'un lancement précédent, à l'arrêt ; `resume()` repart à la position notée."""
+        if not state or self.tracks:
+            return False
+        self.tracks = [self._track(v) for v in state.get("videos") or ()]
+        self.index = min(int(state.get("index", -1)), len(self.tracks) - 1)
+        if self.current() is not None and state.get("position_ms"):
+            self._resume_at = (self.index, int(state["position_ms"]))
+        self.changed.emit()
+        return bool(self.tracks)
+
+    @staticmethod
+    def _track(video):
+        return {"video": video, "resolve_ms": None, "buffer_ms": None, "gap_ms": None,
+                "ttp_ms": None, "source": None}
+
+    # ---- transport ----
+    def play_index(self, i):
+        if not 0 <= i < len(self.tracks):
+            return
+        self._generation += 1
+        if self._resume_at is not None and self._resume_at[0] != i:
+            self._resume_at = None
+        self.index = i
+        self._play_t0 = (i, time.perf_counter())  # temps jusqu'au son (clic -> PlayingState)
+        self.changed.emit()
+        if self._preloaded == i:
+            # gapless : le lecteur en attente a déjà le flux en buffer
+            self.active_player.stop()
+            self._active = 1 - self._active
+            self._preloaded = None
+            self.active_player.play()
+            print(f"[DEBUG] File : morceau {i + 1} pré-bufferisé, bascule immédiate")
+            self._prepare_next()
+            return
+        self._discard_preload()
+        self._resolve("play", i)
+
+    def next(self):
+        self.play_index(self.index + 1)
+
+    def pause(self):
+        self.active_player.pause()
+
+    def resume(self):
+        if self.current() is None:
+            return
+        if self.active_player.mediaStatus() == QMediaPlayer.NoMedia:
+            self.play_index(self.index)  # file reprise de l'instantané : rien de chargé
+        else:
+            self.active_player.play()
+
+    def stop(self):
+        self._ended_at = None
+        for player in self._players:
+            player.stop()
+
+    # ---- internes ----
+    def _discard_preload(self):
+        if self._preloaded is not None:
+            self._standby_player.setMedia(QMediaContent())
+            self._preloaded = None
+
+    def _prepare_next(self):
+        """Résout puis pré-bufferise le morceau suivant dans le lecteur en attente."""
+        n = self.index + 1
+        if n >= len(self.tracks) or self._preloaded == n:
+            return
+        self._resolve("preload", n)
+
+    def _resolve(self, purpose, i):
+        """Une seule résolution par rôle : la nouvelle annule celle encore en file."""
+        worker = StreamResolveWorker((purpose, self._generation, i), self.tracks[i]["video"]["video_id"])
+        worker.signals.resolved.connect(self._on_resolved)
+        tasks.executor.submit(purpose, worker, key=purpose, on_drop=worker.dropped,
+                              priority=tasks.USER if purpose == "play" else tasks.BACKGROUND)
+
+    def _load(self, player, i, stream_url):
+        self._buffer_t0[id(player)] = (i, time.perf_counter())
+        player.setMedia(QMediaContent(QUrl(stream_url)))
+
+    @pyqtSlot(object, str, object, object, float)
+    def _on_resolved(self, tag, video_id, stream_url, source, elapsed_ms):
+        purpose, generation, i = tag
+        if generation != self._generation or i >= len(self.tracks):
+            return  # la file a bougé entre-temps
+        if self.tracks[i]["video"]["video_id"] != video_id:
+            return
+        self.tracks[i]["resolve_ms"] = elapsed_ms
+        self.tracks[i]["source"] = source
+        if not stream_url:
+            print(f"[ERROR] Flux introuvable pour {video_id}, morceau ignoré")
+            if purpose == "play":
+                self.next()
+            return
+        if purpose == "play":
+            self._load(self.active_player, i, stream_url)
+            self.active_player.play()
+            st = resolver.stats()
+            print(f"[DEBUG] Audio lancé ({source}, {elapsed_ms:.0f} ms) — cache "
+                  f"{st['hit_rate'] * 100:.0f}% de {st['hits'] + st['misses']}, "
+                  f"extraction moy. {st['extract_avg_ms']:.0f} ms")
+            self._prepare_next()
+        else:
+            self._load(self._standby_player, i, stream_url)
+            self._preloaded = i
+        self.changed.emit()
+
+    def _on_media_status(self, player, status):
+        if status in (QMediaPlayer.BufferedMedia, QMediaPlayer.LoadedMedia):
+            pending = self._buffer_t0.pop(id(player), None)
+            if pending and pending[0] < len(self.tracks):
+                self.tracks[pending[0]]["buffer_ms"] = (time.perf_counter() - pending[1]) * 1000.0
+                self.changed.emit()
+            if self._resume_at is not None and player is self.active_player \
+                    and self._resume_at[0] == self.index:
+                player.setPosition(self._resume_at[1])
+                self._resume_at = None
+        elif status == QMediaPlayer.EndOfMedia and player is self.active_player:
+            self._ended_at = time.perf_counter()
+            if self.index + 1 < len(self.tracks):
+                self.next()
+            else:
+                print("[DEBUG] File de lecture terminée")
+
+    def _on_state(self, player, state):
+        if player is not self.active_player:
+            return
+        if state == QMediaPlayer.PlayingState and self._play_t0 is not None:
+            i, t0 = self._play_t0
+            self._play_t0 = None
+            if i == self.index:
+                track = self.tracks[i]
+                track["ttp_ms"] = (time.perf_counter() - t0) * 1000.0
+                kind = "local" if track["source"] == "local" else "distant"
+                metrics.observe(f"playback.ttp.{kind}", track["ttp_ms"])
+                print(f"[DEBUG] Temps jusqu'au son : {track['ttp_ms']:.0f} ms ({kind})")
+        if state == QMediaPlayer.PlayingState and self._ended_at is not None:
+            track = self.current()
+            if track is not None:
+                track["gap_ms"] = (time.perf_counter() - self._ended_at) * 1000.0
+                print(f"[DEBUG] Enchaînement : {track['gap_ms']:.0f} ms de blanc")
+            self._ended_at = None
+            self.changed.emit()
+        self.stateChanged.emit(state)
+
+    def describe(self, i):
+        """Ligne d'affichage d'un morceau avec ses timings."""
+        track = self.tracks[i]
+        mark = "▶" if i == self.index else ("⏳" if i == self._preloaded else " ")
+        timings = []
+        for key, label in (("ttp_ms", "démarrage"), ("resolve_ms", "résolution"),
+                           ("buffer_ms", "buffer"), ("gap_ms", "blanc")):
+            if track[key] is not None:
+                timings.append(f"{label} {track[key]:.0f} ms")
+        if track["source"] == "local":
+            timings.append("hors ligne")
+        suffix = f"  ({', '.join(timings)})" if timings else ""
+        return f"{mark} {track['video']['title']}{suffix}"
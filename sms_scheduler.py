@@ -0,0 +1,249 @@
+"""Planificateur de SMS durable (SQLite) : un tas, un seul réveil, un pool d'envoi.
+
+Chaque message x destinataire est une ligne `jobs`. Les jobs en attente
+sont chargés dans un min-heap ; un unique thread dort jusqu'à l'échéance
+la plus proche (ou un nouvel ajout) puis confie les jobs dus au pool
+d'envoi, avec retries. Le débit est limité dans cette boucle, avant la
+soumission : un thread de l'exécuteur partagé ne prend qu'un job qui a
+déjà son jeton, et n'attend jamais le seau. Au redémarrage, les jobs manqués
+partent tout de suite (sauf s'ils sont trop vieux).
+"""
+import time
+import heapq
+import sqlite3
+import threading
+import traceback
+
+import config
+import lazy_import
+import metrics
+import tasks
+
+# Twilio (optionnel, importé au premier envoi)
+TWILIO_OK = lazy_import.available("twilio.rest")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    due_ts REAL NOT NULL,
+    recipient TEXT NOT NULL,
+    body TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    sid TEXT,
+    created_ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, due_ts);
+"""
+
+
+def default_recipients():
+    """config.DEST_PHONE_NUMBERS (liste) ou, à défaut, config.DEST_PHONE_NUMBER."""
+    many = getattr(config, "DEST_PHONE_NUMBERS", None)
+    if many:
+        return list(many)
+    one = getattr(config, "DEST_PHONE_NUMBER", None)
+    return [one] if one else []
+
+
+def twilio_configured():
+    return TWILIO_OK and all([
+        getattr(config, "TWILIO_ACCOUNT_SID", None),
+        getattr(config, "TWILIO_AUTH_TOKEN", None),
+        getattr(config, "TWILIO_PHONE_NUMBER", None),
+    ])
+
+
+class RateLimiter:
+    """Seau à jetons : au plus `rate` envois/s (rafale `burst`)."""
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Prend un jeton si possible : renvoie 0, sinon l'attente (s) avant le prochain."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+
+class SmsScheduler:
+    def __init__(self, db_path, workers=2, rate_per_sec=1.0, max_attempts=4,
+                 catchup_max_age=24 * 3600, sender=None, on_result=None):
+        self.max_attempts = max_attempts
+        self.catchup_max_age = catchup_max_age
+        self.on_result = on_result      # on_result(job_id, recipient, ok, detail)
+        self._send = sender or self._send_twilio
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._db_lock = threading.Lock()
+        self._heap = []
+        self._cond = threading.Condition()
+        self._urgent = set()            # envois immédiats : priorité utilisateur
+        tasks.executor.set_limit("sms", workers)
+        self._limiter = RateLimiter(rate_per_sec, burst=max(1, workers))
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._running = False
+        self._load_pending()
+
+    # ---- persistance ----
+    def _load_pending(self):
+        now = time.time()
+        with self._db_lock, self._db:
+            if self.catchup_max_age:
+                self._db.execute(
+                    "UPDATE jobs SET status='expired' WHERE status='pending' AND due_ts < ?",
+                    (now - self.catchup_max_age,),
+                )
+            # un job 'sending' interrompu par un arrêt brutal repart
+            self._db.execute("UPDATE jobs SET status='pending' WHERE status='sending'")
+            rows = self._db.execute(
+                "SELECT due_ts, id FROM jobs WHERE status='pending'"
+            ).fetchall()
+        self._heap = [(due, job_id) for due, job_id in rows]
+        heapq.heapify(self._heap)
+        missed = sum(1 for due, _ in rows if due <= now)
+        if rows:
+            print(f"[DEBUG] SMS : {len(rows)} en attente rechargés ({missed} en retard, envoi immédiat)")
+
+    def schedule(self, body, due_ts, recipients=None):
+        """Programme `body` pour chaque destinataire ; renvoie les ids créés."""
+        recipients = recipients or default_recipients()
+        now = time.time()
+        with self._db_lock, self._db:
+            ids = [
+                self._db.execute(
+                    "INSERT INTO jobs (due_ts, recipient, body, created_ts) VALUES (?, ?, ?, ?)",
+                    (due_ts, r, body, now),
+                ).lastrowid
+                for r in recipients
+            ]
+        with self._cond:
+            for job_id in ids:
+                heapq.heappush(self._heap, (due_ts, job_id))
+            if due_ts <= now:
+                self._urgent.update(ids)
+            self._cond.notify()
+        return ids
+
+    def stats(self):
+        with self._db_lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    # ---- boucle ----
+    def start(self):
+        if not self._running:
+            self._running = True
+            threading.Thread(target=self._loop, daemon=True, name="sms-scheduler").start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+    def _loop(self):
+        throttle = 0.0  # attente du prochain jeton quand des jobs dus restent en tas
+        while True:
+            with self._cond:
+                while self._running:
+                    if self._heap and self._heap[0][0] <= time.time() and throttle <= 0:
+                        break
+                    # un seul réveil : la prochaine échéance, le prochain jeton ou un ajout
+                    timeout = (self._heap[0][0] - time.time()) if self._heap else None
+                    if throttle > 0:
+                        timeout = throttle if timeout is None else max(timeout, throttle)
+                    started = time.monotonic()
+                    self._cond.wait(timeout)
+                    throttle -= time.monotonic() - started
+                if not self._running:
+                    return
+                now = time.time()
+                ready = []
+                while self._heap and self._heap[0][0] <= now:
+                    ready.append(heapq.heappop(self._heap))
+                # les envois immédiats d'abord, puis par échéance
+                ready.sort(key=lambda item: (item[1] not in self._urgent, item))
+                due = []
+                for i, (due_ts, job_id) in enumerate(ready):
+                    throttle = self._limiter.try_acquire()
+                    if throttle > 0:
+                        for item in ready[i:]:
+                            heapq.heappush(self._heap, item)  # attendront le prochain jeton
+                        break
+                    urgent = job_id in self._urgent
+                    self._urgent.discard(job_id)
+                    due.append((job_id, tasks.USER if urgent else tasks.BACKGROUND))
+            for job_id, priority in due:
+                tasks.executor.submit("sms", lambda token, j=job_id: self._run_job(j),
+                                      priority=priority)
+
+    def _run_job(self, job_id):
+        with self._db_lock, self._db:
+            row = self._db.execute(
+                "SELECT recipient, body, attempts FROM jobs WHERE id=? AND status='pending'", (job_id,)
+            ).fetchone()
+            if row is None:
+                return  # annulé / déjà traité
+            self._db.execute("UPDATE jobs SET status='sending' WHERE id=?", (job_id,))
+        recipient, body, attempts = row
+        try:
+            with metrics.span("twilio.send"):
+                sid = self._send(body, recipient)
+        except Exception as e:
+            attempts += 1
+            if attempts >= self.max_attempts:
+                status, retry_at = "failed", None
+            else:
+                status, retry_at = "pending", time.time() + 30 * (2 ** (attempts - 1))
+            with self._db_lock, self._db:
+                self._db.execute(
+                    "UPDATE jobs SET status=?, attempts=?, last_error=?, due_ts=COALESCE(?, due_ts) "
+                    "WHERE id=?",
+                    (status, attempts, str(e), retry_at, job_id),
+                )
+            if retry_at is not None:
+                with self._cond:
+                    heapq.heappush(self._heap, (retry_at, job_id))
+                    self._cond.notify()
+                print(f"[WARN] SMS #{job_id} -> {recipient} échec (essai {attempts}), nouvel essai dans "
+                      f"{int(retry_at - time.time())} s : {e}")
+            else:
+                print(f"[ERROR] SMS #{job_id} -> {recipient} abandonné :", traceback.format_exc())
+                if self.on_result:
+                    self.on_result(job_id, recipient, False, str(e))
+            return
+        with self._db_lock, self._db:
+            self._db.execute(
+                "UPDATE jobs SET status='sent', attempts=?, sid=? WHERE id=?", (attempts + 1, sid, job_id)
+            )
+        if self.on_result:
+            self.on_result(job_id, recipient, True, sid)
+
+    # ---- Twilio ----
+    def _twilio(self):
+        """Client Twilio unique, réutilisé (connexions HTTP gardées ouvertes)."""
+        with self._client_lock:
+            if self._client is None:
+                Client = lazy_import.load("twilio.rest").Client
+                self._client = Client(config.TWILIO_ACCOUNT_SID, config.TWILIO_AUTH_TOKEN)
+                base_url = getattr(config, "TWILIO_API_BASE_URL", None)
+                if base_url:
+                    self._client.api.base_url = base_url  # ex. faux serveur local
+            return self._client
+
+    def _send_twilio(self, body, recipient):
+        message = self._twilio().messages.create(
+            body=body, from_=config.TWILIO_PHONE_NUMBER, to=recipient
+        )
+        return message.sid
@@ -0,0 +1,189 @@
+"""Instantané de l'état du HUD pour un démarrage à chaud (sans Qt).
+
+Au lancement, le premier rendu montre tout de suite le dernier état connu
+(horaires du jour, dernière recherche, file de lecture) au lieu d'attendre
+le premier tick, le cache crépuscule ou le réseau.
+
+Format compact : une ligne d'index `TWHUD1 {"section": [offset, taille]}`
+puis les sections en JSON accolées. Au démarrage le fichier est projeté en
+mémoire (mmap) et seule une section demandée est décodée (`section(name)`).
+
+Écriture : chaque source appelle `mark_dirty()` (ou `put()` pour une valeur
+calculée dans le thread GUI) ; un thread de fond regroupe les changements
+(`SNAPSHOT_DEBOUNCE_SEC`), n'écrit que si le contenu a changé, et remplace
+le fichier atomiquement (tmp + replace). Une section que personne n'a encore
+reproduite depuis le lancement est recopiée telle quelle. `flush()` écrit tout de suite
+(appelé à la sortie).
+"""
+import os
+import json
+import mmap
+import time
+import atexit
+import threading
+import traceback
+
+import config
+import metrics
+
+MAGIC = b"TWHUD1 "
+ENABLED = bool(getattr(config, "SNAPSHOT_ENABLED", True))
+PATH = getattr(config, "SNAPSHOT_PATH", os.path.join(
+    os.path.expanduser("~"), ".cache", "twilight_hud", "snapshot.bin"))
+DEBOUNCE_SEC = float(getattr(config, "SNAPSHOT_DEBOUNCE_SEC", 2.0))
+
+
+class Snapshot:
+    def __init__(self, path, debounce_sec=DEBOUNCE_SEC):
+        self.path = path
+        self.debounce_sec = debounce_sec
+        self.writes = 0
+        self.skipped = 0        # écritures évitées : contenu inchangé
+        self.load_ms = None
+        self._exporters = {}    # section -> fn() appelée dans le thread d'écriture
+        self._values = {}       # section -> valeur posée par put()
+        self._index = {}
+        self._map = None
+        self._decoded = {}
+        self._last = None       # octets de la dernière écriture
+        self._dirty = threading.Event()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._thread = None
+
+    # -------- lecture --------
+    def load(self):
+        """Projette le fichier en mémoire et lit l'index ; False si absent ou illisible."""
+        t0 = time.perf_counter()
+        try:
+            with open(self.path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            end = self._map.find(b"\n")
+            if self._map[:len(MAGIC)] != MAGIC or end < 0:
+                raise ValueError("en-tête inconnu")
+            self._index = json.loads(self._map[len(MAGIC):end])
+            base = end + 1
+            self._index = {name: (base + off, size) for name, (off, size) in self._index.items()}
+            self._last = self._map[:]  # inchangé à la sortie : pas de réécriture
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            # y compris fichier vide (mmap de taille 0)
+            print(f"[WARN] Instantané illisible ({e}), démarrage à froid")
+            self._index = {}
+            return False
+        finally:
+            self.load_ms = (time.perf_counter() - t0) * 1000.0
+        metrics.observe("snapshot.load", self.load_ms)
+        return True
+
+    def section(self, name):
+        """Section décodée à la demande depuis la projection, None si absente."""
+        with self._lock:
+            if name in self._decoded:
+                return self._decoded[name]
+            entry = self._index.get(name)
+            if entry is None or self._map is None:
+                return None
+            offset, size = entry
+            try:
+                value = json.loads(self._map[offset:offset + size])
+            except Exception as e:
+                print(f"[WARN] Section d'instantané '{name}' illisible : {e}")
+                value = None
+            self._decoded[name] = value
+            return value
+
+    # -------- écriture --------
+    def register(self, name, export):
+        """`export()` -> valeur JSON de la section (thread d'écriture, doit être thread-safe)."""
+        with self._lock:
+            self._exporters[name] = export
+
+    def put(self, name, value):
+        """Valeur calculée par l'appelant (ex. thread GUI), écrite au prochain passage."""
+        with self._lock:
+            if self._values.get(name) == value:
+                return
+            self._values[name] = value
+        self.mark_dirty()
+
+    def mark_dirty(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, daemon=True,
+                                                    name="snapshot")
+                    self._thread.start()
+        self._dirty.set()
+
+    def _loop(self):
+        while True:
+            self._dirty.wait()
+            time.sleep(self.debounce_sec)  # regroupe les changements en rafale
+            self._dirty.clear()
+            try:
+                self.flush()
+            except Exception:
+                print("[ERROR] Écriture de l'instantané :", traceback.format_exc())
+
+    def _encode(self):
+        with self._lock:
+            exporters = dict(self._exporters)
+            sections = dict(self._values)
+        for name, export in exporters.items():
+            try:
+                sections[name] = export()
+            except Exception:
+                print(f"[WARN] Section d'instantané '{name}' ignorée :", traceback.format_exc())
+        index, blobs, offset = {}, [], 0
+        for name in sorted(set(sections) | set(self._index)):
+            value = sections.get(name)
+            if value is not None:
+                blob = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+            elif name in self._index and self._map is not None:
+                # section pas encore reproduite ce lancement : on garde l'ancienne
+                start, size = self._index[name]
+                blob = self._map[start:start + size]
+            else:
+                continue
+            index[name] = [offset, len(blob)]
+            blobs.append(blob)
+            offset += len(blob)
+        header = MAGIC + json.dumps(index, separators=(",", ":")).encode("utf-8") + b"\n"
+        return header + b"".join(blobs)
+
+    def flush(self):
+        """Écrit maintenant si le contenu a changé (tmp + replace)."""
+        with self._write_lock:
+            with metrics.span("snapshot.write"):
+                data = self._encode()
+                if data == self._last:
+                    self.skipped += 1
+                    return False
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                tmp = self.path + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                # la projection en cours garde l'ancien inode : lecture toujours valide
+                os.replace(tmp, self.path)
+                self._last = data
+                self.writes += 1
+                return True
+
+    def stats(self):
+        return {"sections": sorted(self._index), "load_ms": self.load_ms,
+                "writes": self.writes, "skipped": self.skipped,
+                "bytes": len(self._last) if self._last else None}
+
+
+state = Snapshot(PATH) if ENABLED else None
+
+
+@atexit.register
+def _flush_at_exit():
+    if state is not None and (state._exporters or state._values):
+        try:
+            state.flush()
+        except Exception:
+            print("[ERROR] Écriture de l'instantané :", traceback.format_exc())
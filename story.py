@@ -0,0 +1,277 @@
+"""Histoire IA en streaming : génération token par token + TTS pipeliné.
+
+Le texte est découpé en phrases au fil du flux ; chaque morceau part en
+synthèse dès qu'il est complet (plusieurs en parallèle) et est livré dans
+l'ordre au lecteur, pendant que la suite est encore générée.
+"""
+import os
+import re
+import json
+import time
+import queue
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import lazy_import
+import metrics
+import tts
+
+# ---- OpenAI v1 (importé à la création du client) ----
+OPENAI_V1 = lazy_import.available("openai")
+
+STORY_MODEL = getattr(config, "STORY_MODEL", "gpt-4o-mini")
+
+# fin de phrase : ponctuation (+ guillemet/parenthèse fermante, « ! » à la française
+# avec espace avant le guillemet) puis blanc
+_BOUNDARY = re.compile(r"[.!?…]+(?:[\"»”)\]]|\s+[»”])*\s+")
+
+
+def make_client(api_key):
+    """Client OpenAI v1 ; `config.OPENAI_BASE_URL` permet de viser un serveur local."""
+    OpenAI = lazy_import.load("openai").OpenAI
+    return OpenAI(api_key=api_key, base_url=getattr(config, "OPENAI_BASE_URL", None))
+
+
+class LazyClient:
+    """Client OpenAI créé (et `openai` importé) au premier appel, pas au démarrage."""
+    def __init__(self, api_key):
+        self.api_key = api_key
+        self._client = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        with self._lock:
+            if self._client is None:
+                self._client = make_client(self.api_key)
+        return getattr(self._client, name)
+
+
+def story_prompt():
+    return f"Raconte-moi une courte histoire de style {getattr(config, 'STORY_THEME', 'fantastique')}."
+
+
+class SentenceChunker:
+    """Découpe un flux de texte en morceaux terminés par une fin de phrase.
+
+    Le premier morceau sort dès la première phrase (latence minimale) ;
+    les suivants regroupent des phrases jusqu'à `min_chars` caractères.
+    """
+    def __init__(self, min_chars=80):
+        self.min_chars = min_chars
+        self._buf = ""
+        self._emitted = 0
+
+    def feed(self, text):
+        self._buf += text
+        out = []
+        while True:
+            min_len = 1 if self._emitted == 0 else self.min_chars
+            cut = next((m.end() for m in _BOUNDARY.finditer(self._buf) if m.end() >= min_len), None)
+            if cut is None:
+                return out
+            chunk = self._buf[:cut].strip()
+            self._buf = self._buf[cut:]
+            if chunk:
+                out.append(chunk)
+                self._emitted += 1
+
+    def flush(self):
+        chunk, self._buf = self._buf.strip(), ""
+        return chunk
+
+
+class StoryPipeline:
+    """LLM en streaming -> phrases -> synthèse parallèle -> livraison ordonnée.
+
+    `on_audio(index, path, engine, text)` est appelé depuis un thread de
+    fond, dans l'ordre du texte.
+    """
+    def __init__(self, client, on_audio, synth=None, workers=3, min_chars=80):
+        self.client = client
+        self.on_audio = on_audio
+        self.synth = synth or tts.synthesize
+        self.workers = workers
+        self.min_chars = min_chars
+
+    def _deliver(self, futures, stats, t0):
+        index = 0
+        while True:
+            item = futures.get()
+            if item is None:
+                return
+            text, fut = item
+            try:
+                path, engine = fut.result()
+            except Exception:
+                print("[ERROR] Synthèse d'un passage échouée :", traceback.format_exc())
+                continue
+            if stats["first_audio_ms"] is None:
+                stats["first_audio_ms"] = (time.perf_counter() - t0) * 1000.0
+            self.on_audio(index, path, engine, text)
+            index += 1
+
+    def run(self, prompt):
+        """Bloquant (à lancer dans un thread) ; renvoie texte + mesures."""
+        t0 = time.perf_counter()
+        stats = {"first_token_ms": None, "first_sentence_ms": None, "first_audio_ms": None,
+                 "chunks": 0, "total_ms": None, "story": ""}
+        futures = queue.Queue()
+        deliver = threading.Thread(target=self._deliver, args=(futures, stats, t0), daemon=True)
+        deliver.start()
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="story-tts")
+        chunker = SentenceChunker(self.min_chars)
+        parts = []
+
+        def submit(chunk):
+            if stats["first_sentence_ms"] is None:
+                stats["first_sentence_ms"] = (time.perf_counter() - t0) * 1000.0
+            stats["chunks"] += 1
+            futures.put((chunk, pool.submit(self.synth, chunk)))
+
+        try:
+            with metrics.span("openai.completion"):
+                stream = self.client.chat.completions.create(
+                    model=STORY_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.8,
+                    max_tokens=350,
+                    stream=True,
+                )
+                for event in stream:
+                    if not event.choices:
+                        continue
+                    delta = event.choices[0].delta.content or ""
+                    if not delta:
+                        continue
+                    if stats["first_token_ms"] is None:
+                        stats["first_token_ms"] = (time.perf_counter() - t0) * 1000.0
+                        metrics.observe("openai.first_token", stats["first_token_ms"])
+                    parts.append(delta)
+                    for chunk in chunker.feed(delta):
+                        submit(chunk)
+            tail = chunker.flush()
+            if tail:
+                submit(tail)
+        finally:
+            futures.put(None)
+            deliver.join()
+            pool.shutdown(wait=False)
+        stats["story"] = "".join(parts)
+        stats["total_ms"] = (time.perf_counter() - t0) * 1000.0
+        return stats
+
+
+# ---------- Réserve d'histoires pré-générées ----------
+class StoryBuffer:
+    """Garde jusqu'à `capacity` histoires prêtes (texte + MP3 par passage).
+
+    Un producteur de fond remplit la réserve quand le HUD est inactif
+    (`set_idle`) ; `pop()` ne coûte alors qu'une lecture. La réserve est
+    persistée en JSON (les MP3 vivent dans le cache TTS).
+    """
+    def __init__(self, client, path, capacity=2, on_change=None):
+        self.client = client
+        self.path = path
+        self.capacity = capacity
+        self.on_change = on_change
+        self.last_refill_ms = None
+        self._items = []
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._idle = threading.Event()
+        self._idle.set()
+        self._running = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._items = json.load(f)[: self.capacity]
+        except FileNotFoundError:
+            self._items = []
+        except Exception as e:
+            print(f"[WARN] Réserve d'histoires illisible ({e}), on repart de zéro")
+            self._items = []
+
+    def _save_locked(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._items, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def depth(self):
+        with self._lock:
+            return len(self._items)
+
+    def set_idle(self, idle):
+        """Le producteur ne lance une génération que quand le HUD est inactif."""
+        if idle:
+            self._idle.set()
+        else:
+            self._idle.clear()
+
+    def pop(self):
+        """Histoire la plus ancienne ({story, chunks, gen_ms}) ou None."""
+        with self._lock:
+            item = self._items.pop(0) if self._items else None
+            if item is not None:
+                self._save_locked()
+            self._wake.notify()
+        if item is not None and self.on_change:
+            self.on_change()
+        return item
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            threading.Thread(target=self._produce_loop, daemon=True, name="story-buffer").start()
+
+    def stop(self):
+        with self._lock:
+            self._running = False
+            self._wake.notify()
+
+    def _produce_loop(self):
+        while True:
+            with self._lock:
+                while self._running and len(self._items) >= self.capacity:
+                    self._wake.wait()
+                if not self._running:
+                    return
+            self._idle.wait()
+            try:
+                item = self._produce_one()
+            except Exception:
+                print("[WARN] Remplissage réserve d'histoires échoué :", traceback.format_exc())
+                time.sleep(60)
+                continue
+            with self._lock:
+                self._items.append(item)
+                self._save_locked()
+            if self.on_change:
+                self.on_change()
+
+    def _produce_one(self):
+        chunks = []
+        pipeline = StoryPipeline(
+            self.client,
+            on_audio=lambda i, path, engine, text: chunks.append(
+                {"text": text, "path": path, "engine": engine}
+            ),
+        )
+        stats = pipeline.run(story_prompt())
+        if not chunks:
+            raise RuntimeError("histoire sans audio")
+        self.last_refill_ms = stats["total_ms"]
+        return {"story": stats["story"], "chunks": chunks,
+                "gen_ms": stats["total_ms"], "created": time.time()}
+
+
+def chunk_audio(chunk):
+    """MP3 d'un passage de la réserve ; re-synthétisé s'il a été évincé du cache."""
+    if os.path.exists(chunk["path"]):
+        return chunk["path"], f"{chunk['engine']}, réserve"
+    return tts.synthesize(chunk["text"])
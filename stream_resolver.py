@@ -0,0 +1,215 @@
+"""Résolution videoId -> URL de flux audio (yt-dlp), avec cache et préchargement.
+
+Les URLs googlevideo portent leur expiration (`expire=<epoch>`) : on les
+garde jusque-là (moins une marge), et on précharge en fond les premiers
+résultats d'une recherche pour qu'un clic démarre la lecture tout de suite.
+Un clic a son propre pool : il n'attend jamais derrière les préchargements.
+"""
+import time
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+import config
+import lazy_import
+import metrics
+import snapshot
+
+# 1er essai : forcer formats audio HTTPS courants (m4a) + client web
+YDL_OPTS_PRIMARY = {
+    "quiet": True,
+    "noplaylist": True,
+    "format": "bestaudio[ext=m4a]/bestaudio[protocol^=https]/bestaudio/best",
+    "extractor_args": {"youtube": {"player_client": ["web"]}},
+    # quelques garde-fous pour réduire le bruit
+    "nocheckcertificate": True,
+    "ignoreerrors": True,
+}
+
+# Fallback : laisser yt-dlp choisir le best dispo, tjrs client web
+YDL_OPTS_FALLBACK = {
+    "quiet": True,
+    "noplaylist": True,
+    "format": "bestaudio/best",
+    "extractor_args": {"youtube": {"player_client": ["web"]}},
+    "nocheckcertificate": True,
+    "ignoreerrors": True,
+}
+
+EXPIRY_MARGIN_SEC = 120
+DEFAULT_TTL_SEC = 3600  # si l'URL ne donne pas d'expiration
+
+
+def url_expiry(stream_url, now=None):
+    """Epoch d'expiration encodé dans l'URL (`expire=`), sinon now + TTL par défaut."""
+    now = time.time() if now is None else now
+    try:
+        query = parse_qs(urlsplit(stream_url).query)
+        if "expire" in query:
+            return float(query["expire"][0])
+        # certaines URLs portent les paramètres dans le chemin : /expire/<epoch>/
+        parts = urlsplit(stream_url).path.split("/")
+        if "expire" in parts:
+            return float(parts[parts.index("expire") + 1])
+    except (ValueError, IndexError):
+        pass
+    return now + DEFAULT_TTL_SEC
+
+
+def _pick_stream_url(info):
+    if not isinstance(info, dict):
+        return None
+    # certains extracteurs donnent direct 'url'
+    if info.get("url"):
+        return info["url"]
+    # sinon on parcourt les formats
+    for f in (info.get("formats") or []):
+        if f.get("url"):
+            return f["url"]
+    return None
+
+
+class StreamResolver:
+    """Cache videoId -> (url, expiration) + pools bornés : préchargement et demandes."""
+    def __init__(self, prefetch_workers=2, demand_workers=2):
+        self._cache = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()  # un YoutubeDL réutilisé par thread
+        self._pool = ThreadPoolExecutor(max_workers=prefetch_workers, thread_name_prefix="resolver")
+        self._demand_pool = ThreadPoolExecutor(max_workers=demand_workers,
+                                               thread_name_prefix="resolver-demand")
+        self.hits = 0
+        self.misses = 0
+        self._extract_ms = []
+
+    def _ydl(self, label):
+        ydls = getattr(self._local, "ydls", None)
+        if ydls is None:
+            ydls = self._local.ydls = {}
+        if label not in ydls:
+            opts = YDL_OPTS_PRIMARY if label == "primary" else YDL_OPTS_FALLBACK
+            ydls[label] = lazy_import.load("yt_dlp").YoutubeDL(opts)
+        return ydls[label]
+
+    def cached(self, video_id):
+        """URL encore valide en cache, sans déclencher d'extraction (purge si expirée)."""
+        with self._lock:
+            entry = self._cache.get(video_id)
+            if entry is None:
+                return None
+            if entry[1] - EXPIRY_MARGIN_SEC > time.time():
+                return entry[0]
+            del self._cache[video_id]
+            return None
+
+    def _purge_expired(self):
+        """Retire les URLs expirées (sous verrou)."""
+        limit = time.time() + EXPIRY_MARGIN_SEC
+        for vid in [vid for vid, (_, exp) in self._cache.items() if exp <= limit]:
+            del self._cache[vid]
+
+    def export(self):
+        """{videoId: [url, expiration]} encore valides (pour l'instantané)."""
+        with self._lock:
+            self._purge_expired()
+            return {vid: [url, exp] for vid, (url, exp) in self._cache.items()}
+
+    def restore(self, entries):
+        """Recharge `export()` d'un lancement précédent ; les URLs expirées sont ignorées."""
+        now = time.time()
+        restored = 0
+        with self._lock:
+            for vid, (url, exp) in (entries or {}).items():
+                if exp - EXPIRY_MARGIN_SEC > now and vid not in self._cache:
+                    self._cache[vid] = (url, exp)
+                    restored += 1
+        return restored
+
+    def invalidate(self, video_id):
+        with self._lock:
+            self._cache.pop(video_id, None)
+
+    def _extract(self, video_id):
+        url_watch = f"https://www.youtube.com/watch?v={video_id}"
+        t0 = time.perf_counter()
+        try:
+            for label in ("primary", "fallback"):
+                try:
+                    with metrics.span(f"ytdlp.extract.{label}"):
+                        info = self._ydl(label).extract_info(url_watch, download=False)
+                    stream_url = _pick_stream_url(info)
+                    if stream_url:
+                        with self._lock:
+                            self._cache[video_id] = (stream_url, url_expiry(stream_url))
+                        if snapshot.state is not None:
+                            snapshot.state.mark_dirty()
+                        return stream_url, label
+                except Exception:
+                    print(f"[WARN] Échec extraction ({label}) :", traceback.format_exc())
+            return None, None
+        finally:
+            with self._lock:
+                self._extract_ms.append((time.perf_counter() - t0) * 1000.0)
+                del self._extract_ms[:-200]
+                self._inflight.pop(video_id, None)
+
+    def _submit(self, video_id, demand=False):
+        """Extraction en vol pour `video_id`, sinon nouvelle soumission.
+
+        `demand` (clic) : pool dédié ; un préchargement encore en file (pas
+        démarré) est retiré et passe sur ce pool au lieu d'être attendu.
+        """
+        with self._lock:
+            fut = self._inflight.get(video_id)
+            if fut is not None and demand and fut.cancel():
+                fut = None  # était en file derrière d'autres préchargements
+            if fut is None:
+                pool = self._demand_pool if demand else self._pool
+                fut = self._inflight[video_id] = pool.submit(self._extract, video_id)
+            return fut
+
+    def resolve(self, video_id, timeout=None):
+        """(url, source) ; source = "cache", "primary", "fallback" ou None si échec.
+
+        Bloquant : à appeler hors du thread GUI. Réutilise une extraction
+        de préchargement déjà en cours pour le même videoId. Au-delà de
+        `timeout` secondes, `concurrent.futures.TimeoutError` (l'extraction
+        continue en fond et remplira le cache).
+        """
+        url = self.cached(video_id)
+        with self._lock:
+            if url:
+                self.hits += 1
+                return url, "cache"
+            self.misses += 1
+        return self._submit(video_id, demand=True).result(timeout)
+
+    def prefetch(self, video_ids):
+        """Résout en fond les videoIds pas encore en cache (pool borné)."""
+        for video_id in video_ids:
+            if not self.cached(video_id):
+                self._submit(video_id)
+
+    def stats(self):
+        with self._lock:
+            self._purge_expired()
+            samples = sorted(self._extract_ms)
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "cached": len(self._cache),
+                "extract_avg_ms": (sum(samples) / len(samples)) if samples else 0.0,
+                "extract_max_ms": samples[-1] if samples else 0.0,
+            }
+
+
+resolver = StreamResolver(
+    prefetch_workers=int(getattr(config, "RESOLVER_PREFETCH_WORKERS", 2)),
+    demand_workers=int(getattr(config, "RESOLVER_DEMAND_WORKERS", 2)),
+)
+if snapshot.state is not None:
+    snapshot.state.register("streams", resolver.export)
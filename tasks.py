@@ -0,0 +1,244 @@
+"""Exécuteur partagé des actions du HUD et du moteur (sans Qt).
+
+Une seule file pour recherche, lecture, histoires, alertes vocales, crépuscule
+et SMS :
+- priorité : une action de l'utilisateur passe devant les minuteries, et
+  `TASK_USER_RESERVE` threads lui sont réservés : le travail de fond
+  (histoire, SMS, préchargement) ne peut pas occuper tout le pool ;
+- limite de concurrence par catégorie (`TASK_LIMITS`) ;
+- jeton d'annulation : une tâche soumise avec une `key` annule la
+  précédente de même clé (seule la dernière recherche/lecture gagne) ;
+- échéance : une tâche dont le délai est dépassé avant de démarrer est
+  abandonnée, et `token.timeout()` borne les appels réseau en cours.
+
+L'annulation est coopérative : une tâche déjà lancée vérifie son jeton
+(`token.check()`) entre deux étapes bloquantes.
+"""
+import time
+import itertools
+import threading
+import traceback
+from collections import defaultdict
+
+import config
+import metrics
+
+USER = 0         # clic, recherche, lecture demandée
+BACKGROUND = 10  # minuteries, préchargement, envois programmés
+
+DEFAULT_LIMITS = {"search": 2, "play": 2, "preload": 1, "story": 1, "tts": 1, "twilight": 1, "sms": 2}
+# pas d'échéance pour "sms" : un job en base doit partir, même en retard
+DEFAULT_DEADLINES_S = {"search": 15, "play": 30, "preload": 60, "story": 300, "tts": 60,
+                       "twilight": 120}
+
+
+class Cancelled(Exception):
+    """Tâche remplacée par une plus récente ou annulée explicitement."""
+
+
+class DeadlineExceeded(Cancelled):
+    """Échéance de la tâche dépassée."""
+
+
+class CancelToken:
+    def __init__(self, deadline=None):
+        self.deadline = deadline  # time.monotonic() absolu, ou None
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    @property
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def remaining(self):
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def timeout(self, default):
+        """`default` borné par le temps restant (pour les appels réseau)."""
+        self.check()
+        remaining = self.remaining()
+        return default if remaining is None else min(default, remaining)
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled()
+        if self.expired:
+            raise DeadlineExceeded()
+
+
+class _Task:
+    __slots__ = ("category", "fn", "priority", "seq", "token", "key", "on_drop", "submitted")
+
+    def __init__(self, category, fn, priority, seq, token, key, on_drop):
+        self.category = category
+        self.fn = fn
+        self.priority = priority
+        self.seq = seq
+        self.token = token
+        self.key = key
+        self.on_drop = on_drop
+        self.submitted = time.monotonic()
+
+
+class TaskExecutor:
+    """`submit(category, fn, ...)` ; `fn(token)` tourne dans un thread du pool."""
+    def __init__(self, workers=None, limits=None, deadlines_s=None, user_reserve=None):
+        self.workers = int(workers or getattr(config, "TASK_WORKERS", 6))
+        if user_reserve is None:
+            user_reserve = getattr(config, "TASK_USER_RESERVE", 1)
+        # threads gardés libres pour USER : le fond en a au plus workers - réserve
+        self.user_reserve = min(max(0, int(user_reserve)), self.workers - 1)
+        self.limits = dict(DEFAULT_LIMITS, **(limits or getattr(config, "TASK_LIMITS", {})))
+        self.deadlines_s = dict(DEFAULT_DEADLINES_S,
+                                **(deadlines_s or getattr(config, "TASK_DEADLINES_S", {})))
+        self._queue = []
+        self._running = defaultdict(int)
+        self._running_background = 0
+        self._latest = {}          # key -> jeton de la dernière tâche soumise
+        self._counts = defaultdict(lambda: defaultdict(int))
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = 0
+        self._idle = 0
+
+    def set_limit(self, category, limit):
+        with self._cond:
+            self.limits[category] = max(1, int(limit))
+            self._cond.notify_all()
+
+    def submit(self, category, fn, priority=BACKGROUND, key=None, deadline_s=None, on_drop=None):
+        """Met `fn(token)` en file ; renvoie le jeton.
+
+        `key` : annule la tâche précédente de même clé. `on_drop(reason)` est
+        appelé (thread du pool) si la tâche ne démarre pas : "cancelled" ou
+        "expired". Une fois lancée, `fn` gère elle-même son nettoyage ; lever
+        `Cancelled` la compte comme annulée.
+        """
+        if deadline_s is None:
+            deadline_s = self.deadlines_s.get(category)
+        token = CancelToken(time.monotonic() + deadline_s if deadline_s else None)
+        task = _Task(category, fn, priority, next(self._seq), token, key, on_drop)
+        with self._cond:
+            if key is not None:
+                previous = self._latest.get(key)
+                if previous is not None:
+                    previous.cancel()
+                self._latest[key] = token
+            self._queue.append(task)
+            self._counts[category]["submitted"] += 1
+            if self._idle == 0 and self._threads < self.workers:
+                self._threads += 1
+                threading.Thread(target=self._worker, daemon=True,
+                                 name=f"task-{self._threads}").start()
+            self._cond.notify()
+        return token
+
+    def cancel(self, key):
+        with self._cond:
+            token = self._latest.pop(key, None)
+        if token is not None:
+            token.cancel()
+
+    def _next_task(self):
+        """Tâche prioritaire dont la catégorie a une place libre (sous verrou)."""
+        best = None
+        background_full = self._running_background >= self.workers - self.user_reserve
+        for task in self._queue:
+            if self._running[task.category] >= self.limits.get(task.category, self.workers):
+                continue
+            if task.priority > USER and background_full:
+                continue
+            if best is None or (task.priority, task.seq) < (best.priority, best.seq):
+                best = task
+        if best is not None:
+            self._queue.remove(best)
+            self._running[best.category] += 1
+            if best.priority > USER:
+                self._running_background += 1
+        return best
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                task = self._next_task()
+                while task is None:
+                    self._idle += 1
+                    self._cond.wait()
+                    self._idle -= 1
+                    task = self._next_task()
+            try:
+                self._run(task)
+            finally:
+                with self._cond:
+                    self._running[task.category] -= 1
+                    if task.priority > USER:
+                        self._running_background -= 1
+                    if task.key is not None and self._latest.get(task.key) is task.token:
+                        del self._latest[task.key]
+                    self._cond.notify_all()
+
+    def _run(self, task):
+        counts = self._counts[task.category]
+        wait_ms = (time.monotonic() - task.submitted) * 1000.0
+        metrics.observe(f"tasks.wait.{task.category}", wait_ms)
+        reason = "cancelled" if task.token.cancelled else ("expired" if task.token.expired else None)
+        if reason is None:
+            try:
+                with metrics.span(f"tasks.run.{task.category}"):
+                    task.fn(task.token)
+                counts["completed"] += 1
+            except DeadlineExceeded:
+                counts["expired"] += 1
+            except Cancelled:
+                counts["cancelled"] += 1
+            except Exception:
+                counts["failed"] += 1
+                print(f"[ERROR] Tâche {task.category} :", traceback.format_exc())
+            return
+        # jamais démarrée
+        counts[reason] += 1
+        if reason == "expired":
+            print(f"[WARN] Tâche {task.category} abandonnée : échéance dépassée "
+                  f"({wait_ms:.0f} ms d'attente)")
+        if task.on_drop is not None:
+            try:
+                task.on_drop(reason)
+            except Exception:
+                print("[ERROR] on_drop :", traceback.format_exc())
+
+    def format_table(self):
+        rows = [f"{'tâches':10s} {'file':>5s} {'cours':>5s} {'ok':>6s} {'annul':>6s} "
+                f"{'expir':>6s} {'échec':>6s} {'att.p95':>8s}"]
+        for category, s in self.stats().items():
+            p95 = s["wait_p95_ms"]
+            rows.append(f"{category[:10]:10s} {s['queued']:5d} {s['running']:5d} "
+                        f"{s.get('completed', 0):6d} {s.get('cancelled', 0):6d} "
+                        f"{s.get('expired', 0):6d} {s.get('failed', 0):6d} "
+                        f"{'-' if p95 is None else f'{p95:.0f} ms':>8s}")
+        return "\n".join(rows)
+
+    def stats(self):
+        """Par catégorie : profondeur de file, en cours, compteurs, attente p50/p95."""
+        snap = metrics.snapshot()
+        with self._cond:
+            depth = defaultdict(int)
+            for task in self._queue:
+                depth[task.category] += 1
+            out = {}
+            for category in sorted(set(self._counts) | set(depth)):
+                wait = snap.get(f"tasks.wait.{category}", {})
+                out[category] = dict(
+                    self._counts[category], queued=depth[category],
+                    running=self._running[category], limit=self.limits.get(category),
+                    wait_p50_ms=wait.get("p50_ms"), wait_p95_ms=wait.get("p95_ms"),
+                )
+            return out
+
+
+executor = TaskExecutor()
@@ -0,0 +1,24 @@
+"""Configuration commune des tests.
+
+`config.py` (clés API, coordonnées) n'est pas versionné : s'il est absent,
+on en fournit un minimal pour que les modules du HUD s'importent. Les
+caches (`~/.cache/twilight_hud`) vont dans un HOME jetable.
+"""
+import os
+import sys
+import types
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["HOME"] = tempfile.mkdtemp(prefix="twilight-hud-tests-")
+
+try:
+    import config  # noqa: F401
+except ImportError:
+    config = types.ModuleType("config")
+    config.LATITUDE = 48.85
+    config.LONGITUDE = 2.35
+    config.LOG_FILE = ""
+    config.SNAPSHOT_ENABLED = False
+    sys.modules["config"] = config
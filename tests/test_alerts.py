@@ -0,0 +1,169 @@
+"""AlertScheduler piloté par une horloge simulée : ni alerte manquée, ni doublon."""
+import time
+import datetime
+import threading
+from datetime import timezone
+
+import pytest
+
+from alerts import AlertScheduler
+
+zoneinfo = pytest.importorskip("zoneinfo")
+try:
+    PARIS = zoneinfo.ZoneInfo("Europe/Paris")
+except zoneinfo.ZoneInfoNotFoundError:
+    pytest.skip("base tz indisponible", allow_module_level=True)
+
+
+class FakeClock:
+    def __init__(self, dt):
+        self.now = dt.timestamp()
+
+    def __call__(self):
+        return self.now
+
+    def set(self, dt):
+        self.now = dt.timestamp()
+
+
+def make(clock):
+    fired = []
+    scheduler = AlertScheduler(
+        lambda message, event, minutes: fired.append((clock(), event, minutes)),
+        events=("nautical_end",), offsets_min=(30, 20, 10), clock=clock,
+    )
+    return scheduler, fired
+
+
+def run_until(scheduler, clock, end, step_s=10):
+    """Avance l'horloge par pas de `step_s` jusqu'à `end` en appelant run_pending."""
+    end_ts = end.timestamp()
+    while clock.now < end_ts:
+        clock.now = min(end_ts, clock.now + step_s)
+        scheduler.run_pending(clock.now)
+
+
+def utc(*args):
+    return datetime.datetime(*args, tzinfo=timezone.utc)
+
+
+def test_dst_spring_forward_2024_03_31():
+    # 02:00 CET -> 03:00 CEST (01:00 UTC) ; les échéances 30/20/10 min
+    # encadrent le saut : 01:45 CET, 01:55 CET, 03:05 CEST
+    event = datetime.datetime(2024, 3, 31, 3, 15, tzinfo=PARIS)
+    assert event.astimezone(timezone.utc) == utc(2024, 3, 31, 1, 15)
+    clock = FakeClock(datetime.datetime(2024, 3, 31, 0, 30, tzinfo=PARIS))
+    scheduler, fired = make(clock)
+    scheduler.plan({"nautical_end": event})
+    run_until(scheduler, clock, utc(2024, 3, 31, 3, 0))
+
+    assert [m for _, _, m in fired] == [30, 20, 10]
+    expected = [utc(2024, 3, 31, 0, 45), utc(2024, 3, 31, 0, 55), utc(2024, 3, 31, 1, 5)]
+    for (ts, _, _), due in zip(fired, expected):
+        assert 0 <= ts - due.timestamp() < 10  # au pas de simulation près
+
+
+def test_dst_fall_back_2024_10_27_no_duplicate():
+    # 03:00 CEST -> 02:00 CET : l'heure 02:xx existe deux fois
+    event = datetime.datetime(2024, 10, 27, 2, 40, tzinfo=PARIS, fold=1)  # 2e passage (CET)
+    clock = FakeClock(datetime.datetime(2024, 10, 27, 1, 0, tzinfo=PARIS))
+    scheduler, fired = make(clock)
+    scheduler.plan({"nautical_end": event})
+    run_until(scheduler, clock, utc(2024, 10, 27, 3, 0))
+
+    assert [m for _, _, m in fired] == [30, 20, 10]
+    assert fired[-1][0] == pytest.approx(utc(2024, 10, 27, 1, 30).timestamp(), abs=10)
+
+
+def test_suspend_resume_merges_missed_alerts():
+    event = datetime.datetime(2024, 6, 1, 22, 0, tzinfo=PARIS)
+    clock = FakeClock(datetime.datetime(2024, 6, 1, 21, 0, tzinfo=PARIS))
+    scheduler, fired = make(clock)
+    scheduler.plan({"nautical_end": event})
+    scheduler.run_pending(clock.now)
+    assert fired == []
+
+    # veille de 21:00 à 21:45 : les alertes -30 et -20 sont dépassées
+    clock.set(datetime.datetime(2024, 6, 1, 21, 45, tzinfo=PARIS))
+    scheduler.run_pending(clock.now)
+    assert [m for _, _, m in fired] == [15]  # une seule, minutes restantes réelles
+
+    run_until(scheduler, clock, datetime.datetime(2024, 6, 1, 23, 0, tzinfo=PARIS))
+    assert [m for _, _, m in fired] == [15, 10]
+
+
+def test_suspend_past_event_fires_nothing():
+    event = datetime.datetime(2024, 6, 1, 22, 0, tzinfo=PARIS)
+    clock = FakeClock(datetime.datetime(2024, 6, 1, 21, 0, tzinfo=PARIS))
+    scheduler, fired = make(clock)
+    scheduler.plan({"nautical_end": event})
+    clock.set(datetime.datetime(2024, 6, 2, 7, 0, tzinfo=PARIS))  # réveil le lendemain
+    assert scheduler.run_pending(clock.now) is None
+    assert fired == []
+
+
+def test_replan_midday_does_not_refire():
+    event = datetime.datetime(2024, 6, 1, 22, 0, tzinfo=PARIS)
+    clock = FakeClock(datetime.datetime(2024, 6, 1, 12, 0, tzinfo=PARIS))
+    scheduler, fired = make(clock)
+    scheduler.plan({"nautical_end": event})
+    run_until(scheduler, clock, datetime.datetime(2024, 6, 1, 21, 35, tzinfo=PARIS))
+    assert [m for _, _, m in fired] == [30]
+
+    # nouveau jeu d'horaires (fetch API, contrôle croisé) : même événement, +1 min
+    scheduler.plan({"nautical_end": event + datetime.timedelta(minutes=1)})
+    scheduler.plan({"nautical_end": event + datetime.timedelta(minutes=1)})
+    run_until(scheduler, clock, datetime.datetime(2024, 6, 1, 23, 0, tzinfo=PARIS))
+    assert [m for _, _, m in fired] == [30, 20, 10]
+
+
+def test_late_start_skips_past_alerts():
+    event = datetime.datetime(2024, 6, 1, 22, 0, tzinfo=PARIS)
+    # HUD lancé à 21:45 : -30 et -20 déjà passées au moment du plan()
+    clock = FakeClock(datetime.datetime(2024, 6, 1, 21, 45, tzinfo=PARIS))
+    scheduler, fired = make(clock)
+    scheduler.plan({"nautical_end": event})
+    run_until(scheduler, clock, datetime.datetime(2024, 6, 1, 23, 0, tzinfo=PARIS))
+    assert [m for _, _, m in fired] == [10]
+
+
+class SlowDone(set):
+    """`_done` qui élargit la fenêtre de course entre plan() et run_pending()."""
+    def __init__(self):
+        super().__init__()
+        self.planning = threading.Event()
+        self.recording = threading.Event()
+
+    def __contains__(self, key):  # plan() : l'alerte due est-elle déjà traitée ?
+        self.planning.set()
+        self.recording.wait(0.2)
+        return super().__contains__(key)
+
+    def add(self, key):  # run_pending() : alerte sortie du plan, enregistrée après coup
+        self.recording.set()
+        time.sleep(0.05)
+        super().add(key)
+
+
+def test_replan_concurrent_with_due_alert_fires_once():
+    event = datetime.datetime(2024, 6, 1, 22, 0, tzinfo=PARIS)
+    clock = FakeClock(datetime.datetime(2024, 6, 1, 21, 40, tzinfo=PARIS))
+    fired = []
+    scheduler = AlertScheduler(
+        lambda message, ev, minutes: fired.append(minutes),
+        events=("nautical_end",), offsets_min=(10,), clock=clock,
+    )
+    scheduler.plan({"nautical_end": event})
+    scheduler._done = SlowDone()
+    clock.set(datetime.datetime(2024, 6, 1, 21, 51, tzinfo=PARIS))  # -10 min due
+
+    # thread crépuscule : nouveau jeu d'horaires pendant que l'alerte tombe
+    replan = threading.Thread(target=scheduler.plan, args=({"nautical_end": event},))
+    replan.start()
+    assert scheduler._done.planning.wait(2.0)
+    scheduler.run_pending()
+    replan.join()
+    scheduler.run_pending()
+    clock.set(datetime.datetime(2024, 6, 1, 21, 55, tzinfo=PARIS))
+    scheduler.run_pending()
+    assert fired == [9]
@@ -0,0 +1,21 @@
+"""bench_suite : un faux service jamais appelé fait échouer le banc."""
+import bench_suite
+from fake_apis import FakeAPIs
+
+
+def test_silent_services():
+    results = {"servers": {"sunrise": {"requests": 3, "failures": 0},
+                           "openai": {"requests": 0, "failures": 0},
+                           "twilio": {"requests": 0, "failures": 0}}}
+    assert bench_suite.silent_services(results) == ["openai", "twilio"]
+    assert bench_suite.silent_services({"servers": {}}) == []
+
+
+def test_overrides_keep_tts_on_the_fake():
+    apis = FakeAPIs().start()
+    try:
+        overrides = apis.config_overrides()
+    finally:
+        apis.stop()
+    assert overrides["TTS_POLICY"] == {"story": ("gcloud",), "alert": ("gcloud",)}
+    assert overrides["GCP_TTS_ENDPOINT"].startswith("http://127.0.0.1:")
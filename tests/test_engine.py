@@ -0,0 +1,124 @@
+"""engine : histoires de la réserve (on_done garanti), `--once` en mode API."""
+import time
+import datetime
+
+import pytest
+
+pytest.importorskip("requests")
+
+import config  # noqa: E402
+import engine  # noqa: E402
+import story  # noqa: E402
+import tasks  # noqa: E402
+import tts  # noqa: E402
+import twilight  # noqa: E402
+
+
+class FakeBuffer:
+    def __init__(self, item):
+        self.item = item
+        self.idle = []
+
+    def pop(self):
+        item, self.item = self.item, None
+        return item
+
+    def set_idle(self, idle):
+        self.idle.append(idle)
+
+
+@pytest.fixture
+def assistant(monkeypatch):
+    # tâches exécutées sur place : le test voit on_done sans attendre le pool
+    monkeypatch.setattr(tasks.executor, "submit",
+                        lambda category, fn, **kwargs: fn(tasks.CancelToken(None)))
+    a = engine.AssistantEngine()
+    a.story_client = object()
+    a.story_buffer = FakeBuffer({"story": "Il était une fois.",
+                                 "chunks": [{"text": "un"}, {"text": "deux"}]})
+    return a
+
+
+@pytest.mark.parametrize("error", [tts.TTSUnavailable("aucun moteur"), OSError("disque plein")])
+def test_buffered_story_always_calls_on_done(assistant, monkeypatch, error):
+    played, done = [], []
+
+    def chunk_audio(chunk):
+        if chunk["text"] == "deux":
+            raise error
+        return f"/tmp/{chunk['text']}.mp3", "test"
+
+    monkeypatch.setattr(story, "chunk_audio", chunk_audio)
+    assert assistant.start_story(lambda path, eng: played.append(path), done.append)
+    assert played == ["/tmp/un.mp3"]
+    assert done == [None]
+
+
+def test_on_audio_error_still_calls_on_done(assistant, monkeypatch):
+    done = []
+    monkeypatch.setattr(story, "chunk_audio", lambda chunk: (chunk["text"], "test"))
+
+    def on_audio(path, eng):
+        raise RuntimeError("lecteur fermé")
+
+    assert assistant.start_story(on_audio, done.append)
+    assert done == [None]
+
+
+# ---------- --once ----------
+CIVIL_START = "2024-06-01T03:00:00+00:00"
+
+
+@pytest.fixture
+def api_source(monkeypatch, tmp_path):
+    """Source "api", cache vide : `--once` doit attendre le fetch en fond."""
+    monkeypatch.setattr(config, "TWILIGHT_SOURCE", "api", raising=False)
+    monkeypatch.setattr(config, "TWILIGHT_CACHE_PATH", str(tmp_path / "twilight.json"), raising=False)
+    monkeypatch.setattr(config, "TWILIGHT_PREFILL_DAYS", 0, raising=False)
+
+    def use(fetch):
+        monkeypatch.setattr(engine.TwilightService, "fetch_with_retries", staticmethod(fetch))
+    return use
+
+
+def once_lines(capsys):
+    out = capsys.readouterr().out
+    return [line for line in out.splitlines() if " : " in line and not line.startswith("[")], out
+
+
+def test_once_waits_for_api(api_source, capsys):
+    def fetch(url, **kwargs):
+        time.sleep(0.2)
+        return {"results": {"civil_twilight_begin": CIVIL_START}}
+    api_source(fetch)
+
+    assert engine.main(["--once"]) == 0
+    lines, _ = once_lines(capsys)
+    local = datetime.datetime.fromisoformat(CIVIL_START).astimezone()
+    assert lines == [f"civil_start : {local:%H:%M}", "civil_end : --:--",
+                     "nautical_start : --:--", "nautical_end : --:--"]
+
+
+def test_once_falls_back_to_local(api_source, capsys):
+    def fetch(url, **kwargs):
+        raise OSError("réseau coupé")
+    api_source(fetch)
+
+    assert engine.main(["--once"]) == 0
+    lines, out = once_lines(capsys)
+    assert "calcul local" in out
+    assert len(lines) == 4 and all(not line.endswith("--:--") for line in lines)
+
+
+def test_once_fails_without_any_times(api_source, monkeypatch, capsys):
+    def fetch(url, **kwargs):
+        raise OSError("réseau coupé")
+    api_source(fetch)
+
+    def broken(*args):
+        raise ValueError("coordonnées invalides")
+    monkeypatch.setattr(twilight, "twilight_times", broken)
+
+    assert engine.main(["--once"]) == 1
+    lines, _ = once_lines(capsys)
+    assert lines == []
@@ -0,0 +1,58 @@
+"""http_client : validateurs ETag bornés (LRU), 304 servi depuis le cache."""
+import pytest
+
+requests = pytest.importorskip("requests")
+
+import http_client  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, status, data=None, etag=None):
+        self.status_code = status
+        self._data = data
+        self.headers = {"ETag": etag} if etag else {}
+
+    def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(self.status_code)
+
+
+@pytest.fixture
+def fake_get(monkeypatch):
+    calls = []
+
+    def get(url, timeout=8, headers=None, **kwargs):
+        calls.append((url, dict(headers or {})))
+        if (headers or {}).get("If-None-Match") == f'"{url}"':
+            return FakeResponse(304)
+        return FakeResponse(200, {"url": url}, etag=f'"{url}"')
+    monkeypatch.setattr(http_client, "get", get)
+    monkeypatch.setattr(http_client, "_validators", http_client.OrderedDict())
+    monkeypatch.setattr(http_client, "VALIDATORS_MAX", 3)
+    return calls
+
+
+def test_not_modified_served_from_cache(fake_get):
+    url = "https://api.example/json?date=2026-10-17"
+    assert http_client.get_json(url) == {"url": url}
+    assert http_client.get_json(url) == {"url": url}
+    assert fake_get[1][1]["If-None-Match"] == f'"{url}"'
+
+
+def test_validators_are_bounded_lru(fake_get):
+    urls = [f"https://api.example/json?page={i}" for i in range(10)]
+    for url in urls:
+        http_client.get_json(url)
+    http_client.get_json(urls[7])  # récent : reste
+    http_client.get_json("https://api.example/json?page=new")
+    assert len(http_client._validators) == 3
+    assert urls[7] in http_client._validators
+    assert urls[0] not in http_client._validators
+
+
+def test_unconditional_requests_are_not_cached(fake_get):
+    http_client.get_json("https://api.example/search?key=SECRET", conditional=False)
+    assert not http_client._validators
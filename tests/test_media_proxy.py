@@ -0,0 +1,106 @@
+"""media_proxy : plafond disque tenu pendant la lecture (flux actif compris)."""
+import os
+import sys
+import threading
+import subprocess
+
+import pytest
+
+requests = pytest.importorskip("requests")
+
+from fake_apis import FakeMedia  # noqa: E402
+from media_proxy import BLOCK, SEGMENT, MediaProxy  # noqa: E402
+
+SIZE = 8 * 1024 * 1024
+CAP = 3 * SEGMENT
+
+
+def disk_bytes(directory):
+    total = 0
+    for entry in os.scandir(directory):
+        try:
+            total += entry.stat().st_size
+        except FileNotFoundError:
+            pass  # segment rendu pendant le parcours
+    return total
+
+
+@pytest.fixture
+def media():
+    m = FakeMedia(size=SIZE, first_byte_ms=0, kbps=400_000).start()
+    yield m
+    m.stop()
+
+
+@pytest.fixture
+def proxy(media, tmp_path):
+    p = MediaProxy(resolve=media.url, directory=str(tmp_path / "proxy"), max_bytes=CAP,
+                   readahead_bytes=512 * 1024, keep_behind_bytes=256 * 1024).start()
+    yield p
+    p.stop()
+
+
+def read_all(url, chunk=BLOCK):
+    r = requests.get(url, stream=True, timeout=30)
+    r.raise_for_status()
+    return b"".join(r.iter_content(chunk))
+
+
+def test_playing_stream_stays_under_cap(media, proxy):
+    url = proxy.url_for("abc", media.url("abc"))
+    peak = {"bytes": 0, "disk": 0}
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(0.005):
+            peak["bytes"] = max(peak["bytes"], proxy.stats()["bytes"])
+            peak["disk"] = max(peak["disk"], disk_bytes(proxy.directory))
+
+    t = threading.Thread(target=sample, daemon=True)
+    t.start()
+    try:
+        data = read_all(url)
+    finally:
+        done.set()
+        t.join()
+    assert data == media.data
+    # marge : un segment en cours d'écriture au-delà du plafond
+    assert peak["bytes"] <= CAP + SEGMENT
+    assert peak["disk"] <= CAP + SEGMENT
+    assert proxy.stats()["trimmed"] > 0
+
+
+def test_rewind_after_trim_refetches(media, proxy):
+    url = proxy.url_for("abc", media.url("abc"))
+    assert read_all(url) == media.data
+    r = requests.get(url, headers={"Range": "bytes=0-99"}, timeout=30)
+    assert r.status_code == 206
+    assert r.content == media.data[:100]
+
+
+def test_under_cap_keeps_whole_track(media, tmp_path):
+    p = MediaProxy(resolve=media.url, directory=str(tmp_path / "big"), max_bytes=2 * SIZE,
+                   readahead_bytes=SIZE).start()
+    try:
+        url = p.url_for("abc", media.url("abc"))
+        assert read_all(url) == media.data
+        before = p.stats()["upstream_requests"]
+        assert read_all(url) == media.data  # retour au début : servi depuis le disque
+        assert p.stats()["upstream_requests"] == before
+        assert p.stats()["trimmed"] == 0
+    finally:
+        p.stop()
+
+
+def test_import_is_side_effect_free(tmp_path):
+    """L'import (via playback, à chaque lancement) ne crée ni ne vide le dossier du proxy."""
+    home = tmp_path / "home"
+    cache = home / ".cache" / "twilight_hud" / "proxy"
+    cache.mkdir(parents=True)
+    (cache / "leftover-0.part").write_bytes(b"x")
+    code = ("import sys, types; sys.modules.setdefault('config', types.ModuleType('config')); "
+            "import media_proxy; assert media_proxy._proxy is None")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", code], cwd=root, check=True,
+                   env=dict(os.environ, HOME=str(home)))
+    assert (cache / "leftover-0.part").exists()
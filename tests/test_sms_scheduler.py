@@ -0,0 +1,54 @@
+"""SmsScheduler : débit limité dans la boucle, pas dans les threads de l'exécuteur."""
+import os
+import time
+import threading
+
+from sms_scheduler import SmsScheduler, RateLimiter
+
+
+def test_rate_limiter_try_acquire_never_blocks():
+    limiter = RateLimiter(rate=10, burst=2)
+    assert limiter.try_acquire() == 0 and limiter.try_acquire() == 0
+    t0 = time.monotonic()
+    wait = limiter.try_acquire()
+    assert time.monotonic() - t0 < 0.01
+    assert 0 < wait <= 0.1
+
+
+def test_batch_is_rate_limited_before_submission(tmp_path):
+    sent, lock, done = [], threading.Lock(), threading.Event()
+    started = threading.local()
+    in_worker_wait = []
+
+    def sender(body, recipient):
+        with lock:
+            sent.append(time.monotonic())
+            in_worker_wait.append(sent[-1] - started.t0)
+            if len(sent) == 6:
+                done.set()
+        return f"SM{len(sent)}"
+
+    scheduler = SmsScheduler(os.path.join(tmp_path, "sms.sqlite3"), workers=2,
+                             rate_per_sec=10.0, sender=sender)
+    run_job = scheduler._run_job
+
+    def timed_run_job(job_id):
+        started.t0 = time.monotonic()  # le job vient d'obtenir un thread de l'exécuteur
+        run_job(job_id)
+    scheduler._run_job = timed_run_job
+    scheduler.start()
+    try:
+        t0 = time.monotonic()
+        scheduler.schedule("batch", time.time(), recipients=[f"+33{i}" for i in range(6)])
+        assert done.wait(5)
+        # rafale de 2 puis 10/s : 4 jetons à attendre, ~0.4 s
+        assert sent[-1] - t0 >= 0.3
+        # aucun thread de l'exécuteur n'attend le seau : l'envoi suit la prise du job
+        assert max(in_worker_wait) < 0.05
+        for _ in range(50):
+            if scheduler.stats().get("sent") == 6:
+                break
+            time.sleep(0.02)
+        assert scheduler.stats() == {"sent": 6}
+    finally:
+        scheduler.stop()
@@ -0,0 +1,81 @@
+"""story : découpage en phrases et pipeline streaming (client OpenAI factice)."""
+import time
+from types import SimpleNamespace
+
+import story
+
+
+def event(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+class FakeClient:
+    """`client.chat.completions.create(stream=True)` -> deltas espacés de `token_delay_s`."""
+    def __init__(self, deltas, token_delay_s=0.0):
+        self.deltas = deltas
+        self.token_delay_s = token_delay_s
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        assert kwargs["stream"] is True
+        yield SimpleNamespace(choices=[])  # événement sans choix : ignoré
+        for delta in self.deltas:
+            time.sleep(self.token_delay_s)
+            yield event(delta)
+
+
+def test_chunker_first_sentence_alone_then_grouped():
+    chunker = story.SentenceChunker(min_chars=20)
+    out = []
+    for piece in ["Il était ", "une fois. Une lan", "terne. Elle brillait. Fin", " du conte"]:
+        out += chunker.feed(piece)
+    assert out == ["Il était une fois.", "Une lanterne. Elle brillait."]
+    assert chunker.flush() == "Fin du conte"
+
+
+def test_chunker_keeps_closing_quote():
+    chunker = story.SentenceChunker(min_chars=1)
+    assert chunker.feed("« Bonsoir ! » dit-il. Puis") == ["« Bonsoir ! »", "dit-il."]
+    assert chunker.feed(" (enfin). \"Oui.\" Non") == ["Puis (enfin).", "\"Oui.\""]
+
+
+def test_pipeline_delivers_in_order_while_streaming():
+    deltas = ["Première phrase. ", "Deuxième phrase assez longue. ", "Troisième. ", "Fin"]
+    delays = {"Première phrase.": 0.15, "Deuxième phrase assez longue.": 0.0}
+    delivered = []
+
+    def synth(text):
+        time.sleep(delays.get(text, 0.05))
+        return f"/tmp/{len(text)}.mp3", "fake"
+
+    pipeline = story.StoryPipeline(
+        FakeClient(deltas, token_delay_s=0.05),
+        on_audio=lambda i, path, engine, text: delivered.append((i, text, time.perf_counter())),
+        synth=synth, min_chars=10,
+    )
+    t0 = time.perf_counter()
+    stats = pipeline.run("prompt")
+    assert [(i, text) for i, text, _ in delivered] == [
+        (0, "Première phrase."), (1, "Deuxième phrase assez longue."), (2, "Troisième."), (3, "Fin")]
+    assert stats["story"] == "".join(deltas)
+    assert stats["chunks"] == 4
+    assert stats["first_token_ms"] <= stats["first_sentence_ms"] <= stats["first_audio_ms"]
+    # le premier passage est joué avant la fin de la génération
+    assert delivered[0][2] - t0 < stats["total_ms"] / 1000.0
+
+
+def test_pipeline_skips_failed_chunk():
+    delivered = []
+
+    def synth(text):
+        if text.startswith("Deux"):
+            raise OSError("synthèse impossible")
+        return "/tmp/x.mp3", "fake"
+
+    pipeline = story.StoryPipeline(
+        FakeClient(["Un. ", "Deux. ", "Trois."]),
+        on_audio=lambda i, path, engine, text: delivered.append((i, text)),
+        synth=synth, min_chars=1,
+    )
+    pipeline.run("prompt")
+    assert delivered == [(0, "Un."), (1, "Trois.")]
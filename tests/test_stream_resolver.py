@@ -0,0 +1,60 @@
+"""StreamResolver : un clic ne passe pas derrière les préchargements ; purge des URLs expirées."""
+import time
+
+import stream_resolver
+from stream_resolver import StreamResolver
+
+
+def fake_resolver(delays):
+    """Extraction simulée : `delays[video_id]` secondes (0 par défaut)."""
+    resolver = StreamResolver(prefetch_workers=1, demand_workers=1)
+
+    def extract(video_id):
+        try:
+            time.sleep(delays.get(video_id, 0.0))
+            url = f"https://media.example/{video_id}?expire={int(time.time()) + 3600}"
+            with resolver._lock:
+                resolver._cache[video_id] = (url, time.time() + 3600)
+            return url, "primary"
+        finally:
+            with resolver._lock:
+                resolver._inflight.pop(video_id, None)
+    resolver._extract = extract
+    return resolver
+
+
+def test_click_does_not_wait_behind_prefetch():
+    resolver = fake_resolver({"p1": 1.0, "p2": 1.0, "p3": 1.0})
+    resolver.prefetch(["p1", "p2", "p3"])
+    t0 = time.monotonic()
+    url, source = resolver.resolve("clicked", timeout=2)
+    assert source == "primary" and "clicked" in url
+    assert time.monotonic() - t0 < 0.5
+
+
+def test_click_on_queued_prefetch_moves_to_demand_pool():
+    resolver = fake_resolver({"p1": 1.0, "p2": 0.0})
+    resolver.prefetch(["p1", "p2"])  # p2 en file derrière p1
+    t0 = time.monotonic()
+    url, _ = resolver.resolve("p2", timeout=2)
+    assert "p2" in url
+    assert time.monotonic() - t0 < 0.5
+
+
+def test_expired_entries_are_purged():
+    resolver = StreamResolver(prefetch_workers=1)
+    now = time.time()
+    resolver._cache["old"] = ("u-old", now + stream_resolver.EXPIRY_MARGIN_SEC - 1)
+    resolver._cache["stale"] = ("u-stale", now - 10)
+    resolver._cache["fresh"] = ("u-fresh", now + 3600)
+    assert resolver.cached("old") is None
+    assert "old" not in resolver._cache
+    assert resolver.export() == {"fresh": ["u-fresh", now + 3600]}
+    assert set(resolver._cache) == {"fresh"}
+
+
+def test_restore_skips_expired():
+    resolver = StreamResolver(prefetch_workers=1)
+    now = time.time()
+    assert resolver.restore({"a": ["u", now + 3600], "b": ["u", now - 1]}) == 1
+    assert resolver.cached("a") == "u"
@@ -0,0 +1,56 @@
+"""TaskExecutor : une action de l'utilisateur n'attend pas le travail de fond."""
+import threading
+
+import tasks
+
+
+def blocker(started, release):
+    def fn(token):
+        started.release()
+        release.wait(5)
+    return fn
+
+
+def test_user_task_runs_while_background_saturates_pool():
+    ex = tasks.TaskExecutor(workers=6, limits={"story": 6, "sms": 6, "preload": 6},
+                            deadlines_s={}, user_reserve=1)
+    started, release = threading.Semaphore(0), threading.Event()
+    try:
+        for category in ("story", "sms", "sms", "preload", "story", "sms", "preload"):
+            ex.submit(category, blocker(started, release))
+        for _ in range(5):
+            assert started.acquire(timeout=2)
+        assert not started.acquire(timeout=0.2)  # 5 threads de fond au plus
+
+        ran = threading.Event()
+        ex.submit("search", lambda token: ran.set(), priority=tasks.USER)
+        assert ran.wait(2), ex.stats()
+    finally:
+        release.set()
+
+
+def test_background_limit_releases_after_completion():
+    ex = tasks.TaskExecutor(workers=2, limits={"story": 2}, deadlines_s={}, user_reserve=1)
+    done = threading.Semaphore(0)
+    for _ in range(3):
+        ex.submit("story", lambda token: done.release())
+    for _ in range(3):
+        assert done.acquire(timeout=2)
+    assert ex.stats()["story"]["completed"] == 3
+
+
+def test_same_key_cancels_queued_task():
+    ex = tasks.TaskExecutor(workers=1, limits={"search": 1}, deadlines_s={}, user_reserve=0)
+    started, release = threading.Semaphore(0), threading.Event()
+    ex.submit("search", blocker(started, release), priority=tasks.USER)
+    assert started.acquire(timeout=2)
+    dropped = []
+    ex.submit("search", lambda token: None, priority=tasks.USER, key="q",
+              on_drop=dropped.append)
+    ex.submit("search", lambda token: None, priority=tasks.USER, key="q")
+    release.set()
+    for _ in range(100):
+        if dropped:
+            break
+        threading.Event().wait(0.02)
+    assert dropped == ["cancelled"]
@@ -0,0 +1,98 @@
+"""tts : couverture (hedging) du moteur préféré par le suivant, moteurs factices."""
+import time
+import uuid
+import threading
+
+import pytest
+
+import tts
+
+
+class FakeEngine:
+    """Écrit un faux MP3 après `delay_s` ; lève si annulé ou si `fail`."""
+    def __init__(self, delay_s, fail=False):
+        self.delay_s = delay_s
+        self.fail = fail
+        self.calls = 0
+        self.cancelled = threading.Event()
+
+    def __call__(self, text, path, cancel=None):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("moteur en panne")
+        deadline = time.monotonic() + self.delay_s
+        while time.monotonic() < deadline:
+            if cancel is not None and cancel.is_set():
+                self.cancelled.set()
+                raise RuntimeError("annulé")
+            time.sleep(0.005)
+        with open(path, "wb") as f:
+            f.write(b"ID3" + text.encode("utf-8"))
+
+
+@pytest.fixture
+def engines(monkeypatch):
+    """Moteurs "a" (préféré) puis "b" ; statistiques remises à zéro."""
+    monkeypatch.setattr(tts, "TTS_POLICY", {"story": ("a", "b")})
+    monkeypatch.setattr(tts, "HEDGE_DEFAULT_MS", 100.0)
+    monkeypatch.setattr(tts, "_latencies", {})
+    monkeypatch.setattr(tts, "_down_until", {})
+    monkeypatch.setattr(tts, "hedges", 0)
+    monkeypatch.setattr(tts, "hedge_wins", 0)
+
+    def install(a, b):
+        monkeypatch.setattr(tts, "_ENGINES", {"a": (True, a), "b": (True, b)})
+    return install
+
+
+def text():
+    return f"Phrase de test {uuid.uuid4()}."  # jamais en cache
+
+
+def test_slow_primary_is_covered(engines):
+    a, b = FakeEngine(2.0), FakeEngine(0.01)
+    engines(a, b)
+    t0 = time.monotonic()
+    path, name = tts.synthesize(text(), hedge=True)
+    assert name == "b"
+    assert time.monotonic() - t0 < 1.0
+    assert (tts.hedges, tts.hedge_wins) == (1, 1)
+    assert a.cancelled.wait(1.0)
+    assert "a" not in tts._down_until  # perdant annulé : pas mis de côté
+
+
+def test_fast_primary_not_hedged(engines):
+    a, b = FakeEngine(0.01), FakeEngine(0.01)
+    engines(a, b)
+    _, name = tts.synthesize(text(), hedge=True)
+    assert name == "a"
+    assert b.calls == 0
+    assert tts.hedges == 0
+
+
+def test_failed_primary_falls_through_without_waiting(engines, monkeypatch):
+    monkeypatch.setattr(tts, "HEDGE_DEFAULT_MS", 5000.0)
+    a, b = FakeEngine(0.0, fail=True), FakeEngine(0.01)
+    engines(a, b)
+    t0 = time.monotonic()
+    _, name = tts.synthesize(text(), hedge=True)
+    assert name == "b"
+    assert time.monotonic() - t0 < 1.0
+    assert tts.hedges == 0
+    assert "a" in tts._down_until
+
+
+def test_all_engines_failing_raise(engines):
+    engines(FakeEngine(0.0, fail=True), FakeEngine(0.0, fail=True))
+    with pytest.raises(tts.TTSUnavailable):
+        tts.synthesize(text(), hedge=True)
+
+
+def test_hedge_delay_follows_p95(engines, monkeypatch):
+    assert tts.hedge_delay_ms("a") == 100.0  # pas assez de mesures
+    monkeypatch.setattr(tts, "_latencies", {"a": list(range(400, 420))})
+    assert tts.hedge_delay_ms("a") == 419
+    monkeypatch.setattr(tts, "_latencies", {"a": [10] * 20})
+    assert tts.hedge_delay_ms("a") == tts.HEDGE_MIN_MS
+    monkeypatch.setattr(tts, "_latencies", {"a": [60000] * 20})
+    assert tts.hedge_delay_ms("a") == tts.HEDGE_MAX_MS
@@ -0,0 +1,71 @@
+"""Moteur local de crépuscule contre astral (mêmes formules NOAA, format `results` de l'API)."""
+import os
+import sys
+import json
+import datetime
+import subprocess
+
+import pytest
+
+import twilight
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+with open(os.path.join(HERE, "data", "twilight_reference.json"), encoding="utf-8") as f:
+    CASES = json.load(f)["cases"]
+
+
+def tolerance_s(lat):
+    # au-delà du cercle polaire le soleil frôle les hauteurs visées : une
+    # infime erreur de hauteur devient un écart de temps
+    return 30.0 if abs(lat) <= 61 else 60.0
+
+
+@pytest.mark.parametrize("case", CASES, ids=lambda c: f"{c['place']}-{c['date']}")
+def test_matches_reference(case):
+    day = datetime.date.fromisoformat(case["date"])
+    mine = twilight.twilight_times(day, case["lat"], case["lng"])
+    for key in twilight.FIELDS:
+        ref = twilight._as_datetime(case["results"][key])
+        if ref is None:
+            assert mine[key] is None, f"{key} : aucun événement attendu"
+            continue
+        assert mine[key] is not None, f"{key} : événement manquant"
+        error = abs((mine[key] - ref).total_seconds())
+        assert error <= tolerance_s(case["lat"]), f"{key} : écart {error:.0f} s"
+
+
+def test_cross_check_ignores_absent_events():
+    case = next(c for c in CASES if c["place"] == "Tromsø" and c["date"] == "2024-06-21")
+    local = twilight.to_results(twilight.twilight_times(
+        datetime.date(2024, 6, 21), case["lat"], case["lng"]))
+    assert twilight.cross_check(case["results"], local) < 60
+
+
+def test_batch_matches_scalar():
+    np = pytest.importorskip("numpy")
+    lats = np.array([48.85, 59.91, -33.87, 69.65])
+    lngs = np.array([2.35, 10.75, 151.21, 18.96])
+    table = twilight.twilight_batch(datetime.date(2024, 3, 31), lats, lngs)
+    for i in range(len(lats)):
+        scalar = twilight.twilight_times(datetime.date(2024, 3, 31), lats[i], lngs[i])
+        for key in twilight.FIELDS:
+            if scalar[key] is None:
+                assert np.isnan(table[key][i])
+            else:
+                assert table[key][i] == pytest.approx(scalar[key].timestamp(), abs=1e-3)
+
+
+def test_year_table_polar_nights_are_nan():
+    np = pytest.importorskip("numpy")
+    table = twilight.year_table(2024, 69.65, 18.96)
+    assert len(table["date"]) == 366
+    assert np.isnan(table["sunrise"]).sum() > 100  # nuit et jour polaires à Tromsø
+
+
+def test_import_does_not_load_numpy():
+    # process neuf : config minimale (les réglages ont tous une valeur par défaut)
+    code = ("import sys, types; sys.modules.setdefault('config', types.ModuleType('config')); "
+            "import twilight; print('numpy' in sys.modules)")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                         cwd=os.path.dirname(HERE))
+    assert out.stdout.strip() == "False", out.stderr
@@ -0,0 +1,170 @@
+"""Miniatures des résultats YouTube : chargement en fond, cache mémoire + disque.
+
+Le modèle ne demande une miniature que quand la vue l'affiche (`data()`
+n'est appelé que pour les lignes visibles). Le téléchargement et le
+décodage (`QImage`, utilisable hors thread GUI) tournent dans un pool
+borné ; une demande qui n'est plus visible au moment de partir est
+abandonnée. Les `QPixmap` vivent dans un LRU plafonné en octets, les
+JPEG bruts dans un `DiskLRU`.
+"""
+import os
+import time
+import threading
+import traceback
+from collections import OrderedDict
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QSize, Qt, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QImage, QPixmap, QColor
+
+import config
+import http_client
+import metrics
+from disk_cache import DiskLRU
+
+THUMB_SIZE = QSize(80, 60)
+
+
+def thumbnail_url(video):
+    thumbs = video.get("thumbnails") or {}
+    for quality in ("default", "medium", "high"):
+        url = (thumbs.get(quality) or {}).get("url")
+        if url:
+            return url
+    return None
+
+
+def _write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+class ThumbnailSignals(QObject):
+    loaded = pyqtSignal(str, object)   # video_id, QImage (None si échec)
+    skipped = pyqtSignal(str)          # plus visible au moment de partir
+
+
+class ThumbnailWorker(QRunnable):
+    """Disque, sinon réseau -> QImage redimensionnée (hors thread GUI)."""
+    def __init__(self, loader, video_id, url):
+        super().__init__()
+        self.loader = loader
+        self.video_id = video_id
+        self.url = url
+        self.signals = loader.signals
+
+    def run(self):
+        if not self.loader.still_wanted(self.video_id):
+            self.signals.skipped.emit(self.video_id)  # sorti de l'écran entre-temps
+            return
+        try:
+            disk = self.loader.disk
+            path = disk.get(self.video_id) if self.video_id in disk else None
+            if path is None:
+                with metrics.span("thumbnail.fetch"):
+                    r = http_client.get(self.url, timeout=8)
+                    r.raise_for_status()
+                data = r.content
+                disk.put(self.video_id, lambda tmp: _write(tmp, data))
+            else:
+                with open(path, "rb") as f:
+                    data = f.read()
+            image = QImage()
+            if not image.loadFromData(data):
+                raise ValueError("image illisible")
+            image = image.scaled(THUMB_SIZE, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            self.signals.loaded.emit(self.video_id, image)
+        except Exception:
+            print(f"[WARN] Miniature {self.video_id} :", traceback.format_exc(limit=1))
+            self.signals.loaded.emit(self.video_id, None)
+
+
+class ThumbnailLoader(QObject):
+    ready = pyqtSignal(str)  # video_id dont la miniature vient d'arriver
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.max_bytes = int(getattr(config, "THUMB_MEMORY_BYTES", 16 * 1024 * 1024))
+        self.disk = DiskLRU(
+            getattr(config, "THUMB_CACHE_DIR",
+                    os.path.join(os.path.expanduser("~"), ".cache", "twilight_hud", "thumbs")),
+            max_bytes=int(getattr(config, "THUMB_DISK_BYTES", 64 * 1024 * 1024)),
+            suffix=".jpg",
+        )
+        self._pixmaps = OrderedDict()  # video_id -> QPixmap, du plus ancien au plus récent
+        self._bytes = 0
+        self._pending = set()
+        self._failed = set()
+        self._wanted = frozenset()
+        self._wanted_lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.skipped = 0
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(int(getattr(config, "THUMB_WORKERS", 4)))
+        self.signals = ThumbnailSignals()
+        self.signals.loaded.connect(self._on_loaded)
+        self.signals.skipped.connect(self._on_skipped)
+        self.placeholder = QPixmap(THUMB_SIZE)
+        self.placeholder.fill(QColor(40, 40, 40))
+
+    def set_visible(self, video_ids):
+        """Lignes actuellement à l'écran (les demandes des autres sont abandonnées)."""
+        with self._wanted_lock:
+            self._wanted = frozenset(video_ids)
+
+    def still_wanted(self, video_id):
+        with self._wanted_lock:
+            return not self._wanted or video_id in self._wanted
+
+    def pixmap(self, video):
+        """QPixmap en cache (GUI thread) ; sinon lance le chargement et renvoie None."""
+        video_id = video["video_id"]
+        pix = self._pixmaps.get(video_id)
+        if pix is not None:
+            self._pixmaps.move_to_end(video_id)
+            self.hits += 1
+            return pix
+        if video_id not in self._pending and video_id not in self._failed:
+            url = thumbnail_url(video)
+            if url is None:
+                self._failed.add(video_id)
+                return None
+            self._pending.add(video_id)
+            self._pool.start(ThumbnailWorker(self, video_id, url))
+        return None
+
+    @pyqtSlot(str)
+    def _on_skipped(self, video_id):
+        self._pending.discard(video_id)  # redemandée si elle revient à l'écran
+        self.skipped += 1
+
+    @pyqtSlot(str, object)
+    def _on_loaded(self, video_id, image):
+        self._pending.discard(video_id)
+        if image is None:
+            self._failed.add(video_id)  # échec réel : pas de nouvel essai
+            return
+        t0 = time.perf_counter()
+        pix = QPixmap.fromImage(image)
+        metrics.observe("thumbnail.to_pixmap", (time.perf_counter() - t0) * 1000.0)
+        self._pixmaps[video_id] = pix
+        self._bytes += self._cost(pix)
+        while self._bytes > self.max_bytes and len(self._pixmaps) > 1:
+            _, old = self._pixmaps.popitem(last=False)
+            self._bytes -= self._cost(old)
+        self.loads += 1
+        self.ready.emit(video_id)
+
+    @staticmethod
+    def _cost(pix):
+        return pix.width() * pix.height() * max(1, pix.depth()) // 8
+
+    def clear_failures(self):
+        self._failed.clear()
+
+    def stats(self):
+        return {
+            "memory_entries": len(self._pixmaps), "memory_bytes": self._bytes,
+            "memory_max_bytes": self.max_bytes, "hits": self.hits, "loads": self.loads,
+            "skipped": self.skipped, "pending": len(self._pending), "disk": self.disk.stats(),
+        }
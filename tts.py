@@ -0,0 +1,320 @@
+"""Synthèse vocale (sans Qt) : Google Cloud TTS, gTTS et moteur local.
+
+`synthesize()` renvoie le chemin d'un fichier audio du cache disque,
+adressé par hash(texte, moteur, voix, débit, hauteur) : un texte déjà dit
+ne coûte plus aucun appel de synthèse. La lecture reste côté HUD.
+
+L'ordre des moteurs dépend de l'usage (`TTS_POLICY`) : une alerte courte
+part du moteur local (espeak-ng, sans réseau ni timeout), une histoire
+préfère la voix cloud et ne retombe sur le local qu'en dernier recours.
+Un moteur réseau qui échoue est mis de côté `TTS_RETRY_AFTER_SEC`.
+
+Couverture (`TTS_HEDGE`) : si le moteur préféré n'a pas répondu après le
+p95 de ses latences récentes, le suivant part en parallèle ; le premier
+rendu gagne. Le perdant local est tué ; une requête réseau perdante ne
+peut pas être interrompue et finit en fond (son rendu reste en cache).
+"""
+import os
+import time
+import shutil
+import hashlib
+import threading
+import traceback
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import config
+import lazy_import
+import metrics
+from disk_cache import DiskLRU
+
+# gTTS (fallback vocal) — les deux moteurs sont importés à la 1re synthèse
+GTTS_OK = lazy_import.available("gtts")
+
+# Google Cloud TTS (premium) : actif si lib installée ET var d’env renseignée
+# (ou endpoint REST explicite, ex. faux serveur local de bench_suite.py)
+GCP_TTS_ENDPOINT = getattr(config, "GCP_TTS_ENDPOINT", None)
+GCLOUD_TTS_OK = (lazy_import.available("google.cloud.texttospeech")
+                 and bool(os.environ.get("GOOGLE_APPLICATION_CREDENTIALS") or GCP_TTS_ENDPOINT))
+
+
+def _local_cmd():
+    """Commande du moteur local : texte sur stdin, WAV écrit dans {out}."""
+    cmd = getattr(config, "LOCAL_TTS_CMD", None)
+    if cmd:
+        return list(cmd)
+    exe = shutil.which("espeak-ng") or shutil.which("espeak")
+    if exe is None:
+        return None
+    rate = int(175 * float(getattr(config, "GCP_TTS_RATE", 1.0)))
+    return [exe, "-v", getattr(config, "LOCAL_TTS_VOICE", "fr"), "-s", str(rate),
+            "-w", "{out}", "--stdin"]
+
+
+LOCAL_TTS_CMD = _local_cmd()
+LOCAL_TTS_OK = LOCAL_TTS_CMD is not None
+
+# ordre des moteurs par usage ; les moteurs absents sont ignorés
+TTS_POLICY = dict({
+    "alert": ("local", "gcloud", "gtts"),
+    "story": ("gcloud", "gtts", "local"),
+}, **getattr(config, "TTS_POLICY", {}))
+RETRY_AFTER_SEC = float(getattr(config, "TTS_RETRY_AFTER_SEC", 60))
+NETWORK_TIMEOUT_SEC = float(getattr(config, "TTS_NETWORK_TIMEOUT_SEC", 10))
+
+HEDGE = bool(getattr(config, "TTS_HEDGE", True))
+HEDGE_DEFAULT_MS = float(getattr(config, "TTS_HEDGE_DEFAULT_MS", 1500))  # avant assez de mesures
+HEDGE_MIN_MS = float(getattr(config, "TTS_HEDGE_MIN_MS", 250))
+HEDGE_MAX_MS = float(getattr(config, "TTS_HEDGE_MAX_MS", 5000))
+
+
+class TTSUnavailable(RuntimeError):
+    """Aucun moteur n'a pu synthétiser le texte."""
+
+
+_cache = DiskLRU(
+    getattr(config, "TTS_CACHE_DIR",
+            os.path.join(os.path.expanduser("~"), ".cache", "twilight_hud", "tts")),
+    max_bytes=int(getattr(config, "TTS_CACHE_MAX_BYTES", 200 * 1024 * 1024)),
+    suffix=".mp3",
+)
+# le moteur local écrit du WAV : magasin à part dans le même dossier
+_local_cache = DiskLRU(
+    _cache.directory,
+    max_bytes=int(getattr(config, "TTS_LOCAL_CACHE_MAX_BYTES", 50 * 1024 * 1024)),
+    suffix=".wav",
+)
+synth_calls = 0
+hedges = 0        # moteurs de secours lancés en parallèle
+hedge_wins = 0    # ... et arrivés avant le moteur préféré
+_down_until = {}  # moteur réseau -> time.monotonic() avant nouvel essai
+_latencies = {}   # moteur -> deque des dernières latences réussies (ms)
+_stats_lock = threading.Lock()
+_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tts")
+
+_gcloud_client = None
+_gcloud_lock = threading.Lock()
+
+
+def _gcloud():
+    """Client Google Cloud TTS créé une fois et réutilisé (gRPC thread-safe)."""
+    global _gcloud_client
+    with _gcloud_lock:
+        if _gcloud_client is None:
+            gctts = lazy_import.load("google.cloud.texttospeech")
+            if GCP_TTS_ENDPOINT:
+                from google.auth.credentials import AnonymousCredentials
+                _gcloud_client = gctts.TextToSpeechClient(
+                    transport="rest", credentials=AnonymousCredentials(),
+                    client_options={"api_endpoint": GCP_TTS_ENDPOINT},
+                )
+            else:
+                _gcloud_client = gctts.TextToSpeechClient()
+        return _gcloud_client
+
+
+def _voice(engine):
+    if engine == "gcloud":
+        return getattr(config, "GCP_TTS_VOICE", "fr-FR-Neural2-A")
+    if engine == "local":
+        return " ".join(LOCAL_TTS_CMD or ())
+    return "fr"
+
+
+def _store(engine):
+    return _local_cache if engine == "local" else _cache
+
+
+def cache_key(text, engine):
+    parts = (
+        text, engine, _voice(engine),
+        str(float(getattr(config, "GCP_TTS_RATE", 1.0))),
+        str(float(getattr(config, "GCP_TTS_PITCH", 0.0))),
+    )
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def synth_gcloud(text, path, cancel=None):
+    client = _gcloud()
+    gctts = lazy_import.load("google.cloud.texttospeech")
+    synthesis_input = gctts.SynthesisInput(text=text)
+
+    voice = gctts.VoiceSelectionParams(
+        language_code="fr-FR",
+        name=_voice("gcloud"),
+        ssml_gender=gctts.SsmlVoiceGender.NEUTRAL,
+    )
+    audio_config = gctts.AudioConfig(
+        audio_encoding=gctts.AudioEncoding.MP3,
+        speaking_rate=float(getattr(config, "GCP_TTS_RATE", 1.0)),
+        pitch=float(getattr(config, "GCP_TTS_PITCH", 0.0)),
+    )
+    response = client.synthesize_speech(
+        input=synthesis_input, voice=voice, audio_config=audio_config,
+        timeout=NETWORK_TIMEOUT_SEC,
+    )
+    with open(path, "wb") as f:
+        f.write(response.audio_content)
+
+
+def synth_gtts(text, path, cancel=None):
+    lazy_import.load("gtts").gTTS(text, lang="fr").save(path)
+
+
+def synth_local(text, path, cancel=None):
+    """`cancel` (threading.Event) : le process est tué si un autre moteur a gagné."""
+    cmd = [arg.replace("{out}", path) for arg in LOCAL_TTS_CMD]
+    deadline = time.monotonic() + float(getattr(config, "LOCAL_TTS_TIMEOUT_SEC", 30))
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE)
+    try:
+        proc.stdin.write(text.encode("utf-8"))
+        proc.stdin.close()
+        while True:
+            try:
+                proc.wait(timeout=0.05)
+                break
+            except subprocess.TimeoutExpired:
+                if cancel is not None and cancel.is_set():
+                    raise RuntimeError("annulé : un autre moteur a répondu")
+                if time.monotonic() > deadline:
+                    raise
+        stderr = proc.stderr.read()
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stderr.close()
+    if proc.returncode != 0 or not os.path.exists(path) or os.path.getsize(path) == 0:
+        raise RuntimeError(f"{cmd[0]} (code {proc.returncode}) : "
+                           f"{stderr.decode('utf-8', 'replace').strip()}")
+
+
+_ENGINES = {"gcloud": (GCLOUD_TTS_OK, synth_gcloud),
+            "gtts": (GTTS_OK, synth_gtts),
+            "local": (LOCAL_TTS_OK, synth_local)}
+
+
+def engines(purpose="story"):
+    """Moteurs disponibles pour `purpose`, par ordre de préférence : [(nom, fonction)]."""
+    out = []
+    for name in TTS_POLICY.get(purpose, TTS_POLICY["story"]):
+        ok, fn = _ENGINES.get(name, (False, None))
+        if ok:
+            out.append((name, fn))
+    return out
+
+
+def hedge_delay_ms(name):
+    """Délai avant de lancer le moteur suivant : p95 des latences récentes de `name`."""
+    with _stats_lock:
+        samples = sorted(_latencies.get(name, ()))
+    if len(samples) < 5:
+        return HEDGE_DEFAULT_MS
+    p95 = samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+    return min(HEDGE_MAX_MS, max(HEDGE_MIN_MS, p95))
+
+
+def _synth_one(name, fn, text, cancel):
+    """Un moteur -> chemin en cache ; mesure la latence, met de côté un réseau KO."""
+    global synth_calls
+    with _stats_lock:
+        synth_calls += 1
+    t0 = time.perf_counter()
+    try:
+        with metrics.span(f"tts.{name}"):
+            path = _store(name).put(cache_key(text, name), lambda tmp: fn(text, tmp, cancel))
+    except Exception:
+        if cancel.is_set():
+            raise  # perdant annulé : ni échec ni mise de côté
+        if name != "local":
+            _down_until[name] = time.monotonic() + RETRY_AFTER_SEC
+        print(f"[ERROR] TTS {name} a échoué :", traceback.format_exc())
+        raise
+    with _stats_lock:
+        _latencies.setdefault(name, deque(maxlen=50)).append((time.perf_counter() - t0) * 1000.0)
+    _down_until.pop(name, None)
+    return path
+
+
+def _race(text, candidates):
+    """Moteurs dans l'ordre ; le suivant part si le courant dépasse son p95."""
+    global hedges, hedge_wins
+    waiting = list(candidates)
+    running = {}  # future -> (rang, nom)
+    cancel = threading.Event()
+    hedge_at = last = None
+
+    def launch():
+        nonlocal hedge_at, last
+        name, fn = waiting.pop(0)
+        running[_pool.submit(_synth_one, name, fn, text, cancel)] = (len(candidates) - len(waiting), name)
+        last = name
+        hedge_at = time.monotonic() + hedge_delay_ms(name) / 1000.0
+
+    if waiting:
+        launch()
+    while running:
+        timeout = max(0.0, hedge_at - time.monotonic()) if waiting else None
+        done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            with _stats_lock:
+                hedges += 1
+            print(f"[DEBUG] TTS : {waiting[0][0]} lancé en couverture "
+                  f"({last} > {hedge_delay_ms(last):.0f} ms)")
+            launch()
+            continue
+        for fut in sorted(done, key=lambda f: running[f][0]):
+            rank, name = running.pop(fut)
+            if fut.exception() is None:
+                cancel.set()
+                if rank > min((r for r, _ in running.values()), default=rank):
+                    with _stats_lock:
+                        hedge_wins += 1
+                return fut.result(), name
+        if not running and waiting:
+            launch()  # tous les lancés ont échoué : suivant sans attendre
+    raise TTSUnavailable(
+        "Aucun moteur TTS disponible (installe espeak-ng ou gTTS, ou configure Google Cloud TTS)."
+    )
+
+
+def synthesize(text, purpose="story", hedge=None):
+    """Audio de `text` (cache, sinon synthèse) ; renvoie (chemin, moteur).
+
+    `purpose` ("alert" ou "story") choisit l'ordre des moteurs (`TTS_POLICY`) ;
+    `hedge` (défaut `TTS_HEDGE`) autorise la couverture par le moteur suivant.
+    """
+    available = engines(purpose)
+    # un rendu déjà en cache, du moteur préféré au moins bon
+    for name, _ in available:
+        key = cache_key(text, name)
+        store = _store(name)
+        path = store.get(key) if key in store else None
+        if path:
+            return path, f"{name}, cache"
+    now = time.monotonic()
+    # réseau en échec récent : pas d'attente inutile (sauf s'il ne reste que lui)
+    candidates = [(n, fn) for n, fn in available if _down_until.get(n, 0) <= now] or available
+    if HEDGE if hedge is None else hedge:
+        return _race(text, candidates)
+    for name, fn in candidates:
+        try:
+            return _synth_one(name, fn, text, threading.Event()), name
+        except Exception:
+            pass  # déjà journalisé
+    raise TTSUnavailable(
+        "Aucun moteur TTS disponible (installe espeak-ng ou gTTS, ou configure Google Cloud TTS)."
+    )
+
+
+def cache_stats():
+    return dict(_cache.stats(), synth_calls=synth_calls, local=_local_cache.stats(),
+                hedges=hedges, hedge_wins=hedge_wins,
+                hedge_delay_ms={name: round(hedge_delay_ms(name)) for name in _engines_measured()})
+
+
+def _engines_measured():
+    with _stats_lock:
+        return list(_latencies)
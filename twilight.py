@@ -0,0 +1,253 @@
+"""Moteur local de crépuscule (position du soleil, algorithme NOAA).
+
+Calcule lever/coucher et crépuscules civil/nautique/astronomique pour une
+date et un lieu, sans réseau. Les clés renvoyées reprennent celles de
+l'API sunrise-sunset.org (``civil_twilight_begin``, ...), en UTC.
+
+Formules du calculateur solaire NOAA (Meeus) : déclinaison et équation du
+temps sont réévaluées à l'instant estimé de chaque événement (deux passes),
+ce qui compte aux hautes latitudes où le soleil passe l'horizon en biais.
+Écart < 1 minute jusqu'à 60° de latitude (crépuscule nautique compris)
+face à astral, autre implémentation des mêmes formules NOAA
+(`tests/data/twilight_reference.json`, au format `results` de l'API).
+C'est un contrôle croisé, pas une comparaison avec sunrise-sunset.org :
+l'écart réel avec l'API se lit au fil de l'eau (`TWILIGHT_API_CROSSCHECK`).
+"""
+import math
+import json
+import os
+import threading
+import datetime
+from datetime import timezone
+
+import lazy_import
+
+# NumPy (optionnel, pour l'API batch) : importé au premier appel seulement
+NUMPY_OK = lazy_import.available("numpy")
+
+_J2000 = 2451545.0
+_UNIX_EPOCH_JD = 2440587.5
+_PASSES = 2  # réévaluations du soleil à l'instant estimé de l'événement
+
+# hauteur du centre du soleil (degrés) pour chaque paire d'événements
+EVENTS = (
+    ("sunrise", "sunset", -0.833),
+    ("civil_twilight_begin", "civil_twilight_end", -6.0),
+    ("nautical_twilight_begin", "nautical_twilight_end", -12.0),
+    ("astronomical_twilight_begin", "astronomical_twilight_end", -18.0),
+)
+FIELDS = ("solar_noon",) + tuple(k for begin, end, _ in EVENTS for k in (begin, end))
+
+
+def _sun(m, jd):
+    """(sin, cos) de la déclinaison et équation du temps (minutes) ; `m` = math ou numpy."""
+    t = (jd - _J2000) / 36525.0  # siècles juliens
+    l0 = m.radians((280.46646 + t * (36000.76983 + 0.0003032 * t)) % 360.0)
+    anomaly = m.radians(357.52911 + t * (35999.05029 - 0.0001537 * t))
+    ecc = 0.016708634 - t * (0.000042037 + 0.0000001267 * t)
+    center = m.radians(
+        m.sin(anomaly) * (1.914602 - t * (0.004817 + 0.000014 * t))
+        + m.sin(2 * anomaly) * (0.019993 - 0.000101 * t)
+        + m.sin(3 * anomaly) * 0.000289
+    )
+    omega = m.radians(125.04 - 1934.136 * t)
+    apparent = l0 + center - m.radians(0.00569 + 0.00478 * m.sin(omega))
+    seconds = 21.448 - t * (46.815 + t * (0.00059 - t * 0.001813))
+    obliquity = m.radians(23.0 + (26.0 + seconds / 60.0) / 60.0 + 0.00256 * m.cos(omega))
+    sin_decl = m.sin(obliquity) * m.sin(apparent)
+    cos_decl = m.sqrt(1.0 - sin_decl * sin_decl)
+    y = m.tan(obliquity / 2.0) ** 2
+    eq_time = 4.0 * m.degrees(
+        y * m.sin(2 * l0) - 2 * ecc * m.sin(anomaly)
+        + 4 * ecc * y * m.sin(anomaly) * m.cos(2 * l0)
+        - 0.5 * y * y * m.sin(4 * l0) - 1.25 * ecc * ecc * m.sin(2 * anomaly)
+    )
+    return sin_decl, cos_decl, eq_time
+
+
+def _solar_noon(m, jd0, lng):
+    """Midi solaire (minutes UTC depuis `jd0`, minuit UTC du jour)."""
+    minutes = 720.0 - 4.0 * lng
+    for _ in range(_PASSES):
+        minutes = 720.0 - 4.0 * lng - _sun(m, jd0 + minutes / 1440.0)[2]
+    return minutes
+
+
+def _event(m, jd0, lat, lng, h0, sign, noon):
+    """Minutes UTC où le soleil passe à `h0` degrés : sign -1 le matin, +1 le soir.
+
+    NaN (numpy) ou ValueError (math) quand il n'y passe pas ce jour-là.
+    """
+    phi = m.radians(lat)
+    sin_h0 = math.sin(math.radians(h0))
+    minutes = noon
+    for _ in range(_PASSES + 1):
+        sin_decl, cos_decl, eq_time = _sun(m, jd0 + minutes / 1440.0)
+        cos_omega = (sin_h0 - m.sin(phi) * sin_decl) / (m.cos(phi) * cos_decl)
+        hour_angle = m.degrees(m.acos(cos_omega) if m is math else m.arccos(cos_omega))
+        minutes = 720.0 - 4.0 * (lng - sign * hour_angle) - eq_time
+    return minutes
+
+
+def _jd0(date):
+    """Jour julien de minuit UTC pour une date civile."""
+    return _J2000 - 0.5 + (date - datetime.date(2000, 1, 1)).days
+
+
+def _to_datetime(jd0, minutes):
+    return datetime.datetime.fromtimestamp(
+        (jd0 - _UNIX_EPOCH_JD) * 86400.0 + minutes * 60.0, tz=timezone.utc)
+
+
+def twilight_times(date, lat, lng):
+    """Horaires du jour `date` à (lat, lng) : dict clé API -> datetime UTC.
+
+    Une valeur vaut None quand l'événement n'a pas lieu (jour/nuit polaire).
+    """
+    jd0 = _jd0(date)
+    noon = _solar_noon(math, jd0, lng)
+    out = {"solar_noon": _to_datetime(jd0, noon)}
+    for begin, end, h0 in EVENTS:
+        for key, sign in ((begin, -1.0), (end, 1.0)):
+            try:
+                out[key] = _to_datetime(jd0, _event(math, jd0, lat, lng, h0, sign, noon))
+            except ValueError:  # acos hors [-1, 1]
+                out[key] = None
+    return out
+
+
+def twilight_batch(dates, lats, lngs):
+    """Version vectorisée : dict clé API -> ndarray de timestamps Unix (s).
+
+    `dates`, `lats` et `lngs` sont broadcastés entre eux (numpy) ; `dates`
+    accepte des ``datetime.date`` ou des ``datetime64``. NaN quand
+    l'événement n'a pas lieu.
+    """
+    if not NUMPY_OK:
+        raise RuntimeError("numpy requis pour twilight_batch (pip install numpy)")
+    np = lazy_import.load("numpy")
+    days = np.asarray(dates, dtype="datetime64[D]")
+    jd0 = _J2000 - 0.5 + (days - np.datetime64("2000-01-01", "D")).astype(np.float64)
+    lat = np.asarray(lats, dtype=np.float64)
+    lng = np.asarray(lngs, dtype=np.float64)
+    jd0, lat, lng = np.broadcast_arrays(jd0, lat, lng)
+    to_unix = lambda minutes: (jd0 - _UNIX_EPOCH_JD) * 86400.0 + minutes * 60.0  # noqa: E731
+    noon = _solar_noon(np, jd0, lng)
+    out = {"solar_noon": to_unix(noon)}
+    with np.errstate(invalid="ignore"):
+        for begin, end, h0 in EVENTS:
+            out[begin] = to_unix(_event(np, jd0, lat, lng, h0, -1.0, noon))  # NaN hors [-1, 1]
+            out[end] = to_unix(_event(np, jd0, lat, lng, h0, 1.0, noon))
+    return out
+
+
+def year_table(year, lat, lng):
+    """Toute une année d'horaires en un appel (voir `twilight_batch`)."""
+    if not NUMPY_OK:
+        raise RuntimeError("numpy requis pour year_table (pip install numpy)")
+    np = lazy_import.load("numpy")
+    dates = np.arange(f"{year}-01-01", f"{year + 1}-01-01", dtype="datetime64[D]")
+    table = twilight_batch(dates, lat, lng)
+    table["date"] = dates
+    return table
+
+
+def _as_datetime(value):
+    """Chaîne ISO de l'API -> datetime ; l'API marque un événement absent par l'epoch 1970."""
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value)
+    if value is not None and value.year == 1970:
+        return None
+    return value
+
+
+def to_results(times):
+    """dict de datetimes -> format `results` de l'API (chaînes ISO 8601)."""
+    return {k: (v.isoformat() if v else None) for k, v in times.items()}
+
+
+def cross_check(api_results, local):
+    """Écart max (s) entre une réponse API (`results`) et le calcul local."""
+    worst = 0.0
+    for key in FIELDS:
+        remote, mine = _as_datetime(api_results.get(key)), _as_datetime(local.get(key))
+        if remote is None or mine is None:
+            continue
+        worst = max(worst, abs((remote - mine).total_seconds()))
+    return worst
+
+
+# ---------- Cache persistant (date, lat, lng) ----------
+class TwilightStore:
+    """Horaires indexés par (date, lat, lng), persistés en JSON.
+
+    Les données ne changent qu'une fois par date et par lieu : on ne
+    refait un calcul/fetch qu'en cas de miss (changement de date ou de
+    lieu). Les entrées plus vieilles que `keep_past_days` sont purgées.
+    """
+    def __init__(self, path, keep_past_days=2):
+        self.path = path
+        self.keep_past_days = keep_past_days
+        self.hits = 0
+        self.misses = 0
+        self._data = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def key(date, lat, lng):
+        return f"{date.isoformat()}|{float(lat):.4f}|{float(lng):.4f}"
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._data = json.load(f)
+        except FileNotFoundError:
+            self._data = {}
+        except Exception as e:
+            print(f"[WARN] Cache crépuscule illisible ({e}), on repart de zéro")
+            self._data = {}
+
+    def get(self, date, lat, lng):
+        """`results` au format API, ou None (compté comme miss)."""
+        with self._lock:
+            results = self._data.get(self.key(date, lat, lng))
+            if results is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return results
+
+    def __contains__(self, key):
+        with self._lock:
+            return self.key(*key) in self._data
+
+    def put(self, date, lat, lng, results):
+        with self._lock:
+            self._data[self.key(date, lat, lng)] = results
+            self._dirty = True
+
+    def missing(self, start, days, lat, lng):
+        """Dates de [start, start + days[ absentes du cache."""
+        dates = (start + datetime.timedelta(days=i) for i in range(days))
+        return [d for d in dates if (d, lat, lng) not in self]
+
+    def save(self, today=None):
+        """Purge les vieilles dates puis écrit atomiquement (tmp + replace)."""
+        with self._lock:
+            if not self._dirty:
+                return
+            cutoff = ((today or datetime.date.today())
+                      - datetime.timedelta(days=self.keep_past_days)).isoformat()
+            self._data = {k: v for k, v in self._data.items() if k.split("|", 1)[0] >= cutoff}
+            snapshot = dict(self._data)
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, self.path)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._data)}
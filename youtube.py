@@ -0,0 +1,138 @@
+"""Recherche YouTube Data API : cache LRU+TTL et pagination (sans Qt)."""
+import time
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import config
+import http_client
+import metrics
+import snapshot
+
+SEARCH_URL = getattr(config, "YOUTUBE_SEARCH_URL", "https://www.googleapis.com/youtube/v3/search")
+SEARCH_HOST = urlsplit(SEARCH_URL).hostname
+PAGE_SIZE = int(getattr(config, "YOUTUBE_PAGE_SIZE", 25))
+
+
+def normalize_query(query):
+    """Clé de cache : casse et espaces normalisés."""
+    return " ".join(query.casefold().split())
+
+
+class SearchCache:
+    """Cache LRU avec expiration (TTL) des pages de résultats."""
+    def __init__(self, maxsize=128, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def export(self):
+        """Entrées encore valides, horodatées en temps réel (pour l'instantané)."""
+        now_mono, now_wall = time.monotonic(), time.time()
+        with self._lock:
+            return [[list(key), round(now_wall - (now_mono - ts)), value]
+                    for key, (ts, value) in self._data.items() if now_mono - ts < self.ttl]
+
+    def restore(self, entries):
+        """Recharge `export()` d'un lancement précédent ; ignore les entrées expirées."""
+        now_mono, now_wall = time.monotonic(), time.time()
+        restored = 0
+        with self._lock:
+            for key, saved_at, value in entries or ():
+                age = max(0.0, now_wall - saved_at)  # horodatage arrondi à la seconde
+                if age < self.ttl and tuple(key) not in self._data:
+                    self._data[tuple(key)] = (now_mono - age, value)
+                    restored += 1
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return restored
+
+
+_cache = SearchCache(
+    maxsize=int(getattr(config, "YOUTUBE_CACHE_SIZE", 128)),
+    ttl=float(getattr(config, "YOUTUBE_CACHE_TTL_SEC", 3600)),
+)
+if snapshot.state is not None:
+    snapshot.state.register("youtube", _cache.export)
+
+
+def _parse_items(items):
+    """Garde uniquement les vraies vidéos avec videoId ; renvoie (vidéos, ignorés)."""
+    videos = []
+    skipped = 0
+    for it in items:
+        _id = it.get("id") or {}
+        snippet = it.get("snippet") or {}
+        kind = _id.get("kind") or it.get("kind")  # par sécurité
+        video_id = _id.get("videoId")
+
+        if kind != "youtube#video" or not video_id:
+            skipped += 1
+            # log lisible pour debug sans casser le flow
+            title_dbg = snippet.get("title", "<sans titre>")
+            print(f"[WARN] Item ignoré (kind={kind}, videoId={video_id}) : {title_dbg}")
+            continue
+
+        videos.append({
+            "video_id": video_id,
+            "title": snippet.get("title", video_id),
+            "thumbnails": snippet.get("thumbnails") or {},
+        })
+    return videos, skipped
+
+
+def search(query, api_key, page_token=None, max_results=PAGE_SIZE, timeout=8):
+    """Une page de résultats : dict(videos, next_page_token, skipped, cached)."""
+    key = (normalize_query(query), page_token or "", max_results)
+    page = _cache.get(key)
+    if page is not None:
+        return dict(page, cached=True)
+
+    params = {
+        "part": "snippet", "q": query, "type": "video",
+        "videoEmbeddable": "true", "maxResults": max_results,
+        "safeSearch": "none", "key": api_key,
+    }
+    if page_token:
+        params["pageToken"] = page_token
+    with metrics.span("youtube.search"):
+        # pas de requête conditionnelle : l'URL porte la clé API et le jeton de
+        # page, et `_cache` garde déjà les pages
+        r = http_client.get_json(SEARCH_URL, params=params, timeout=timeout, conditional=False)
+    videos, skipped = _parse_items(r.get("items", []))
+    page = {"videos": videos, "next_page_token": r.get("nextPageToken"), "skipped": skipped}
+    _cache.put(key, page)
+    if snapshot.state is not None:
+        snapshot.state.mark_dirty()
+    return dict(page, cached=False)
+
+
+def restore_cache(entries):
+    """Pages de recherche d'un lancement précédent (instantané) ; renvoie le nombre repris."""
+    return _cache.restore(entries)
+
+
+def cache_stats():
+    return {"hits": _cache.hits, "misses": _cache.misses, "entries": len(_cache._data)}